@@ -13,8 +13,9 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with DTLPY.  If not, see <http://www.gnu.org/licenses/>.
+import threading
 import logging
-import jwt
+import types
 import sys
 import os
 
@@ -22,10 +23,11 @@ from .exceptions import PlatformException
 from . import repositories, exceptions, entities, examples
 from .__version__ import version as __version__
 from .entities import Box, Point, Segmentation, Polygon, Ellipse, Classification, Polyline, Filters, Trigger, \
-    AnnotationCollection, Annotation, Item, Codebase, Filters, Execution, Recipe, Ontology, Label, Similarity, \
+    AnnotationCollection, Annotation, Item, ItemRef, Codebase, Filters, Execution, Recipe, Ontology, Label, Similarity, \
     ItemLink, UrlLink, PackageModule, PackageFunction, FunctionIO, Modality
 from .utilities import Converter, BaseServiceRunner, Progress
-from .services import DataloopLogger, ApiClient, check_sdk
+from .services import DataloopLogger, ApiClient, AsyncApiClient, check_sdk, SpanListener, CurlListener, \
+    OpenTelemetryListener, profiling
 
 if os.name == "nt":
     # set encoding for windows printing
@@ -38,19 +40,13 @@ Main Platform Interface module for Dataloop
 ##########
 logger = logging.getLogger(name=__name__)
 logger.setLevel(logging.DEBUG)
-log_filepath = DataloopLogger.get_log_filepath()
-# set file handler to save all logs to file
 formatter = logging.Formatter(fmt="%(asctime)s.%(msecs)03d [%(levelname)s]-[%(threadName)s] %(name)s: %(message)s",
                               datefmt='%Y-%m-%d %H:%M:%S')
-fh = DataloopLogger(log_filepath, maxBytes=(1048 * 1000 * 5))
-fh.setLevel(logging.DEBUG)
-fh.setFormatter(formatter)
 sh = logging.StreamHandler()
 sh.setLevel(logging.WARNING)
 sh.setFormatter(formatter)
-# set handlers to main logger
+# set handlers to main logger (file handler is added with the default client)
 logger.addHandler(sh)
-logger.addHandler(fh)
 
 # check python version
 if sys.version_info.major != 3:
@@ -68,23 +64,84 @@ Main Platform Interface module for Dataloop
 ################
 # Repositories #
 ################
-# Create repositories instances
-client_api = ApiClient()
-projects = repositories.Projects(client_api=client_api)
-datasets = repositories.Datasets(client_api=client_api, project=None)
-items = repositories.Items(client_api=client_api, datasets=datasets)
-packages = repositories.Packages(client_api=client_api)
-executions = repositories.Executions(client_api=client_api)
-services = repositories.Services(client_api=client_api)
-webhooks = repositories.Webhooks(client_api=client_api)
-triggers = repositories.Triggers(client_api=client_api)
-
-if client_api.token_expired():
-    logger.error('Token expired. Please login')
-try:
-    check_sdk.check(version=__version__, client_api=client_api)
-except Exception:
-    logger.debug('Failed to check SDK! Continue without')
+# The default client and repositories are created on first use -
+# "import dtlpy" does not touch the cookie files, the logs directory or the network
+_DEFAULTS_NAMES = ['client_api', 'projects', 'datasets', 'items', 'packages', 'executions', 'services', 'webhooks',
+                   'triggers']
+_defaults = dict()
+_defaults_lock = threading.Lock()
+
+
+def _create_defaults():
+    # set file handler to save all logs to file
+    fh = DataloopLogger(DataloopLogger.get_log_filepath(), maxBytes=(1048 * 1000 * 5))
+    fh.setLevel(logging.DEBUG)
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+
+    # Create repositories instances
+    client_api = ApiClient()
+    defaults = {'client_api': client_api,
+                'projects': repositories.Projects(client_api=client_api),
+                'packages': repositories.Packages(client_api=client_api),
+                'executions': repositories.Executions(client_api=client_api),
+                'services': repositories.Services(client_api=client_api),
+                'webhooks': repositories.Webhooks(client_api=client_api),
+                'triggers': repositories.Triggers(client_api=client_api)}
+    defaults['datasets'] = repositories.Datasets(client_api=client_api, project=None)
+    defaults['items'] = repositories.Items(client_api=client_api, datasets=defaults['datasets'])
+
+    if client_api.token_expired():
+        logger.error('Token expired. Please login')
+    try:
+        check_sdk.check(version=__version__, client_api=client_api)
+    except Exception:
+        logger.debug('Failed to check SDK! Continue without')
+    return defaults
+
+
+def _default(name):
+    """
+    Get a default instance, creating all of them on first call
+
+    :param name: one of _DEFAULTS_NAMES
+    """
+    if name not in _defaults:
+        with _defaults_lock:
+            if not _defaults:
+                _defaults.update(_create_defaults())
+    return _defaults[name]
+
+
+def _default_property(name):
+    def fget(module):
+        return _default(name)
+
+    def fset(module, value):
+        _default(name)
+        _defaults[name] = value
+
+    return property(fget, fset)
+
+
+class _DtlpyModule(types.ModuleType):
+    """
+    Module type with the lazy defaults as properties
+    (module level __getattr__ is not available before python 3.7)
+    """
+    # "services" property also hides the services sub-package, same as the module attribute did
+    client_api = _default_property('client_api')
+    projects = _default_property('projects')
+    datasets = _default_property('datasets')
+    items = _default_property('items')
+    packages = _default_property('packages')
+    executions = _default_property('executions')
+    services = _default_property('services')
+    webhooks = _default_property('webhooks')
+    triggers = _default_property('triggers')
+
+
+sys.modules[__name__].__class__ = _DtlpyModule
 
 
 def login(audience=None, auth0_url=None, client_id=None):
@@ -95,6 +152,7 @@ def login(audience=None, auth0_url=None, client_id=None):
     :param client_id: optional -
     :return:
     """
+    client_api = _default('client_api')
     client_api.login(audience=audience, auth0_url=auth0_url, client_id=client_id)
 
 
@@ -105,6 +163,7 @@ def login_token(token):
     :param token: valid token-id
     :return:
     """
+    client_api = _default('client_api')
     client_api.login_token(token=token)
 
 
@@ -118,7 +177,7 @@ def login_secret(email, password, client_id, client_secret, force=False):
     :param force: force the login (if user did not change and token still valid)
     :return:
     """
-
+    client_api = _default('client_api')
     client_api.login_secret(email=email,
                             password=password,
                             client_id=client_id,
@@ -127,14 +186,18 @@ def login_secret(email, password, client_id, client_secret, force=False):
 
 
 # noinspection PyShadowingNames
-def add_environment(environment, audience, client_id, auth0_url, verify_ssl=True, token=None, alias=None):
+def add_environment(environment, audience, client_id, auth0_url, verify_ssl=True, token=None, alias=None,
+                    compress_requests=False, query_projection=False):
+    client_api = _default('client_api')
     client_api.add_environment(environment=environment,
                                audience=audience,
                                client_id=client_id,
                                auth0_url=auth0_url,
                                verify_ssl=verify_ssl,
                                token=token,
-                               alias=alias)
+                               alias=alias,
+                               compress_requests=compress_requests,
+                               query_projection=query_projection)
 
 
 def setenv(env):
@@ -143,6 +206,7 @@ def setenv(env):
     :param env:
     :return:
     """
+    client_api = _default('client_api')
     client_api.setenv(env=env)
 
 
@@ -151,6 +215,7 @@ def token_expired(t=60):
     Check if token is expired
     :return: bool. True if token expired
     """
+    client_api = _default('client_api')
     return client_api.token_expired(t=t)
 
 
@@ -159,6 +224,7 @@ def token():
     token
     :return: token in use
     """
+    client_api = _default('client_api')
     return client_api.token
 
 
@@ -167,6 +233,7 @@ def environment():
     environment
     :return: current environment
     """
+    client_api = _default('client_api')
     return client_api.environment
 
 
@@ -176,6 +243,7 @@ def info(with_token=True):
     :param with_token:
     :return:
     """
+    client_api = _default('client_api')
     return client_api.info(with_token=with_token)
 
 
@@ -184,6 +252,7 @@ def init():
     init current directory as a Dataloop working directory
     :return:
     """
+    client_api = _default('client_api')
     from .services import CookieIO
     client_api.state_io = CookieIO.init_local_cookie(create=True)
     assert isinstance(client_api.state_io, CookieIO)
@@ -195,6 +264,7 @@ def checkout_state():
     Return the current checked out state
     :return:
     """
+    client_api = _default('client_api')
     state = client_api.state_io.read_json()
     return state
 
@@ -13,7 +13,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with DTLPY.  If not, see <http://www.gnu.org/licenses/>.
-from .item import Item, Modality
+from .item import Item, ItemRef, Modality
 from .links import Link, ItemLink, UrlLink
 from .trigger import Trigger
 from .project import Project
@@ -22,7 +22,7 @@ from .dataset import Dataset
 from .codebase import Codebase
 from .annotation import Annotation, FrameAnnotation
 from .annotation_collection import AnnotationCollection
-from .paged_entities import PagedEntities
+from .paged_entities import PagedEntities, AsyncPagedEntities
 from .filters import Filters
 from .recipe import Recipe
 from .ontology import Ontology
@@ -1,13 +1,15 @@
-import numpy as np
 import logging
 import attr
 import json
 import mimetypes
 import os
-from PIL import Image
 
 from .. import miscellaneous, entities, PlatformException, repositories
 
+# heavy - imported on first use
+Image = miscellaneous.LazyImport('PIL.Image')
+np = miscellaneous.LazyImport('numpy')
+
 logger = logging.getLogger(name=__name__)
 
 
@@ -370,7 +372,16 @@ class Annotation:
                 raise PlatformException('400', 'must provide item width and height')
             width = self.item.width
 
-        # color
+        return self._draw(annotation_definition=self.annotation_definition,
+                          image=image,
+                          thickness=thickness,
+                          with_text=with_text,
+                          height=height,
+                          width=width,
+                          annotation_format=annotation_format,
+                          color=self._show_color(color=color))
+
+    def _show_color(self, color=None):
         if color is None:
             if self.color is not None:
                 color = self.color
@@ -378,10 +389,18 @@ class Annotation:
                 if self.label.lower() not in ['approved', 'completed']:
                     logger.warning('No color given for label: {}, random color will be selected'.format(self.label))
                 color = (127, 127, 127)
+        return color
+
+    @staticmethod
+    def _draw(annotation_definition, image, thickness, with_text, height, width, annotation_format, color):
+        """
+        Draw an annotation definition - no entities involved (runs in the cpu stages process pool too)
+        """
         if (isinstance(color, list) or isinstance(color, tuple)) and len(color) == 3:
             # if color is a list or tuple and size of 3 - add alpha
             color = (color[0], color[1], color[2], 255)
             if image is not None:
+                import cv2
                 # check matching dimensions
                 if len(image.shape) == 2:
                     # image is gray
@@ -400,13 +419,13 @@ class Annotation:
             image = np.zeros((height, width, len(color)), dtype=np.uint8)
             if image.shape[2] == 1:
                 image = np.squeeze(image)
-        return self.annotation_definition.show(image=image,
-                                               thickness=thickness,
-                                               with_text=with_text,
-                                               height=height,
-                                               width=width,
-                                               annotation_format=annotation_format,
-                                               color=color)
+        return annotation_definition.show(image=image,
+                                          thickness=thickness,
+                                          with_text=with_text,
+                                          height=height,
+                                          width=width,
+                                          annotation_format=annotation_format,
+                                          color=color)
 
     #######
     # I/O #
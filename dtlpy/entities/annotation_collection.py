@@ -2,10 +2,12 @@ import traceback
 import logging
 import attr
 import json
-import numpy as np
-from PIL import Image
 
-from .. import miscellaneous, entities, PlatformException
+from .. import miscellaneous, entities, services, PlatformException
+
+# heavy - imported on first use
+Image = miscellaneous.LazyImport('PIL.Image')
+np = miscellaneous.LazyImport('numpy')
 
 logger = logging.getLogger(name=__name__)
 
@@ -112,11 +114,10 @@ class AnnotationCollection:
             width = self.item.width
 
         label_instance_dict = None
+        # empty masks are created by _render
+        mask = None
         if annotation_format == 'mask':
-            # create an empty mask
-            if image is None:
-                mask = np.zeros((height, width, 4), dtype=np.uint8)
-            else:
+            if image is not None:
                 if len(image.shape) == 2:
                     # image is gray
                     mask = cv2.cvtColor(image, cv2.COLOR_GRAY2RGBA)
@@ -127,10 +128,7 @@ class AnnotationCollection:
                                             message='Unknown image shape. expected depth: gray or RGB. got: {}'.format(
                                                 image.shape))
         elif annotation_format == 'instance':
-            if image is None:
-                # create an empty mask
-                mask = np.zeros((height, width), dtype=np.uint8)
-            else:
+            if image is not None:
                 if len(image.shape) != 2:
                     raise PlatformException(error='1001',
                                             message='Image shape must be 2d array when trying to draw instance on image')
@@ -138,10 +136,7 @@ class AnnotationCollection:
             # create a dictionary of labels and ids
             label_instance_dict = self.item.dataset.instance_map
         elif annotation_format == 'object_id':
-            if image is None:
-                # create an empty mask
-                mask = np.zeros((height, width), dtype=np.uint8)
-            else:
+            if image is not None:
                 if len(image.shape) != 2:
                     raise PlatformException(error='1001',
                                             message='Image shape must be 2d array when trying to draw instance on image')
@@ -152,7 +147,8 @@ class AnnotationCollection:
                                         annotation_format))
 
         #############
-        # gor over all annotations and put the id where the annotations is
+        # gor over all annotations and get the color to put where the annotations is
+        layers = list()
         for annotation in self.annotations:
             if annotation_format == 'mask':
                 color = None
@@ -169,16 +165,43 @@ class AnnotationCollection:
                 raise PlatformException('404',
                                         'unknown annotations format: {}. known formats: "mask", "instance"'.format(
                                             annotation_format))
-            # get the mask of the annotation
-            mask = annotation.show(thickness=thickness,
-                                   color=color,
-                                   with_text=with_text,
-                                   height=height,
-                                   width=width,
-                                   annotation_format=annotation_format,
-                                   image=mask)
-
-        return mask
+            layers.append((annotation.annotation_definition, annotation._show_color(color=color)))
+
+        # the annotation definitions and colors are the payload - no entities
+        return services.cpu_stages.default.run('mask.render',
+                                               self._render,
+                                               layers=layers,
+                                               image=mask,
+                                               height=height,
+                                               width=width,
+                                               thickness=thickness,
+                                               with_text=with_text,
+                                               annotation_format=annotation_format)
+
+    @staticmethod
+    def _render(layers, image, height, width, thickness, with_text, annotation_format):
+        """
+        Draw the annotation definitions on image (or on an empty mask)
+
+        :param layers: list of (annotation definition, color)
+        :return: ndarray
+        """
+        if image is None:
+            # create an empty mask
+            if annotation_format == 'mask':
+                image = np.zeros((height, width, 4), dtype=np.uint8)
+            else:
+                image = np.zeros((height, width), dtype=np.uint8)
+        for annotation_definition, color in layers:
+            image = entities.Annotation._draw(annotation_definition=annotation_definition,
+                                              image=image,
+                                              thickness=thickness,
+                                              with_text=with_text,
+                                              height=height,
+                                              width=width,
+                                              annotation_format=annotation_format,
+                                              color=color)
+        return image
 
     def download(self, filepath, img_filepath=None, annotation_format='mask', height=None, width=None, thickness=1,
                  with_text=False):
@@ -1,9 +1,13 @@
 import base64
 import logging
 import io
-from PIL import Image
 import attr
-import numpy as np
+
+from .. import miscellaneous, services
+
+# heavy - imported on first use
+Image = miscellaneous.LazyImport('PIL.Image')
+np = miscellaneous.LazyImport('numpy')
 
 logger = logging.getLogger(name=__name__)
 
@@ -609,6 +613,22 @@ class Polygon:
 
     @classmethod
     def from_segmentation(cls, mask, label, attributes=None, epsilon=None):
+        new_pts = services.cpu_stages.default.run('polygon.from_segmentation',
+                                                  cls._contour_from_mask,
+                                                  mask=mask,
+                                                  epsilon=epsilon)
+        return cls(
+            geo=new_pts,
+            label=label,
+            attributes=attributes,
+            is_open=False
+        )
+
+    @staticmethod
+    def _contour_from_mask(mask, epsilon=None):
+        """
+        :return: points of the largest contour of mask
+        """
         try:
             import cv2
         except ImportError:
@@ -639,13 +659,7 @@ class Polygon:
             if epsilon is None:
                 epsilon = 0.0005 * cv2.arcLength(filtered_contours[0], True)
             new_pts = np.squeeze(cv2.approxPolyDP(filtered_contours[0], epsilon, True))
-
-        return cls(
-            geo=new_pts,
-            label=label,
-            attributes=attributes,
-            is_open=False
-        )
+        return new_pts
 
     @classmethod
     def from_json(cls, _json):
@@ -746,10 +760,35 @@ class Segmentation:
         max_val = np.max(self.geo)
         if max_val > 1:
             self.geo = self.geo / max_val
-        png_ann = np.stack((color[0] * self.geo,
-                            color[1] * self.geo,
-                            color[2] * self.geo,
-                            255 * self.geo),
+        stages = services.cpu_stages.default
+        if stages.mode('segmentation.encode') == services.cpu_stages.PROCESS and np.all(np.isin(self.geo, (0, 1))):
+            # binary mask - the process gets it packed to bits with its shape, not the float array
+            return stages.run('segmentation.encode',
+                              self._encode_packed_png,
+                              bits=np.packbits(self.geo > 0).tobytes(),
+                              shape=self.geo.shape,
+                              color=color)
+        return stages.run('segmentation.encode', self._encode_png, geo=self.geo, color=color)
+
+    @staticmethod
+    def _encode_packed_png(bits, shape, color):
+        """
+        :param bits: binary mask packed with np.packbits
+        :param shape: mask shape (h,w)
+        :return: mask as a base64 png data url
+        """
+        geo = np.unpackbits(np.frombuffer(bits, dtype=np.uint8))[:int(np.prod(shape))].reshape(shape)
+        return Segmentation._encode_png(geo=geo.astype(float), color=color)
+
+    @staticmethod
+    def _encode_png(geo, color):
+        """
+        :return: mask as a base64 png data url
+        """
+        png_ann = np.stack((color[0] * geo,
+                            color[1] * geo,
+                            color[2] * geo,
+                            255 * geo),
                            axis=2).astype(np.uint8)
         pil_img = Image.fromarray(png_ann)
         buff = io.BytesIO()
@@ -800,6 +839,14 @@ class Segmentation:
             data = coordinates[22:]
         else:
             raise TypeError('unknown binary data type')
+        return services.cpu_stages.default.run('segmentation.decode', Segmentation._decode_png, data=data)
+
+    @staticmethod
+    def _decode_png(data):
+        """
+        :param data: base64 png
+        :return: ndarray
+        """
         decode = base64.b64decode(data)
         return np.array(Image.open(io.BytesIO(decode)))
 
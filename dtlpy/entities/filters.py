@@ -20,6 +20,13 @@ class Filters:
         self.page_size = 1000
         self.method = 'and'
         self.sort = dict()
+        # 'offset' - page numbers, 'cursor' - pages sorted by id that continue after "after_id"
+        self.paging = 'offset'
+        self.after_id = None
+        # cursor paging - last id of the range (including)
+        self.until_id = None
+        # fields of the items in the pages (None - all). see select()
+        self.selected_fields = None
         self.show_hidden = False
         self.show_dirs = False
         self.join = None
@@ -205,6 +212,24 @@ class Filters:
         # no filters
         else:
             _json = self.default_filter
+            if self.sort:
+                _json['sort'] = self.sort
+
+        ##########
+        # cursor #
+        ##########
+        if self.paging not in ['offset', 'cursor']:
+            raise PlatformException(error='400',
+                                    message='Unknown paging: {}. options: offset, cursor'.format(self.paging))
+        # operations and references apply to all the matching entities - no pages
+        if self.paging == 'cursor' and operation is None and not (self._ref_assignment or self._ref_task):
+            _json = self.__prepare_cursor(_json=_json)
+
+        ##############
+        # projection #
+        ##############
+        if self.selected_fields is not None and self.resource == 'items' and operation is None:
+            _json['select'] = list(self.selected_fields)
 
         ########
         # join #
@@ -258,6 +283,73 @@ class Filters:
         # return json
         return _json
 
+    def __prepare_cursor(self, _json):
+        """
+        Keyset paging - always the first page of the entities after the last seen id.
+        Page cost does not grow with depth and added entities do not shift the pages
+        """
+        fields = [field for field in self.sort if field != 'id']
+        if len(fields) > 0:
+            raise PlatformException(error='400',
+                                    message='Cursor paging is sorted by id. Cannot sort by: {}'.format(fields))
+        direction = self.sort.get('id', 'ascending')
+        _json['sort'] = {'id': direction}
+        _json['page'] = 0
+        _json['pageSize'] = self.page_size
+        condition = dict()
+        if self.after_id is not None:
+            condition['$gt' if direction == 'ascending' else '$lt'] = self.after_id
+        if self.until_id is not None:
+            condition['$lte' if direction == 'ascending' else '$gte'] = self.until_id
+        if condition:
+            condition = {'id': condition}
+            if _json['filter']:
+                # wrap - the custom filter dictionary is the user's
+                _json['filter'] = {'$and': [_json['filter'], condition]}
+            else:
+                _json['filter'] = condition
+        return _json
+
+    def select(self, fields):
+        """
+        Bring only these fields of the items - the pages are ItemRef entities. "id" is always selected
+
+        :param fields: list of fields. nested fields are dotted (e.g. 'metadata.system.mimetype')
+        """
+        if self.resource != 'items':
+            raise PlatformException(error='400', message='Fields can be selected in items queries only')
+        if not isinstance(fields, list):
+            fields = [fields]
+        selected = ['id']
+        for field in fields:
+            if field not in selected:
+                selected.append(field)
+        self.selected_fields = selected
+
+    def project(self, _json):
+        """
+        The selected fields of an entity json (all of it if nothing is selected)
+
+        :param _json: entity json
+        :return: json
+        """
+        if self.selected_fields is None:
+            return _json
+        projected = dict()
+        for field in self.selected_fields:
+            keys = field.split('.')
+            value = _json
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                target = projected
+                for key in keys[:-1]:
+                    target = target.setdefault(key, dict())
+                target[keys[-1]] = value
+        return projected
+
     def sort_by(self, field, value='ascending'):
         if value not in ['ascending', 'descending']:
             raise PlatformException(error='400', message='Sort can be by ascending or descending order only')
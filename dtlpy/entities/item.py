@@ -1,6 +1,7 @@
 from collections import namedtuple
 import traceback
 import logging
+import types
 import attr
 import copy
 import os
@@ -341,6 +342,149 @@ class Item:
         self.items.open_in_web(item=self)
 
 
+def _read_only(value):
+    """
+    :return: read only view of a json value - dicts as mapping proxies and lists as tuples, nested included
+    """
+    if isinstance(value, dict):
+        return types.MappingProxyType({key: _read_only(val) for key, val in value.items()})
+    if isinstance(value, list):
+        return tuple(_read_only(val) for val in value)
+    return value
+
+
+class ItemRef:
+    """
+    Read only item with the selected fields of a query (Filters.select).
+    Nested fields are read only views (e.g. ref.metadata['system']) - "to_json()" returns a copy of the json.
+    No repositories - "to_item()" brings the full Item
+    """
+    __slots__ = ['_json', '_client_api', '_dataset', '_item']
+
+    def __init__(self, _json, client_api, dataset=None):
+        object.__setattr__(self, '_json', _json)
+        object.__setattr__(self, '_client_api', client_api)
+        object.__setattr__(self, '_dataset', dataset)
+        object.__setattr__(self, '_item', None)
+
+    @staticmethod
+    def _protected_from_json(_json, client_api, dataset=None):
+        """
+        Same as from_json but with try-except to catch if error
+        :param _json:
+        :param client_api:
+        :param dataset:
+        :return:
+        """
+        try:
+            item = ItemRef.from_json(_json=_json,
+                                     client_api=client_api,
+                                     dataset=dataset)
+            status = True
+        except Exception:
+            item = traceback.format_exc()
+            status = False
+        return status, item
+
+    @classmethod
+    def from_json(cls, _json, client_api, dataset=None):
+        """
+        Build an item reference from a (projected) json
+        :param _json: _json response from host
+        :param client_api: client_api
+        :param dataset: dataset of the item
+        :return: ItemRef object
+        """
+        if 'id' not in _json:
+            raise exceptions.PlatformException('400', 'Item json without an "id"')
+        return cls(_json=_json, client_api=client_api, dataset=dataset)
+
+    def __getattr__(self, name):
+        # slots are found before - this is for the json fields
+        if name.startswith('_'):
+            raise AttributeError(name)
+        _json = self._json
+        if name not in _json:
+            raise AttributeError('"{}" was not selected. fields: {}. use to_item() for the full item'.format(
+                name, list(_json.keys())))
+        return _read_only(_json[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ItemRef is read only. use to_item() to update the item')
+
+    def __delattr__(self, name):
+        raise AttributeError('ItemRef is read only')
+
+    def __copy__(self):
+        return ItemRef(_json=self._json, client_api=self._client_api, dataset=self._dataset)
+
+    def __deepcopy__(self, memo):
+        # the json is copied - the client and the dataset are shared
+        return ItemRef(_json=copy.deepcopy(self._json, memo), client_api=self._client_api, dataset=self._dataset)
+
+    def __reduce__(self):
+        return ItemRef, (self._json, self._client_api, self._dataset)
+
+    def __repr__(self):
+        return 'ItemRef({})'.format(', '.join('{}={!r}'.format(key, value)
+                                             for key, value in self._json.items()
+                                             if not isinstance(value, dict)))
+
+    def __eq__(self, other):
+        return isinstance(other, ItemRef) and other._json['id'] == self._json['id']
+
+    def __hash__(self):
+        return hash(self._json['id'])
+
+    ##############
+    # Properties #
+    ##############
+    @property
+    def system(self):
+        return _read_only(self._json.get('metadata', dict()).get('system', dict()))
+
+    @property
+    def height(self):
+        return self.system.get('height', None)
+
+    @property
+    def width(self):
+        return self.system.get('width', None)
+
+    @property
+    def mimetype(self):
+        return self.system.get('mimetype', None)
+
+    @property
+    def size(self):
+        return self.system.get('size', None)
+
+    ###########
+    # Functions #
+    ###########
+    def to_json(self):
+        """
+        Returns the selected fields json
+        :return: json
+        """
+        return copy.deepcopy(self._json)
+
+    def to_item(self):
+        """
+        The full Item entity (brought from host once)
+        :return: Item object
+        """
+        if self._item is None:
+            if self._dataset is not None:
+                items = self._dataset.items
+            else:
+                items = repositories.Items(client_api=self._client_api,
+                                           datasets=repositories.Datasets(client_api=self._client_api,
+                                                                          project=None))
+            object.__setattr__(self, '_item', items.get(item_id=self._json['id']))
+        return self._item
+
+
 class Modality:
     def __init__(self, _json=None, modality_type=None, ref=None, ref_type='id', name=None):
         if _json is None:
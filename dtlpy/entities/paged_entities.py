@@ -1,8 +1,11 @@
+import collections
 import logging
+import queue
 import math
 import copy
 import attr
 from .. import entities, services, miscellaneous, exceptions, repositories
+from ..services.profiling import profiled
 
 logger = logging.getLogger(name=__name__)
 
@@ -25,6 +28,10 @@ class PagedEntities:
     total_pages_count = attr.ib(default=0)
     items_count = attr.ib(default=0)
 
+    # cursor paging - the page after "after_id". "last_id" is the id to continue from
+    after_id = attr.ib(default=None, repr=False)
+    last_id = attr.ib(default=None, repr=False)
+
     # execution attribute
     _service_id = attr.ib(default=None, repr=False)
     _project_id = attr.ib(default=None, repr=False)
@@ -52,6 +59,8 @@ class PagedEntities:
                 # handle items and annotations
                 if self.filters.resource == 'items':
                     items_json = result['items']
+                    if self.filters.selected_fields is not None:
+                        items_json = [self.filters.project(_json) for _json in items_json]
                     pool = self._client_api.thread_pools(pool_name='entity.create')
                     jobs = [None for _ in range(len(items_json))]
                     # return triggers list
@@ -109,15 +118,135 @@ class PagedEntities:
             items = list()
         return items
 
+    @property
+    def is_cursor(self):
+        return self.filters is not None and self.filters.paging == 'cursor'
+
     def __iter__(self):
         self.page_offset = 0
         self.has_next_page = True
+        if self.is_cursor:
+            self.after_id = None
         while self.has_next_page:
             self.get_page()
             self.page_offset += 1
             yield self.items
+            if self.is_cursor:
+                if self.last_id is None:
+                    break
+                self.after_id = self.last_id
+
+    def _fetch(self, page_offset, page_size, after_id):
+        # a page on a copy of the pages - background fetches do not change this object
+        pages = copy.copy(self)
+        pages.after_id = after_id
+        pages.items = pages.return_page(page_offset=page_offset, page_size=page_size)
+        return pages
+
+    def _read_ahead(self, window, page_size, ordered):
+        """
+        Fetch pages on the page pool with at most "window" pages fetched and not yet consumed.
+        The caller's thread schedules the pages - workers never wait for the consumer
+
+        :param window: max pages submitted and not yet yielded
+        :param page_size: page size
+        :param ordered: True - yield by page order. False - yield pages as they are done
+        :return: generator of (page index, pages copy of the page)
+        """
+        if window < 1:
+            raise exceptions.PlatformException('400', 'window must be a positive number')
+        pool = self._client_api.thread_pools(pool_name='item.page')
+        done = queue.Queue()
+        # page index -> (pages copy, error) of the done pages not yet yielded
+        results = collections.OrderedDict()
+        # cursor pages start after the last id of the previous page - fetched one after the other
+        after_ids = {0: None}
+        pending = set()
+        next_index = 0
+        i_page = 0
+        total_pages = None
+        last_page = None
+        if not self.is_cursor and self.items_count > 0:
+            total_pages = int(math.ceil(self.items_count / float(page_size)))
+        while True:
+            while len(pending) < window \
+                    and (last_page is None or next_index <= last_page) \
+                    and (total_pages is None or next_index < total_pages) \
+                    and (next_index in after_ids or not self.is_cursor):
+                pool.apply_async(self._fetch,
+                                 kwds={'page_offset': next_index,
+                                       'page_size': page_size,
+                                       'after_id': after_ids.pop(next_index, None)},
+                                 callback=lambda pages, i=next_index: done.put((i, pages, None)),
+                                 error_callback=lambda error, i=next_index: done.put((i, None, error)))
+                pending.add(next_index)
+                next_index += 1
+            if ordered:
+                ready = i_page if i_page in results else None
+            else:
+                ready = next(iter(results), None)
+            if ready is not None:
+                pages, error = results.pop(ready)
+                pending.discard(ready)
+                if error is not None:
+                    raise error
+                i_page += 1
+                yield ready, pages
+                continue
+            if len(results) == len(pending):
+                # nothing in flight and nothing left to submit
+                break
+            i_done, pages, error = done.get()
+            if last_page is not None and i_done > last_page:
+                # an offset page past the end
+                pending.discard(i_done)
+                continue
+            results[i_done] = (pages, error)
+            if error is not None:
+                if ordered:
+                    last_page = i_done if last_page is None else min(last_page, i_done)
+            elif not pages.has_next_page or (self.is_cursor and pages.last_id is None):
+                last_page = i_done if last_page is None else min(last_page, i_done)
+            elif self.is_cursor:
+                after_ids[i_done + 1] = pages.last_id
+            elif total_pages is not None and i_done >= total_pages - 1:
+                # entities were added since the count
+                total_pages = None
+            if last_page is not None:
+                # offset pages past the end that were already done
+                for index in [index for index in results if index > last_page]:
+                    results.pop(index)
+                    pending.discard(index)
+
+    def iterate(self, prefetch=2, page_size=None):
+        """
+        Iterate the pages while the next ones are fetched (and their entities created) in the background.
+        Pages are yielded in order, an error is raised at the page that failed.
+        Breaking out of the loop stops the read-ahead - pages in flight are dropped
+
+        :param prefetch: max pages fetched ahead of the page being processed
+        :param page_size: default is the pages' page_size
+        :return: generator of pages
+        """
+        if prefetch < 0:
+            raise exceptions.PlatformException('400', 'prefetch must be a non negative number')
+        if page_size is None:
+            page_size = self.page_size
+        self.after_id = None
+        self.has_next_page = True
+        for i_page, pages in self._read_ahead(window=prefetch + 1, page_size=page_size, ordered=True):
+            self.items = pages.items
+            self.page_offset = i_page
+            self.has_next_page = pages.has_next_page
+            self.items_count = pages.items_count
+            self.total_pages_count = pages.total_pages_count
+            self.after_id = pages.after_id
+            self.last_id = pages.last_id
+            yield self.items
 
     def __reversed__(self):
+        if self.is_cursor:
+            raise exceptions.PlatformException('400', 'Cursor pages are forward only')
         self.page_offset = self.total_pages_count - 1
         while True:
             self.get_page()
@@ -133,10 +262,10 @@ class PagedEntities:
             page_offset = self.page_offset
 
         if self.filters is not None:
-            filters = copy.copy(self.filters)
-            filters.page = page_offset
-            filters.page_size = page_size
+            filters = self._page_filters(page_offset=page_offset, page_size=page_size)
             result = self.items_repository.get_list(filters=filters)
+            if filters.paging == 'cursor':
+                result = self._cursor_result(filters=filters, result=result)
             items = self.process_result(result)
             return items
         elif isinstance(self.items_repository, repositories.Executions):
@@ -151,11 +280,87 @@ class PagedEntities:
             return self.process_result(
                 self.items_repository.get_list(page_offset=page_offset, page_size=page_size))
 
+    def _page_filters(self, page_offset, page_size):
+        filters = copy.copy(self.filters)
+        filters.page = page_offset
+        filters.page_size = page_size
+        if filters.paging == 'cursor':
+            filters.after_id = self.after_id
+        return filters
+
+    def _cursor_result(self, filters, result):
+        items_json = result.get('items', list())
+        self.last_id = items_json[-1]['id'] if len(items_json) > 0 else None
+        if filters.after_id is not None:
+            # counts of a cursor page are of the entities after the cursor - keep the first page's
+            result = {key: value for key, value in result.items()
+                      if key not in ['totalItemsCount', 'totalPagesCount']}
+        return result
+
     def get_page(self, page_offset=None, page_size=None):
         items = self.return_page(page_offset=page_offset,
                                  page_size=page_size)
         self.items = items
 
+    def process_result_stream(self, stream):
+        """
+        Create the page entities one by one while the page is decoded.
+        Page fields (hasNextPage, totalItemsCount, ...) are updated when the stream is done
+
+        :param stream: JsonObjectStream of a page
+        :return: generator of entities
+        """
+        items = dict()
+        last_id = None
+        for _json in stream:
+            last_id = _json.get('id')
+            if self.filters.resource == 'items':
+                _json = self.filters.project(_json)
+                success, item = self.item_entity._protected_from_json(client_api=self._client_api,
+                                                                      _json=_json,
+                                                                      dataset=self.items_repository.dataset)
+                if success:
+                    yield item
+                else:
+                    logger.warning(item)
+            elif self.filters.resource == 'annotations':
+                if _json['itemId'] not in items:
+                    items[_json['itemId']] = self.items_repository.get(item_id=_json['itemId'])
+                yield self.item_entity.from_json(item=items[_json['itemId']], _json=_json)
+        fields = stream.fields
+        if self.is_cursor:
+            self.last_id = last_id
+            if self.after_id is not None:
+                fields = {key: value for key, value in fields.items()
+                          if key not in ['totalItemsCount', 'totalPagesCount']}
+        self.process_result(fields)
+
+    def stream_page(self, page_offset=None, page_size=None):
+        """
+        Bring a page of items or annotations from host, yielding entities as they are decoded.
+        Peak memory is one entity instead of a whole page
+
+        :param page_offset: page number. default is the current page
+        :param page_size: page size. default is the current page size
+        :return: generator of entities
+        """
+        if page_size is None:
+            page_size = self.page_size
+        if page_offset is None:
+            page_offset = self.page_offset
+        if self.filters is None:
+            # executions and webhooks pages are small - no streaming
+            for entity in self.return_page(page_offset=page_offset, page_size=page_size):
+                yield entity
+            return
+        filters = self._page_filters(page_offset=page_offset, page_size=page_size)
+        stream = self.items_repository.get_list_stream(filters=filters)
+        try:
+            for entity in self.process_result_stream(stream=stream):
+                yield entity
+        finally:
+            stream.close()
+
     def print(self):
         self.items.print()
 
@@ -165,6 +370,8 @@ class PagedEntities:
 
         :return:
         """
+        if self.is_cursor:
+            self.after_id = self.last_id
         self.page_offset += 1
         self.get_page()
 
@@ -174,6 +381,8 @@ class PagedEntities:
 
         :return:
         """
+        if self.is_cursor:
+            raise exceptions.PlatformException('400', 'Cursor pages are forward only')
         self.page_offset -= 1
         self.get_page()
 
@@ -184,6 +393,10 @@ class PagedEntities:
         :param page: page number
         :return:
         """
+        if self.is_cursor:
+            if page != 0:
+                raise exceptions.PlatformException('400', 'Cursor pages are forward only - go to page 0 to restart')
+            self.after_id = None
         self.page_offset = page
         self.get_page()
 
@@ -196,21 +409,91 @@ class PagedEntities:
             annotations[i_json] = self.item_entity.from_json(item=items[_json['itemId']], _json=_json)
         return miscellaneous.List(annotations)
 
-    def all(self):
-        page_offset = 0
-        page_size = 100
-        total_pages = math.ceil(self.items_count / page_size)
-        jobs = list()
-        pool = self._client_api.thread_pools('item.page')
-        while True:
-            if page_offset <= total_pages:
-                jobs.append(pool.apply_async(self.return_page, kwds={'page_offset': page_offset,
-                                                                     'page_size': page_size}))
-                page_offset += 1
-            for i_job, job in enumerate(jobs):
-                if job.ready():
-                    for item in job.get():
-                        yield item
-                    jobs.remove(job)
-            if len(jobs) == 0:
-                break
+    @profiled('pages.all')
+    def all(self, page_size=100, window=None, ordered=False):
+        """
+        All the entities of all the pages. Pages are fetched concurrently
+
+        :param page_size: entities per request
+        :param window: max pages fetched and not yet consumed. default: 2 per worker of the pages pool
+        :param ordered: True - entities in pages order. default: pages as they are done
+        :return: generator of entities
+        """
+        if window is None:
+            window = 2 * self._client_api.thread_pools(pool_name='item.page').processes
+        for _, pages in self._read_ahead(window=window, page_size=page_size, ordered=ordered):
+            for item in pages.items:
+                yield item
+
+
+class AsyncPagedEntities:
+    """
+    Pages object for asyncio. Iterate with "async for page in pages"
+    """
+
+    def __init__(self, items_repository, filters, page_offset=0, page_size=None):
+        self.items_repository = items_repository
+        self.filters = filters
+        self.page_offset = page_offset
+        self.page_size = page_size if page_size is not None else filters.page_size
+        self.has_next_page = True
+        self.total_pages_count = 0
+        self.items_count = 0
+        self.items = miscellaneous.List()
+        self.after_id = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.has_next_page:
+            raise StopAsyncIteration
+        await self.get_page()
+        self.page_offset += 1
+        if self.filters.paging == 'cursor':
+            if len(self.items) == 0:
+                self.has_next_page = False
+            else:
+                self.after_id = self.items[-1].id
+        return self.items
+
+    async def get_page(self, page_offset=None, page_size=None):
+        if page_size is None:
+            page_size = self.page_size
+        if page_offset is None:
+            page_offset = self.page_offset
+        filters = copy.copy(self.filters)
+        filters.page = page_offset
+        filters.page_size = page_size
+        filters.after_id = self.after_id
+        result = await self.items_repository.get_list_async(filters=filters)
+        if filters.after_id is not None:
+            # counts of a cursor page are of the entities after the cursor
+            result.pop('totalItemsCount', None)
+            result.pop('totalPagesCount', None)
+        self.items = await self.process_result(result)
+        return self.items
+
+    async def process_result(self, result):
+        self.has_next_page = result.get('hasNextPage', False)
+        self.items_count = result.get('totalItemsCount', self.items_count)
+        self.total_pages_count = result.get('totalPagesCount', self.total_pages_count)
+        items_json = result.get('items', list())
+        if self.filters.resource == 'annotations':
+            return await self.load_annotations(items_json=items_json)
+        item_entity = self.items_repository._list_entity(filters=self.filters)
+        results = [item_entity._protected_from_json(client_api=self.items_repository._client_api,
+                                                    _json=self.filters.project(_json),
+                                                    dataset=self.items_repository._dataset)
+                   for _json in items_json]
+        # log errors
+        _ = [logger.warning(r[1]) for r in results if r[0] is False]
+        return miscellaneous.List([r[1] for r in results if r[0] is True])
+
+    async def load_annotations(self, items_json):
+        import asyncio
+        item_ids = list(set([_json['itemId'] for _json in items_json]))
+        items = await asyncio.gather(*[self.items_repository.get_async(item_id=item_id) for item_id in item_ids])
+        items = dict(zip(item_ids, items))
+        return miscellaneous.List([entities.Annotation.from_json(item=items[_json['itemId']], _json=_json)
+                                   for _json in items_json])
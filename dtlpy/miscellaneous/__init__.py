@@ -17,3 +17,4 @@ from .dict_differ import DictDiffer
 from .git_utils import GitUtils
 from .zipping import Zipping
 from .list_print import List
+from .lazy_import import LazyImport
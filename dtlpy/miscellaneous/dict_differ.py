@@ -1,4 +1,3 @@
-import dictdiffer
 import logging
 
 logger = logging.getLogger(name=__name__)
@@ -9,6 +8,7 @@ class DictDiffer:
 
     @staticmethod
     def diff(origin, modified):
+        import dictdiffer
         TYPE = 0
         FIELD = 1
         LIST = 2
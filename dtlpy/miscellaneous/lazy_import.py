@@ -0,0 +1,23 @@
+import importlib
+
+
+class LazyImport:
+    """
+    Module placeholder - the module is imported on first attribute access.
+    Keeps heavy modules (numpy, PIL, aiohttp) out of "import dtlpy"
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return '<LazyImport {} ({})>'.format(self._name, 'loaded' if self._module is not None else 'not loaded')
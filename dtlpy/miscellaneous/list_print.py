@@ -1,7 +1,5 @@
 import datetime
-import tabulate
 import logging
-import pandas
 from datetime import datetime
 
 from .. import exceptions
@@ -12,6 +10,8 @@ logger = logging.getLogger(name=__name__)
 class List(list):
 
     def print(self, show_all=False, level='print', to_return=False):
+        import pandas
+        import tabulate
         try:
             to_print = list()
             keys_list = list()
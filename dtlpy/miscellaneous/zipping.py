@@ -1,5 +1,3 @@
-import pathspec
-import numpy as np
 import logging
 import zipfile
 import os
@@ -24,6 +22,8 @@ class Zipping:
         :param ignore_max_file:
         :return:
         """
+        import numpy as np
+        import pathspec
         # default path
         if directory is None:
             directory = os.getcwd()
@@ -4,7 +4,7 @@ import json
 import jwt
 import os
 
-from .. import entities, exceptions
+from .. import entities, exceptions, services
 
 logger = logging.getLogger(name=__name__)
 
@@ -71,6 +71,20 @@ class Annotations:
             raise exceptions.PlatformException(response)
         return annotations
 
+    async def list_async(self):
+        """
+            Get all annotations (asyncio)
+
+        :return: List of Annotation objects
+        """
+        success, response = await self._client_api.async_client.gen_request(
+            req_type='get',
+            path='/items/{}/annotations'.format(self.item.id))
+        if not success:
+            raise exceptions.PlatformException(response)
+        return entities.AnnotationCollection.from_json(_json=response.json(),
+                                                       item=self.item)
+
     def show(self, image=None, thickness=1, with_text=False, height=None, width=None, annotation_format='mask'):
         """
         Show annotations
@@ -150,26 +164,42 @@ class Annotations:
                                     with_text=with_text,
                                     annotation_format=annotation_format)
 
+    @staticmethod
+    def _update_request(w_annotation, system_metadata):
+        if isinstance(w_annotation, entities.Annotation):
+            annotation_id = w_annotation.id
+            annotation = w_annotation.to_json()
+        else:
+            raise exceptions.PlatformException('400',
+                                               'unknown annotations type: {}'.format(type(w_annotation)))
+
+        url_path = '/annotations/{}'.format(annotation_id)
+        if system_metadata:
+            url_path += '?system=true'
+        return url_path, annotation
+
+    def _send_annotation(self, req_type, url_path, payload, attempt):
+        # all tries of the same annotation send the same idempotency key - replays don't duplicate
+        suc, response = self._client_api.gen_request(req_type=req_type,
+                                                     path=url_path,
+                                                     json_req=payload,
+                                                     headers=attempt.headers,
+                                                     log_error=attempt.last)
+        if not suc:
+            raise exceptions.PlatformException(response)
+        return entities.Annotation.from_json(_json=response.json(),
+                                             item=self.item)
+
     def _update_single_annotation(self, w_annotation, system_metadata):
         try:
-            if isinstance(w_annotation, entities.Annotation):
-                annotation_id = w_annotation.id
-                annotation = w_annotation.to_json()
-            else:
-                raise exceptions.PlatformException('400',
-                                                   'unknown annotations type: {}'.format(type(w_annotation)))
-
-            url_path = '/annotations/{}'.format(annotation_id)
-            if system_metadata:
-                url_path += '?system=true'
-            suc, response = self._client_api.gen_request(req_type='put',
-                                                         path=url_path,
-                                                         json_req=annotation)
-            if suc:
-                result = entities.Annotation.from_json(_json=response.json(),
-                                                       item=self.item)
-            else:
-                raise exceptions.PlatformException(response)
+            url_path, annotation = self._update_request(w_annotation=w_annotation,
+                                                        system_metadata=system_metadata)
+            result = self._client_api.retry_policy.execute(
+                func=lambda attempt: self._send_annotation(req_type='put',
+                                                           url_path=url_path,
+                                                           payload=annotation,
+                                                           attempt=attempt),
+                name='Update annotation: {}'.format(w_annotation.id))
             status = True
         except Exception:
             status = False
@@ -187,58 +217,64 @@ class Annotations:
         pool = self._client_api.thread_pools(pool_name='annotation.update')
         if not isinstance(annotations, list):
             annotations = [annotations]
-        jobs = [None for _ in range(len(annotations))]
-        for i_ann, ann in enumerate(annotations):
-            jobs[i_ann] = pool.apply_async(func=self._update_single_annotation,
-                                           kwds={'w_annotation': ann,
-                                                 'system_metadata': system_metadata})
-        # wait for jobs to be finish
-        _ = [j.wait() for j in jobs]
-        # get all results
-        results = [j.get() for j in jobs]
-        out_annotations = [r[1] for r in results if r[0] is True]
-        out_errors = [r[1] for r in results if r[0] is False]
-        if len(out_errors) == 0:
-            logger.debug('Annotation/s updated successfully. {}/{}'.format(len(out_annotations), len(results)))
+        results = self._run_bounded(pool=pool,
+                                    func=self._update_single_annotation,
+                                    annotations=annotations,
+                                    system_metadata=system_metadata)
+        return self._log_results(results=results, action='updated')
+
+    @staticmethod
+    def _run_bounded(pool, func, annotations, **kwargs):
+        """
+        Run func on each annotation with a bounded number of jobs in flight
+
+        :return: func's results, in the annotations order
+        """
+        results = [None] * len(annotations)
+
+        def on_result(result, i_ann):
+            results[i_ann] = result
+
+        def on_error(error, i_ann):
+            results[i_ann] = False, repr(error)
+
+        with services.BoundedWorkQueue(pool=pool, on_result=on_result, on_error=on_error) as queue:
+            for i_ann, ann in enumerate(annotations):
+                queue.submit(func, tag=i_ann, w_annotation=ann, **kwargs)
+        return results
+
+    @staticmethod
+    def _upload_payload(w_annotation):
+        if isinstance(w_annotation, str):
+            w_annotation = json.loads(w_annotation)
+        elif isinstance(w_annotation, entities.Annotation):
+            w_annotation = w_annotation.to_json()
+        elif isinstance(w_annotation, dict):
+            w_annotation = w_annotation
         else:
-            logger.error(out_errors)
-            logger.error('Annotation/s updated with {} errors'.format(len(out_errors)))
-        return out_annotations
+            raise exceptions.PlatformException('400',
+                                               'unknown annotations type: {}'.format(type(w_annotation)))
+        w_annotation.pop('id', None)
+        w_annotation.pop('_id', None)
+        return w_annotation
 
     def _upload_single_annotation(self, w_annotation):
         try:
-            if isinstance(w_annotation, str):
-                w_annotation = json.loads(w_annotation)
-            elif isinstance(w_annotation, entities.Annotation):
-                w_annotation = w_annotation.to_json()
-            elif isinstance(w_annotation, dict):
-                w_annotation = w_annotation
-            else:
-                raise exceptions.PlatformException('400',
-                                                   'unknown annotations type: {}'.format(type(w_annotation)))
-            w_annotation.pop('id', None)
-            w_annotation.pop('_id', None)
-            suc, response = self._client_api.gen_request(req_type='post',
-                                                         path='/items/{}/annotations'.format(self.item.id),
-                                                         json_req=w_annotation)
-            if suc:
-                result = entities.Annotation.from_json(_json=response.json(),
-                                                       item=self.item)
-                status = True
-            else:
-                raise exceptions.PlatformException(response)
+            w_annotation = self._upload_payload(w_annotation=w_annotation)
+            result = self._client_api.retry_policy.execute(
+                func=lambda attempt: self._send_annotation(req_type='post',
+                                                           url_path='/items/{}/annotations'.format(self.item.id),
+                                                           payload=w_annotation,
+                                                           attempt=attempt),
+                name='Upload annotation to item: {}'.format(self.item.id))
+            status = True
         except Exception:
             status = False
             result = traceback.format_exc()
         return status, result
 
-    def upload(self, annotations):
-        """
-        Create a new annotation
-
-        :param annotations: list or single annotation of type Annotation
-        :return: list of annotation objects
-        """
+    @staticmethod
+    def _annotations_to_list(annotations):
         # make list if not list
         if isinstance(annotations, entities.AnnotationCollection):
             annotations = annotations.annotations
@@ -254,25 +290,89 @@ class Annotations:
                         annotations = annotations['data']
                     else:
                         exceptions.PlatformException('400', 'Unknown annotation file format')
+        return annotations
 
+    def upload(self, annotations):
+        """
+        Create a new annotation
+
+        :param annotations: list or single annotation of type Annotation
+        :return: list of annotation objects
+        """
+        annotations = self._annotations_to_list(annotations=annotations)
         pool = self._client_api.thread_pools(pool_name='annotation.upload')
-        jobs = [None for _ in range(len(annotations))]
-        # call multiprocess wrapper to run service on each item in list
-        for i_ann, ann in enumerate(annotations):
-            jobs[i_ann] = pool.apply_async(func=self._upload_single_annotation,
-                                           kwds={'w_annotation': ann})
-        # wait for jobs to be finish
-        _ = [j.wait() for j in jobs]
-        # get all results
-        results = [j.get() for j in jobs]
+        results = self._run_bounded(pool=pool,
+                                    func=self._upload_single_annotation,
+                                    annotations=annotations)
+        return self._log_results(results=results, action='uploaded')
+
+    @staticmethod
+    def _log_results(results, action):
         out_annotations = [r[1] for r in results if r[0] is True]
         out_errors = [r[1] for r in results if r[0] is False]
         if len(out_errors) == 0:
-            logger.debug('Annotation/s uploaded successfully. {}/{}'.format(len(out_annotations), len(results)))
+            logger.debug('Annotation/s {} successfully. {}/{}'.format(action, len(out_annotations), len(results)))
         else:
             logger.error(out_errors)
-            logger.error('Annotation/s uploaded with {} errors'.format(len(out_errors)))
+            logger.error('Annotation/s {} with {} errors'.format(action, len(out_errors)))
         return out_annotations
 
+    async def _upload_single_annotation_async(self, w_annotation):
+        try:
+            w_annotation = self._upload_payload(w_annotation=w_annotation)
+            suc, response = await self._client_api.async_client.gen_request(
+                req_type='post',
+                path='/items/{}/annotations'.format(self.item.id),
+                json_req=w_annotation)
+            if not suc:
+                raise exceptions.PlatformException(response)
+            return True, entities.Annotation.from_json(_json=response.json(),
+                                                       item=self.item)
+        except Exception:
+            return False, traceback.format_exc()
+
+    async def upload_async(self, annotations):
+        """
+        Create a new annotation (asyncio). All annotations are sent concurrently
+
+        :param annotations: list or single annotation of type Annotation
+        :return: list of annotation objects
+        """
+        import asyncio
+        annotations = self._annotations_to_list(annotations=annotations)
+        results = await asyncio.gather(*[self._upload_single_annotation_async(w_annotation=ann)
+                                         for ann in annotations])
+        return self._log_results(results=results, action='uploaded')
+
+    async def _update_single_annotation_async(self, w_annotation, system_metadata):
+        try:
+            url_path, annotation = self._update_request(w_annotation=w_annotation,
+                                                        system_metadata=system_metadata)
+            suc, response = await self._client_api.async_client.gen_request(req_type='put',
+                                                                             path=url_path,
+                                                                             json_req=annotation)
+            if not suc:
+                raise exceptions.PlatformException(response)
+            return True, entities.Annotation.from_json(_json=response.json(),
+                                                       item=self.item)
+        except Exception:
+            return False, traceback.format_exc()
+
+    async def update_async(self, annotations, system_metadata=False):
+        """
+            Update an existing annotation (asyncio). All annotations are sent concurrently
+
+        :param annotations:
+        :param system_metadata:
+        :return: list of annotation objects
+        """
+        import asyncio
+        if not isinstance(annotations, list):
+            annotations = [annotations]
+        results = await asyncio.gather(*[self._update_single_annotation_async(w_annotation=ann,
+                                                                              system_metadata=system_metadata)
+                                         for ann in annotations])
+        return self._log_results(results=results, action='updated')
+
     def builder(self):
         return entities.AnnotationCollection(item=self.item)
@@ -3,12 +3,11 @@ Datasets Repository
 """
 
 import os
-import tqdm
 import logging
 from urllib.parse import urlencode
 from multiprocessing.pool import ThreadPool
 
-from .. import entities, repositories, miscellaneous, exceptions
+from .. import entities, repositories, miscellaneous, exceptions, services
 
 logger = logging.getLogger(name=__name__)
 
@@ -372,6 +371,8 @@ class Datasets:
                              with_text=False,
                              num_workers=32,
                              remote_path=None):
+        import tqdm
+
         def download_single(i_item, i_img_filepath, i_local_path, i_overwrite, i_annotation_options,
                             i_thickness, i_with_text):
             try:
@@ -383,7 +384,7 @@ class Datasets:
                                                                   thickness=i_thickness,
                                                                   with_text=i_with_text)
             except Exception:
-                logger.error('Failed to download annotation for item: {}'.format(item.name))
+                logger.error('Failed to download annotation for item: {}'.format(i_item.name))
 
             progress.update(1)
 
@@ -436,23 +437,22 @@ class Datasets:
 
         pool = ThreadPool(processes=num_workers)
         progress = tqdm.tqdm(total=pages.items_count)
-        for page in pages:
-            for item in page:
-                pool.apply_async(
-                    func=download_single,
-                    kwds={
-                        'i_item': item,
-                        'i_img_filepath': None,
-                        'i_local_path': local_path,
-                        'i_overwrite': overwrite,
-                        'i_annotation_options': annotation_options,
-                        'i_thickness': thickness,
-                        'i_with_text': with_text
-                    }
-                )
-
-        pool.close()
-        pool.join()
-        pool.terminate()
+        try:
+            # pages are fetched only as fast as the items are downloaded
+            with services.BoundedWorkQueue(pool=pool) as queue:
+                for page in pages:
+                    for item in page:
+                        queue.submit(download_single,
+                                     i_item=item,
+                                     i_img_filepath=None,
+                                     i_local_path=local_path,
+                                     i_overwrite=overwrite,
+                                     i_annotation_options=annotation_options,
+                                     i_thickness=thickness,
+                                     i_with_text=with_text)
+        finally:
+            pool.close()
+            pool.join()
+            pool.terminate()
 
         return local_path
@@ -1,30 +1,28 @@
-import multiprocessing
 import threading
 import traceback
 import datetime
 import logging
 import json
+import copy
 
 import requests
-import tqdm
 import os
 import io
 
-from PIL import Image
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
-from .. import entities, miscellaneous, PlatformException
+from .. import entities, miscellaneous, services, PlatformException
+from ..services.profiling import profiled
 
 logger = logging.getLogger(name=__name__)
 
-NUM_TRIES = 3  # try to download 3 time before fail on item
-
 
 class Downloader:
     def __init__(self, items_repository):
         self.items_repository = items_repository
 
+    @profiled('download')
     def download(self,
                  # filter options
                  filters=None,
@@ -62,6 +60,7 @@ class Downloader:
         :param without_relative_path: string - remote path - download items without the relative path from platform
         :return: Output (list)
         """
+        import tqdm
 
         ###################
         # Default options #
@@ -144,86 +143,82 @@ class Downloader:
         ###############
         # downloading #
         ###############
-        # create result lists
-        output = [None for _ in range(num_items)]
-        success = [False for _ in range(num_items)]
-        status = ["" for _ in range(num_items)]
-        errors = [None for _ in range(num_items)]
-        jobs = [None for _ in range(num_items)]
+        # results are handled as jobs finish - only the returned output grows with the number of items
+        output = list()
+        counters = {'download': 0, 'exist': 0, 'error': 0}
+        # item id -> error, of the failed items
+        errors = dict()
+
+        def on_result(result, i_item):
+            if i_item is None:
+                # annotations only job
+                return
+            item_status, item_output, error = result
+            counters[item_status] += 1
+            output[i_item] = item_output
+            if error is not None:
+                errors[item_output] = error
+
         # pool
         pool = self.items_repository._client_api.thread_pools(pool_name='item.download')
         # download
         pbar = tqdm.tqdm(total=num_items, disable=self.items_repository._client_api.verbose.disable_progress_bar)
         try:
-            i_item = 0
-            for page in items_to_download:
-                for item in page:
-                    if item.type == "dir":
-                        continue
-                    if save_locally:
-                        # get local file path
-                        item_local_path, item_local_filepath = self.__get_local_filepath(
-                            local_path=local_path,
-                            without_relative_path=without_relative_path,
-                            item=item,
-                            to_items_folder=to_items_folder)
-
-                        if os.path.isfile(item_local_filepath) and not overwrite:
-                            logger.debug("File Exists: {}".format(item_local_filepath))
-                            status[i_item] = "exist"
-                            output[i_item] = item_local_filepath
-                            success[i_item] = True
-                            pbar.update()
-                            if annotation_options and item.annotated:
-                                # download annotations only
-                                jobs[i_item] = pool.apply_async(
-                                    self._download_img_annotations,
-                                    kwds={
-                                        "item": item,
-                                        "img_filepath": item_local_filepath,
-                                        "overwrite": overwrite,
-                                        "annotation_options": annotation_options,
-                                        "local_path": local_path,
-                                        "thickness": thickness,
-                                        "with_text": with_text
-                                    },
-                                )
-                            i_item += 1
+            # pages are fetched only as fast as the items are downloaded
+            with services.BoundedWorkQueue(pool=pool, on_result=on_result) as queue:
+                for page in items_to_download:
+                    for item in page:
+                        if item.type == "dir":
                             continue
-                    else:
-                        item_local_path = None
-                        item_local_filepath = None
-
-                    # download single item
-                    jobs[i_item] = pool.apply_async(
-                        self.__thread_download_wrapper,
-                        kwds={
-                            "i_item": i_item,
-                            "item": item,
-                            "item_local_path": item_local_path,
-                            "item_local_filepath": item_local_filepath,
-                            "save_locally": save_locally,
-                            "annotation_options": annotation_options,
-                            "status": status,
-                            "output": output,
-                            "success": success,
-                            "errors": errors,
-                            "pbar": pbar,
-                            "overwrite": overwrite,
-                            "thickness": thickness,
-                            "with_text": with_text
-                        },
-                    )
-                    i_item += 1
+                        if save_locally:
+                            # get local file path
+                            item_local_path, item_local_filepath = self.__get_local_filepath(
+                                local_path=local_path,
+                                without_relative_path=without_relative_path,
+                                item=item,
+                                to_items_folder=to_items_folder)
+
+                            if os.path.isfile(item_local_filepath) and not overwrite:
+                                logger.debug("File Exists: {}".format(item_local_filepath))
+                                counters['exist'] += 1
+                                output.append(item_local_filepath)
+                                pbar.update()
+                                if annotation_options and item.annotated:
+                                    # download annotations only
+                                    queue.submit(self._download_img_annotations,
+                                                 item=item,
+                                                 img_filepath=item_local_filepath,
+                                                 overwrite=overwrite,
+                                                 annotation_options=annotation_options,
+                                                 local_path=local_path,
+                                                 thickness=thickness,
+                                                 with_text=with_text)
+                                continue
+                        else:
+                            item_local_path = None
+                            item_local_filepath = None
+
+                        # download single item
+                        output.append(None)
+                        queue.submit(self.__thread_download_wrapper,
+                                     tag=len(output) - 1,
+                                     item=item,
+                                     item_local_path=item_local_path,
+                                     item_local_filepath=item_local_filepath,
+                                     save_locally=save_locally,
+                                     annotation_options=annotation_options,
+                                     pbar=pbar,
+                                     overwrite=overwrite,
+                                     thickness=thickness,
+                                     with_text=with_text)
         except Exception:
             logger.exception('Error downloading:')
         finally:
-            _ = [j.wait() for j in jobs if isinstance(j, multiprocessing.pool.ApplyResult)]
             pbar.close()
         # reporting
-        n_download = status.count("download")
-        n_exist = status.count("exist")
-        n_error = status.count("error")
+        n_download = counters["download"]
+        n_exist = counters["exist"]
+        n_error = counters["error"]
         logger.info("Number of files downloaded:{}".format(n_download))
         logger.info("Number of files exists: {}".format(n_exist))
         logger.info("Total number of files: {}".format(n_download + n_exist))
@@ -232,11 +227,8 @@ class Downloader:
         if n_error > 0:
             log_filepath = os.path.join(os.getcwd(),
                                         "log_{}.txt".format(datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")))
-            errors_list = [errors[i_job] for i_job, suc in enumerate(success) if suc is False]
-            ids_list = [output[i_job] for i_job, suc in enumerate(success) if suc is False]
-            errors_json = {item_id: error for item_id, error in zip(ids_list, errors_list)}
             with open(log_filepath, "w") as f:
-                json.dump(errors_json, f, indent=2)
+                json.dump(errors, f, indent=2)
             logger.warning("Errors in {} files. See {} for full log".format(n_error, log_filepath))
         if len(output) == 1:
             return output[0]
@@ -260,61 +252,54 @@ class Downloader:
             if items is not None:
                 num_annotated = len([item for item in items if item.annotated])
             else:
+                # a copy - the items to download are paged with the caller's filters
+                filters = copy.deepcopy(filters)
                 filters.add(field='annotated', values=True)
                 num_annotated = self.items_repository.list(filters=filters).items_count
         except Exception:
             num_annotated = 0
         return num_annotated
 
-    def __thread_download_wrapper(self, i_item,
+    def __thread_download_wrapper(self,
                                   # item params
                                   item, item_local_path, item_local_filepath, save_locally, overwrite,
                                   # annotations params
                                   annotation_options, with_text, thickness,
                                   # threading params
-                                  status, output, success, errors, pbar):
+                                  pbar):
+        """
+        :return: (status, output, error): ("download", filepath or buffer, None) or ("error", item id, error)
+        """
 
         download = False
         err = None
         trace = None
-        for i_try in range(NUM_TRIES):
-            try:
-                logger.debug("Download item: {path}. Try {i}/{n}. Starting..".format(path=item.filename,
-                                                                                     i=i_try + 1,
-                                                                                     n=NUM_TRIES))
-                download = self.__thread_download(item=item,
-                                                  save_locally=save_locally,
-                                                  local_path=item_local_path,
-                                                  local_filepath=item_local_filepath,
-                                                  annotation_options=annotation_options,
-                                                  overwrite=overwrite,
-                                                  thickness=thickness,
-                                                  with_text=with_text)
-                logger.debug("Download item: {path}. Try {i}/{n}. Success. Item id: {id}".format(path=item.filename,
-                                                                                                 i=i_try + 1,
-                                                                                                 n=NUM_TRIES,
-                                                                                                 id=item.id))
-                if download:
-                    break
-            except Exception as e:
-                logger.debug("Download item: {path}. Try {i}/{n}. Fail.".format(path=item.filename,
-                                                                                i=i_try + 1,
-                                                                                n=NUM_TRIES))
-                err = e
-                trace = traceback.format_exc()
+        tracer = self.items_repository._client_api.tracer
+        span = tracer.start_span('item.download', item_id=item.id, filename=item.filename)
+        try:
+            download = self.items_repository._client_api.retry_policy.execute(
+                func=lambda attempt: self.__thread_download(item=item,
+                                                            save_locally=save_locally,
+                                                            local_path=item_local_path,
+                                                            local_filepath=item_local_filepath,
+                                                            annotation_options=annotation_options,
+                                                            overwrite=overwrite,
+                                                            thickness=thickness,
+                                                            with_text=with_text),
+                name='Download item: {}'.format(item.filename))
+            logger.debug("Download item: {path}. Success. Item id: {id}".format(path=item.filename, id=item.id))
+        except Exception as e:
+            err = e
+            trace = traceback.format_exc()
+        tracer.end_span(span, error=err)
         pbar.update()
         if not download:
             if err is None:
                 err = self.items_repository._client_api.platform_exception
-            status[i_item] = "error"
-            output[i_item] = item.id
-            success[i_item] = False
-            errors[i_item] = "{}\n{}".format(err, trace)
-        else:
-            status[i_item] = "download"
-            output[i_item] = download
-            success[i_item] = True
+            return "error", item.id, "{}\n{}".format(err, trace)
+        return "download", download, None
 
+    @profiled('download_annotations')
     def download_annotations(self, dataset, local_path, overwrite=False, remote_path=None):
         """
         Download annotations json for entire dataset
@@ -371,14 +356,12 @@ class Downloader:
                 for url in dataset.export['zip']['chunks']:
                     urls.append(url)
             pool = self.items_repository._client_api.thread_pools(pool_name='annotation.download')
-            jobs = list()
-            for i_url, url in enumerate(urls):
-                # zip filepath
-                zip_filepath = os.path.join(local_path, "annotations_{}.zip".format(i_url))
-                # send url to pool
-                jobs.append(pool.apply_async(download_single_chunk, kwds={'w_url': url,
-                                                                          'w_filepath': zip_filepath}))
-            _ = [j.wait() for j in jobs]
+            with services.BoundedWorkQueue(pool=pool) as queue:
+                for i_url, url in enumerate(urls):
+                    # zip filepath
+                    zip_filepath = os.path.join(local_path, "annotations_{}.zip".format(i_url))
+                    # send url to pool
+                    queue.submit(download_single_chunk, w_url=url, w_filepath=zip_filepath)
         else:
             zip_filepath = os.path.join(local_path, "annotations_{}.zip".format(remote_path.split('/')[-1]))
             download_single_chunk(w_url=None, w_filepath=zip_filepath, remote_path=remote_path)
@@ -387,6 +370,7 @@ class Downloader:
     def _download_img_annotations(item, img_filepath, local_path, overwrite, annotation_options,
                                   thickness=1, with_text=False):
 
+        from PIL import Image
         # fix local path
         if local_path.endswith("/items") or local_path.endswith("\\items"):
             local_path = os.path.dirname(local_path)
@@ -475,38 +459,80 @@ class Downloader:
                 local_filepath = os.path.join(local_path, item.filename[1:])
         return local_path, local_filepath
 
+    @staticmethod
+    def _link_info(item):
+        """
+        Link info of a link item
+        :return: linkInfo dictionary or None if item is not a link
+        """
+        if item.filename.endswith('.json') and \
+                'system' in item.metadata and \
+                'shebang' in item.metadata['system'] and \
+                'dltype' in item.metadata['system']['shebang'] and \
+                item.metadata['system']['shebang']['dltype'] == 'link' and \
+                'linkInfo' in item.metadata['system']['shebang']:
+            return item.metadata['system']['shebang']['linkInfo']
+        return None
+
     @staticmethod
     def __get_link_source(item):
         assert isinstance(item, entities.Item)
-        if not item.filename.endswith('.json') or \
-                'system' not in item.metadata or \
-                'shebang' not in item.metadata['system'] or \
-                item.metadata['system']['shebang']['dltype'] != 'link':
+        link_info = Downloader._link_info(item=item)
+        if link_info is None:
             return item, '', False
 
         # recursively get next id link item
-        while item.filename.endswith('.json') and \
-                'system' in item.metadata and \
-                'shebang' in item.metadata['system'] and \
-                'dltype' in item.metadata['system']['shebang'] and \
-                item.metadata['system']['shebang']['dltype'] == 'link' and \
-                'linkInfo' in item.metadata['system']['shebang'] and \
-                item.metadata['system']['shebang']['linkInfo']['type'] == 'id':
-            item = item.dataset.items.get(item_id=item.metadata['system']['shebang']['linkInfo']['ref'])
+        while link_info is not None and link_info['type'] == 'id':
+            item = item.dataset.items.get(item_id=link_info['ref'])
+            link_info = Downloader._link_info(item=item)
 
         # check if link
-        if item.filename.endswith('.json') and \
-                'system' in item.metadata and \
-                'shebang' in item.metadata['system'] and \
-                'dltype' in item.metadata['system']['shebang'] and \
-                item.metadata['system']['shebang']['dltype'] == 'link' and \
-                'linkInfo' in item.metadata['system']['shebang'] and \
-                item.metadata['system']['shebang']['linkInfo']['type'] == 'url':
-            url = item.metadata['system']['shebang']['linkInfo']['ref']
-            return item, url, True
+        if link_info is not None and link_info['type'] == 'url':
+            return item, link_info['ref'], True
         else:
             return item, '', False
 
+    async def stream_async(self, item, chunk_size=8192):
+        """
+        Stream a single item's binary data (asyncio). Links are followed to their source
+
+        :param item: Item entity to download
+        :param chunk_size: size of chunks to download
+        :return: AsyncStream - iterate with "async for chunk in stream"
+        """
+        async_client = self.items_repository._client_api.async_client
+        link_info = self._link_info(item=item)
+        while link_info is not None and link_info['type'] == 'id':
+            item = await self.items_repository.get_async(item_id=link_info['ref'])
+            link_info = self._link_info(item=item)
+        if link_info is not None and link_info['type'] == 'url':
+            return await async_client.stream(url=link_info['ref'], chunk_size=chunk_size)
+        return await async_client.stream(path="/items/{}/stream".format(item.id), chunk_size=chunk_size)
+
+    async def download_async(self, item, local_filepath=None, chunk_size=8192):
+        """
+        Download a single item (asyncio)
+
+        :param item: Item entity to download
+        :param local_filepath: optional - local file to save to. if None - return a buffer
+        :param chunk_size: size of chunks to download
+        :return: local filepath or BytesIO
+        """
+        stream = await self.stream_async(item=item, chunk_size=chunk_size)
+        if local_filepath is None:
+            data = io.BytesIO()
+            async for chunk in stream:
+                data.write(chunk)
+            data.seek(0)
+            data.name = item.name
+            return data
+        if not os.path.isdir(os.path.dirname(local_filepath)):
+            os.makedirs(os.path.dirname(local_filepath), exist_ok=True)
+        with open(local_filepath, "wb") as f:
+            async for chunk in stream:
+                f.write(chunk)
+        return local_filepath
+
     def __thread_download(self,
                           item,
                           save_locally,
@@ -529,6 +555,7 @@ class Downloader:
         :param annotation_options: download annotations options: ['mask', 'img_mask', 'instance', 'json']
         :return:
         """
+        import tqdm
         # check if need to download image binary from platform
         need_to_download = True
         if save_locally and os.path.isfile(local_filepath):
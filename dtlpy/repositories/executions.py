@@ -55,19 +55,11 @@ class Executions:
     ###########
     # methods #
     ###########
-    def create(self, service_id=None, sync=False, execution_input=None, function_name=None,
-               resource=None, item_id=None, dataset_id=None, annotation_id=None):
+    def __create_request(self, service_id=None, sync=False, execution_input=None, function_name=None,
+                         resource=None, item_id=None, dataset_id=None, annotation_id=None):
         """
-        Create service entity
-        :param function_name:
-        :param annotation_id:
-        :param item_id:
-        :param resource:
-        :param sync:
-        :param service_id:
-        :param execution_input:
-        :param dataset_id:
-        :return:
+        Build the url and payload of an execution create request
+        :return: url_path, payload
         """
         if service_id is None:
             if self._service is None:
@@ -108,6 +100,30 @@ class Executions:
             payload['functionName'] = function_name
         else:
             payload['functionName'] = 'run'
+        return url_path, payload
+
+    def create(self, service_id=None, sync=False, execution_input=None, function_name=None,
+               resource=None, item_id=None, dataset_id=None, annotation_id=None):
+        """
+        Create service entity
+        :param function_name:
+        :param annotation_id:
+        :param item_id:
+        :param resource:
+        :param sync:
+        :param service_id:
+        :param execution_input:
+        :param dataset_id:
+        :return:
+        """
+        url_path, payload = self.__create_request(service_id=service_id,
+                                                  sync=sync,
+                                                  execution_input=execution_input,
+                                                  function_name=function_name,
+                                                  resource=resource,
+                                                  item_id=item_id,
+                                                  dataset_id=dataset_id,
+                                                  annotation_id=annotation_id)
 
         # request
         success, response = self._client_api.gen_request(req_type='post',
@@ -123,6 +139,37 @@ class Executions:
                                             client_api=self._client_api,
                                             service=self._service)
 
+    async def create_async(self, service_id=None, sync=False, execution_input=None, function_name=None,
+                           resource=None, item_id=None, dataset_id=None, annotation_id=None):
+        """
+        Create service entity (asyncio)
+        Same params as "create"
+
+        :return: Execution object
+        """
+        url_path, payload = self.__create_request(service_id=service_id,
+                                                  sync=sync,
+                                                  execution_input=execution_input,
+                                                  function_name=function_name,
+                                                  resource=resource,
+                                                  item_id=item_id,
+                                                  dataset_id=dataset_id,
+                                                  annotation_id=annotation_id)
+
+        # request
+        success, response = await self._client_api.async_client.gen_request(req_type='post',
+                                                                             path=url_path,
+                                                                             json_req=payload)
+
+        # exception handling
+        if not success:
+            raise exceptions.PlatformException(response)
+
+        # return entity
+        return entities.Execution.from_json(_json=response.json(),
+                                            client_api=self._client_api,
+                                            service=self._service)
+
     def list(self, service_id=None, page_offset=0, page_size=1000, order_by_type=None,
              order_by_direction=None, project_id=None, status=None):
         """
@@ -203,6 +250,27 @@ class Executions:
                                             _json=response.json(),
                                             service=self._service)
 
+    async def get_async(self, execution_id=None):
+        """
+        Get Service execution object (asyncio)
+
+        :param execution_id:
+        :return: Service execution object
+        """
+        success, response = await self._client_api.async_client.gen_request(
+            req_type="get",
+            path="/executions/{}".format(execution_id)
+        )
+
+        # exception handling
+        if not success:
+            raise exceptions.PlatformException(response)
+
+        # return entity
+        return entities.Execution.from_json(client_api=self._client_api,
+                                            _json=response.json(),
+                                            service=self._service)
+
     def progress_update(self, execution_id, status=None, percent_complete=None, message=None, output=None):
         """
         Update Execution Progress
@@ -1,6 +1,11 @@
+import collections
 import logging
+import queue
+import math
+import copy
 
-from .. import entities, exceptions, repositories, miscellaneous
+from .. import entities, exceptions, repositories, miscellaneous, services
+from ..services.profiling import profiled
 
 logger = logging.getLogger(name=__name__)
 
@@ -78,6 +83,20 @@ class Items:
         items = [item for item in items if item is not None]
         return items
 
+    def _query_json(self, filters):
+        _json = filters.prepare()
+        if 'select' in _json and not self._client_api.query_projection:
+            # the environment returns full items - the pages are trimmed before creating the entities
+            _json.pop('select')
+        return _json
+
+    def _list_entity(self, filters):
+        if filters.resource == 'annotations':
+            return entities.Annotation
+        if filters.selected_fields is not None:
+            return entities.ItemRef
+        return self.items_entity
+
     def get_list(self, filters):
         """
         Get dataset items list This is a browsing endpoint, for any given path item count will be returned,
@@ -89,18 +108,37 @@ class Items:
         # prepare request
         success, response = self._client_api.gen_request(req_type="POST",
                                                          path="/datasets/{}/query".format(self.dataset.id),
-                                                         json_req=filters.prepare())
+                                                         json_req=self._query_json(filters=filters))
         if not success:
             raise exceptions.PlatformException(response)
         return response.json()
 
-    def list(self, filters=None, page_offset=None, page_size=None):
+    def get_list_stream(self, filters):
+        """
+        Get dataset items list as a stream - page entities are decoded one by one
+
+        :param filters: Filters entity or a dictionary containing filters parameters
+        :return: JsonObjectStream. iterate for the page entities json, other page fields are in "fields"
+        """
+        success, response = self._client_api.gen_request(req_type="POST",
+                                                         path="/datasets/{}/query".format(self.dataset.id),
+                                                         json_req=self._query_json(filters=filters),
+                                                         stream=True)
+        if not success:
+            raise exceptions.PlatformException(response)
+        return services.JsonObjectStream(chunks=response.iter_content(chunk_size=64 * 1024),
+                                         encoding=response.encoding or 'utf-8',
+                                         on_close=response.close)
+
+    def list(self, filters=None, page_offset=None, page_size=None, paging=None):
         """
         List items
 
         :param filters: Filters entity or a dictionary containing filters parameters
         :param page_offset:
         :param page_size:
+        :param paging: 'offset' - page numbers, 'cursor' - pages sorted by id, each after the last seen id.
+                       default is filters.paging
         :return: Pages object
         """
         # default filters
@@ -111,6 +149,9 @@ class Items:
         if not isinstance(filters, entities.Filters):
             raise exceptions.PlatformException('400', 'Unknown filters type')
 
+        # the pages' copy - paging arguments do not change the caller's filters
+        filters = copy.copy(filters)
+
         # page size
         if page_size is None:
             # take from default
@@ -125,20 +166,178 @@ class Items:
         else:
             filters.page = page_offset
 
-        if filters.resource == 'items':
-            items_entity = self.items_entity
-        else:
-            items_entity = entities.Annotation
+        if paging is not None:
+            filters.paging = paging
 
         paged = entities.PagedEntities(items_repository=self,
                                        filters=filters,
                                        page_offset=page_offset,
                                        page_size=page_size,
                                        client_api=self._client_api,
-                                       item_entity=items_entity)
+                                       item_entity=self._list_entity(filters=filters))
         paged.get_page()
         return paged
 
+    async def get_list_async(self, filters):
+        """
+        Get dataset items list (asyncio)
+
+        :param filters: Filters entity or a dictionary containing filters parameters
+        :return: json response
+        """
+        success, response = await self._client_api.async_client.gen_request(
+            req_type="POST",
+            path="/datasets/{}/query".format(self.dataset.id),
+            json_req=self._query_json(filters=filters))
+        if not success:
+            raise exceptions.PlatformException(response)
+        return response.json()
+
+    def list_async(self, filters=None, page_offset=None, page_size=None, paging=None):
+        """
+        List items (asyncio). Iterate with "async for page in dataset.items.list_async()"
+
+        :param filters: Filters entity or a dictionary containing filters parameters
+        :param page_offset:
+        :param page_size:
+        :param paging: 'offset' or 'cursor'. default is filters.paging
+        :return: AsyncPagedEntities object
+        """
+        if filters is None:
+            filters = entities.Filters()
+        if not isinstance(filters, entities.Filters):
+            raise exceptions.PlatformException('400', 'Unknown filters type')
+        filters = copy.copy(filters)
+        if paging is not None:
+            filters.paging = paging
+        if page_size is None:
+            page_size = filters.page_size
+        if page_offset is None:
+            page_offset = filters.page
+        return entities.AsyncPagedEntities(items_repository=self,
+                                           filters=filters,
+                                           page_offset=page_offset,
+                                           page_size=page_size)
+
+    def _scan_boundaries(self, filters, shards, page_size):
+        """
+        Split the id space of the filters into ranges of about the same size:
+        the ids at evenly spaced offsets of the id sorted query (one entity per request).
+        Ranges are at least a page
+
+        :return: list of (after_id, until_id) - None is open ended
+        """
+        def id_at(offset):
+            sample = copy.copy(filters)
+            sample.paging = 'offset'
+            sample.sort = {'id': 'ascending'}
+            sample.page = offset
+            sample.page_size = 1
+            return self.get_list(filters=sample)
+
+        first = id_at(0)
+        total = first.get('totalItemsCount', 0)
+        shards = max(1, min(shards, int(math.ceil(total / float(page_size)))))
+        pool = self._client_api.thread_pools(pool_name='item.page')
+        jobs = [pool.apply_async(id_at, kwds={'offset': i_shard * total // shards})
+                for i_shard in range(1, shards)]
+        boundaries = list()
+        for job in jobs:
+            items_json = job.get().get('items', list())
+            if len(items_json) > 0 and items_json[0]['id'] not in boundaries:
+                boundaries.append(items_json[0]['id'])
+        # a sampled id closes its range (until_id includes it) and the next range starts after it
+        starts = [None] + boundaries
+        ends = boundaries + [None]
+        return [(after_id, until_id) for after_id, until_id in zip(starts, ends)]
+
+    @profiled('items.scan')
+    def scan(self, filters=None, shards=None, ordered=False, page_size=None, prefetch=2):
+        """
+        Scan all the items (or annotations) of the filters. The id space is split into ranges and
+        each range is paged with id cursors - ranges are fetched concurrently
+
+        :param filters: Filters entity. default: all items
+        :param shards: number of id ranges. default: number of workers of the pages pool
+        :param ordered: True - yield in id order. default: yield pages as they arrive
+        :param page_size: default is filters.page_size
+        :param prefetch: pages fetched ahead per range
+        :return: generator of entities
+        """
+        if filters is None:
+            filters = entities.Filters()
+        if not isinstance(filters, entities.Filters):
+            raise exceptions.PlatformException('400', 'Unknown filters type')
+        if filters.sort and filters.sort != {'id': 'ascending'}:
+            raise exceptions.PlatformException('400', 'Scan is sorted by id - remove the filters sort')
+        if page_size is None:
+            page_size = filters.page_size
+        pool = self._client_api.thread_pools(pool_name='item.page')
+        if shards is None:
+            shards = pool.processes
+        if shards < 1 or prefetch < 1:
+            raise exceptions.PlatformException('400', 'shards and prefetch must be positive numbers')
+
+        # a cursor pages object per id range
+        ranges = list()
+        for after_id, until_id in self._scan_boundaries(filters=filters, shards=shards, page_size=page_size):
+            range_filters = copy.copy(filters)
+            range_filters.paging = 'cursor'
+            range_filters.sort = {'id': 'ascending'}
+            range_filters.page_size = page_size
+            range_filters.until_id = until_id
+            ranges.append(entities.PagedEntities(items_repository=self,
+                                                 filters=range_filters,
+                                                 page_offset=0,
+                                                 page_size=page_size,
+                                                 client_api=self._client_api,
+                                                 item_entity=self._list_entity(filters=filters),
+                                                 has_next_page=True,
+                                                 after_id=after_id))
+
+        # one page in flight per range (each page starts after the last id of the previous one).
+        # the caller's thread schedules the pages - workers never wait for the consumer
+        done = queue.Queue()
+        buffers = [collections.deque() for _ in ranges]
+        in_flight = [False] * len(ranges)
+        i_current = 0
+        try:
+            while True:
+                for i_range, pages in enumerate(ranges):
+                    if pages.has_next_page and not in_flight[i_range] and len(buffers[i_range]) < prefetch:
+                        in_flight[i_range] = True
+                        pool.apply_async(pages.return_page,
+                                         callback=lambda page, i=i_range: done.put((i, page, None)),
+                                         error_callback=lambda error, i=i_range: done.put((i, None, error)))
+                if ordered:
+                    # ranges are in id order - drain them one after the other
+                    while i_current < len(ranges) and len(buffers[i_current]) == 0 \
+                            and not in_flight[i_current] and not ranges[i_current].has_next_page:
+                        i_current += 1
+                    if i_current < len(ranges) and len(buffers[i_current]) > 0:
+                        for entity in buffers[i_current].popleft():
+                            yield entity
+                        continue
+                if not any(in_flight):
+                    break
+                i_range, page, error = done.get()
+                in_flight[i_range] = False
+                if error is not None:
+                    raise error
+                pages = ranges[i_range]
+                if pages.last_id is None:
+                    pages.has_next_page = False
+                pages.after_id = pages.last_id
+                if ordered:
+                    buffers[i_range].append(page)
+                else:
+                    for entity in page:
+                        yield entity
+        finally:
+            # pages in flight finish in the background and are dropped
+            for pages in ranges:
+                pages.has_next_page = False
+
     def get(self, filepath=None, item_id=None):
         """
         Get Item object
@@ -176,6 +375,21 @@ class Items:
         assert isinstance(item, entities.Item)
         return item
 
+    async def get_async(self, item_id):
+        """
+        Get Item object by id (asyncio)
+
+        :param item_id: item id
+        :return: Item object
+        """
+        success, response = await self._client_api.async_client.gen_request(req_type="get",
+                                                                             path="/items/{}".format(item_id))
+        if not success:
+            raise exceptions.PlatformException(response)
+        return self.items_entity.from_json(client_api=self._client_api,
+                                           _json=response.json(),
+                                           dataset=self._dataset)
+
     def clone(self, item_id, dst_dataset_id, remote_filepath=None, metadata=None, with_annotations=True,
               with_metadata=True, with_task_annotations_status=False):
         if metadata is None:
@@ -242,6 +456,15 @@ class Items:
         else:
             raise exceptions.PlatformException(response)
 
+    @staticmethod
+    def __item_update_request(item, system_metadata):
+        json_req = miscellaneous.DictDiffer.diff(origin=item._platform_dict,
+                                                 modified=item.to_json())
+        url_path = "/items/{}".format(item.id)
+        if system_metadata:
+            url_path += "?system=true"
+        return url_path, json_req
+
     def update(self, item=None, filters=None, update_values=None, system_metadata=False):
         """
         Update items metadata
@@ -264,13 +487,9 @@ class Items:
 
         # update item
         if item is not None:
-            json_req = miscellaneous.DictDiffer.diff(origin=item._platform_dict,
-                                                     modified=item.to_json())
+            url_path, json_req = self.__item_update_request(item=item, system_metadata=system_metadata)
             if not json_req:
                 return item
-            url_path = "/items/{}".format(item.id)
-            if system_metadata:
-                url_path += "?system=true"
             success, response = self._client_api.gen_request(req_type="patch",
                                                              path=url_path,
                                                              json_req=json_req)
@@ -295,6 +514,27 @@ class Items:
                 logger.debug("Items were updated successfully.")
                 return response.json()
 
+    async def update_async(self, item, system_metadata=False):
+        """
+        Update item metadata (asyncio)
+
+        :param item: Item object
+        :param system_metadata: bool
+        :return: Item object
+        """
+        url_path, json_req = self.__item_update_request(item=item, system_metadata=system_metadata)
+        if not json_req:
+            return item
+        success, response = await self._client_api.async_client.gen_request(req_type="patch",
+                                                                             path=url_path,
+                                                                             json_req=json_req)
+        if not success:
+            raise exceptions.PlatformException(response)
+        logger.debug("Item was updated successfully. Item id: {}".format(item.id))
+        return self.items_entity.from_json(client_api=self._client_api,
+                                           _json=response.json(),
+                                           dataset=self._dataset)
+
     def download(
             self,
             filters=None,
@@ -1,5 +1,4 @@
 import logging
-import pandas as pd
 
 from dtlpy import entities, miscellaneous, exceptions
 
@@ -151,6 +150,7 @@ class TimesSeries:
         :param filters: match filters to get specific data from series
         :return:
         """
+        import pandas as pd
         if filters is None:
             filters = dict()
         success, response = self._client_api.gen_request(req_type='post',
@@ -195,6 +195,7 @@ class TimesSeries:
         :param sample_id: id of sample line
         :return:
         """
+        import pandas as pd
         success, response = self._client_api.gen_request(req_type='get',
                                                          path='/projects/{}/timeSeries/{}/samples/{}'.format(
                                                              self.project.id,
@@ -1,5 +1,4 @@
-import multiprocessing
-import validators
+import collections
 import traceback
 import datetime
 import tempfile
@@ -7,20 +6,16 @@ import requests
 import logging
 import shutil
 import json
-import time
-import tqdm
 import os
 import io
-import numpy as np
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
-from .. import PlatformException, entities, repositories
+from .. import PlatformException, entities, repositories, services
+from ..services.profiling import profiled
 
 logger = logging.getLogger(name=__name__)
 
-NUM_TRIES = 3  # try to upload 3 time before fail on item
-
 
 class UploadElement:
     def __init__(self, element_type, buffer, remote_filepath, annotations_filepath, link_dataset_id=None, item_metadata=None):
@@ -40,6 +35,7 @@ class Uploader:
         self.items_repository = items_repository
         self.__stop_create_existence_dict = False
 
+    @profiled('upload')
     def upload(
             self,
             # what to upload
@@ -66,6 +62,7 @@ class Uploader:
         :param item_metadata: upload the items with the metadata dictionary
         :return: Output (list)
         """
+        import tqdm
         ###################
         # Default options #
         ###################
@@ -250,42 +247,38 @@ class Uploader:
 
         num_files = len(elements)
         logger.info("Uploading {} items..".format(num_files))
-        output = [0 for _ in range(num_files)]
-        status = ["" for _ in range(num_files)]
-        success = [False for _ in range(num_files)]
-        errors = ["" for _ in range(num_files)]
-        jobs = [None for _ in range(num_files)]
+        # uploaded items by input order (None for failures)
+        output = [None] * num_files
+        actions = collections.Counter()
+        errors_list = list()
+
+        def on_result(result, i_item):
+            action, item, error = result
+            actions[action] += 1
+            if error is None:
+                output[i_item] = item
+            else:
+                errors_list.append(error)
+
         pool = self.items_repository._client_api.thread_pools(
             pool_name='item.upload')
         disable_pbar = self.items_repository._client_api.verbose.disable_progress_bar or num_files == 1
         pbar = tqdm.tqdm(total=num_files, disable=disable_pbar)
-        for i_item in range(num_files):
-            element = elements[i_item]
-            # upload
-            jobs[i_item] = pool.apply_async(self.__upload_single_item_wrapper,
-                                            kwds={"i_item": i_item,
-                                                  "element": element,
-                                                  "mode": mode,
-                                                  "pbar": pbar,
-                                                  "status": status,
-                                                  "success": success,
-                                                  "output": output,
-                                                  "errors": errors,
-                                                  },
-                                            )
-
-        _ = [j.wait() for j in jobs if isinstance(
-            j, multiprocessing.pool.ApplyResult)]
+        with services.BoundedWorkQueue(pool=pool, on_result=on_result) as queue:
+            for i_item, element in enumerate(elements):
+                # upload
+                queue.submit(self.__upload_single_item_wrapper,
+                             tag=i_item,
+                             element=element,
+                             mode=mode,
+                             pbar=pbar)
         pbar.close()
         # summary
         logger.info("Number of total files: {}".format(num_files))
-        for action in np.unique(status):
-            n_for_action = status.count(action)
-            logger.info("Number of files {}: {}".format(action, n_for_action))
+        for action in sorted(actions):
+            logger.info("Number of files {}: {}".format(action, actions[action]))
 
         # log error
-        errors_list = [errors[i_job]
-                       for i_job, suc in enumerate(success) if suc is False]
         if len(errors_list) > 0:
             log_filepath = os.path.join(os.getcwd(),
                                         "log_{}.txt".format(datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")))
@@ -296,8 +289,7 @@ class Uploader:
                 n_error=len(errors_list), log_filepath=log_filepath))
 
         # remove empty cells
-        output = [output[i_job]
-                  for i_job, suc in enumerate(success) if suc is True]
+        output = [item for item in output if item is not None]
         if len(output) == 1:
             output = output[0]
 
@@ -357,7 +349,8 @@ class Uploader:
                              uploaded_filename,
                              last_try,
                              mode,
-                             item_metadata
+                             item_metadata,
+                             idempotency_key=None
                              ):
         """
         Upload an item to dataset
@@ -367,6 +360,7 @@ class Uploader:
         :param remote_path: remote directory of filepath to upload
         :param uploaded_filename: optional - remote filename
         :param last_try: print log error only if last try
+        :param idempotency_key: same key for all tries of the item
         :return: Item object
         """
         need_close = False
@@ -419,7 +413,8 @@ class Uploader:
                                                                                    uploaded_filename=uploaded_filename,
                                                                                    mode=mode,
                                                                                    remote_path=remote_path,
-                                                                                   log_error=last_try)
+                                                                                   log_error=last_try,
+                                                                                   idempotency_key=idempotency_key)
         except Exception:
             raise
         finally:
@@ -441,7 +436,10 @@ class Uploader:
             raise PlatformException(response)
         return item, response.headers.get('x-item-op', 'na')
 
-    def __upload_single_item_wrapper(self, i_item, element, pbar, status, success, output, errors, mode):
+    def __upload_single_item_wrapper(self, element, pbar, mode):
+        """
+        :return: (action, item, error): (action, Item, None) or ("error", remote filepath, error)
+        """
         assert isinstance(element, UploadElement)
         item = False
         err = None
@@ -460,44 +458,31 @@ class Uploader:
         elif element.type == 'similarity':
             element.buffer = element.buffer.to_bytes_io()
 
-        for i_try in range(NUM_TRIES):
-            try:
-                logger.debug("Upload item: {path}. Try {i}/{n}. Starting..".format(path=remote_filename,
-                                                                                   i=i_try + 1,
-                                                                                   n=NUM_TRIES))
-                item, action = self.__upload_single_item(filepath=element.buffer,
-                                                         mode=mode,
-                                                         item_metadata=element.item_metadata,
-                                                         annotations=element.annotations_filepath,
-                                                         remote_path=remote_folder,
-                                                         uploaded_filename=remote_filename,
-                                                         last_try=(i_try + 1) == NUM_TRIES)
-                logger.debug("Upload item: {path}. Try {i}/{n}. Success. Item id: {id}".format(path=remote_filename,
-                                                                                               i=i_try + 1,
-                                                                                               n=NUM_TRIES,
-                                                                                               id=item.id))
-                time.sleep(0.3 * (2 ** (NUM_TRIES - 1)))
-                if isinstance(item, entities.Item):
-                    break
-            except Exception as e:
-                logger.debug("Upload item: {path}. Try {i}/{n}. Fail.".format(path=remote_filename,
-                                                                              i=i_try + 1,
-                                                                              n=NUM_TRIES))
-                err = e
-                trace = traceback.format_exc()
-            finally:
-                if saved_locally and os.path.isdir(temp_dir):
-                    shutil.rmtree(temp_dir)
-        if item:
-            status[i_item] = action
-            output[i_item] = item
-            success[i_item] = True
-        else:
-            status[i_item] = "error"
-            output[i_item] = remote_folder + remote_filename
-            success[i_item] = False
-            errors[i_item] = "{}\n{}".format(err, trace)
+        def upload_try(attempt):
+            return self.__upload_single_item(filepath=element.buffer,
+                                             mode=mode,
+                                             item_metadata=element.item_metadata,
+                                             annotations=element.annotations_filepath,
+                                             remote_path=remote_folder,
+                                             uploaded_filename=remote_filename,
+                                             last_try=attempt.last,
+                                             idempotency_key=attempt.idempotency_key)
+
+        try:
+            item, action = self.items_repository._client_api.retry_policy.execute(
+                func=upload_try,
+                name='Upload item: {}'.format(remote_filename))
+            logger.debug("Upload item: {path}. Success. Item id: {id}".format(path=remote_filename, id=item.id))
+        except Exception as e:
+            err = e
+            trace = traceback.format_exc()
+        finally:
+            if saved_locally and os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir)
         pbar.update()
+        if item:
+            return action, item, None
+        return "error", remote_folder + remote_filename, "{}\n{}".format(err, trace)
 
     @staticmethod
     def __upload_annotations(annotations, item):
@@ -570,6 +555,7 @@ class Uploader:
 
     @staticmethod
     def is_url(url):
+        import validators
         try:
             return validators.url(url)
         except Exception:
@@ -15,5 +15,22 @@
 # along with DTLPY.  If not, see <http://www.gnu.org/licenses/>.
 from .api_client import ApiClient
 from .async_entities import AsyncResponse
+from .async_transport import AsyncTransport, AsyncTransportSettings
+from .async_api_client import AsyncApiClient, AsyncStream
 from .cookie import CookieIO
+from .json_stream import JsonObjectStream
+from .compression import Compression
+from .single_flight import SingleFlight
+from .response_cache import ResponseCache
+from .traffic import Traffic, TrafficCapture, TrafficReplay, read_trace
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .retry_policy import RetryPolicy, RetryBudget
+from .metrics import Metrics
+from .executor import PriorityExecutor
+from .work_queue import BoundedWorkQueue
+from . import cpu_stages
+from .cpu_stages import CpuStages
+from . import profiling
+from .profiling import ProfilingSession
+from .tracing import Tracer, Span, SpanListener, CurlListener, OpenTelemetryListener
 from .create_logger import DataloopLogger
@@ -7,23 +7,30 @@ import threading
 import traceback
 import datetime
 import requests
-import aiohttp
-import asyncio
+import time
 import logging
-import tqdm
 import json
 import jwt
 import os
-from multiprocessing.pool import ThreadPool
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from functools import wraps
-import numpy as np
+from urllib.parse import urlparse
 
 from .calls_counter import CallsCounter
+from .single_flight import SingleFlight
+from .concurrency_limiter import AdaptiveConcurrencyLimiter
+from .retry_policy import RetryPolicy, IDEMPOTENCY_HEADER
+from .compression import Compression
+from .metrics import Metrics
+from .executor import PriorityExecutor, PRIORITY_CLASSES
+from . import cpu_stages
+from .tracing import Tracer, CurlListener
+from .response_cache import ResponseCache
+from .traffic import Traffic
 from .cookie import CookieIO
 from .logins import login, login_secret
 from .async_entities import AsyncResponse, AsyncUploadStream, AsyncResponseError
+from .async_transport import AsyncTransport, AsyncTransportSettings
+from .async_api_client import AsyncApiClient
 from .. import miscellaneous, exceptions, __version__
 
 logger = logging.getLogger(name=__name__)
@@ -139,11 +146,14 @@ class ApiClient:
         self._environment = None
         self._environments = None
         self._verbose = None
+        self._async_transport_settings = None
+        self._async_transport = None
+        self._async_transport_lock = threading.Lock()
+        self._async_client = None
         # define other params
         self.last_response = None
         self.last_request = None
         self.platform_exception = None
-        self.last_curl = None
         self.cookie_io = CookieIO.init()
         assert isinstance(self.cookie_io, CookieIO)
         self.state_io = CookieIO.init_local_cookie(create=False)
@@ -177,24 +187,65 @@ class ApiClient:
         counter_filepath = os.path.join(os.path.dirname(self.cookie_io.COOKIE), 'calls_counter.json')
         self.calls_counter = CallsCounter(filepath=counter_filepath)
 
+        # merge concurrent identical GET requests (off by default, use single_flight.on())
+        self.single_flight = SingleFlight()
+
+        # cache of metadata GET responses (off by default, use response_cache.on())
+        self.response_cache = ResponseCache()
+
+        # capture/replay of the platform traffic (off by default, use traffic.capture() or traffic.replay())
+        self.traffic = Traffic(environment=lambda: self.environment, on_change=self._reset_session)
+
         # start refresh token
         self.refresh_token_active = True
 
-        # create a global thread pool to run multi threading
+        # one prioritized executor behind all the named thread pools (page > entity > bulk)
         if num_processes is None:
             num_processes = multiprocessing.cpu_count()
         self._num_processes = num_processes
-        self._thread_pools = dict()
-        self._thread_pools_names = {'item.upload': num_processes,
-                                    'item.download': num_processes,
-                                    'item.page': num_processes,
-                                    'annotation.upload': num_processes,
-                                    'annotation.download': num_processes,
-                                    'annotation.update': num_processes,
-                                    'entity.create': num_processes}
+        self.executor = PriorityExecutor(num_workers=self._executor_size(num_processes), reserved=1)
+        # thread or process pool per cpu-bound stage (mask rendering, png encode/decode, rle) - shared by all clients
+        self.cpu_stages = cpu_stages.default
+        # request bodies compression (opt-in per environment with compress_requests = True)
+        self.compression = Compression()
+        # retries of all platform calls share one policy and budget (statuses in send_session, connection
+        # errors in the transport, repositories' operations wrap them)
+        self.retry_policy = RetryPolicy()
+        # adaptive limit of in-flight requests from all thread pools (AIMD on latency and 429/503)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(max_limit=self._max_in_flight())
+        # spans of requests, uploads and downloads for the registered listeners (free without listeners)
+        self.tracer = Tracer()
+        # per endpoint calls metrics (use metrics.snapshot() or metrics.to_openmetrics())
+        self.metrics = Metrics()
+        self.metrics.add_gauge(name='executor_queue_depth',
+                               func=self.executor.queue_depth,
+                               label='priority_class',
+                               help_text='Tasks waiting for a worker')
+        self.metrics.add_gauge(name='executor_running',
+                               func=self.executor.running,
+                               label='priority_class',
+                               help_text='Tasks running on a worker')
+        self.metrics.add_gauge(name='concurrency_limit',
+                               func=lambda: self.concurrency_limiter.limit,
+                               help_text='Adaptive limit of in-flight requests')
         # set logging level
         logging.getLogger('dtlpy').handlers[0].setLevel(logging._nameToLevel[self.verbose.logging_level.upper()])
 
+    @staticmethod
+    def _executor_size(num_processes):
+        # bulk I/O runs on up to num_processes workers - one more worker is kept for each higher class
+        # (entities, pages) so they never wait behind saturated bulk tasks
+        return int(num_processes + len(PRIORITY_CLASSES) - 1)
+
+    def _max_in_flight(self):
+        return self.executor.num_workers
+
+    def _metrics_path(self, url):
+        if url.startswith(self.environment):
+            return url[len(self.environment):]
+        # external urls (e.g. signed storage links) - by host only
+        return urlparse(url).netloc
+
     @property
     def num_processes(self):
         return self._num_processes
@@ -202,31 +253,17 @@ class ApiClient:
     @num_processes.setter
     def num_processes(self, num_processes):
         self._num_processes = num_processes
-        for pool_name in self._thread_pools_names:
-            self._thread_pools_names[pool_name] = num_processes
-
-        for pool in self._thread_pools:
-            self._thread_pools[pool].close()
-            self._thread_pools[pool].terminate()
-
-        self._thread_pools = dict()
+        # running tasks are not interrupted
+        self.executor.resize(num_workers=self._executor_size(num_processes))
+        self.concurrency_limiter.max_limit = self._max_in_flight()
 
     def thread_pools(self, pool_name):
-        if pool_name not in self._thread_pools_names:
-            raise ValueError('unknown thread pool name: {}. known name: {}'.format(pool_name,
-                                                                                   list(
-                                                                                       self._thread_pools_names.keys())))
-        num_processes = self._thread_pools_names[pool_name]
-        if pool_name not in self._thread_pools:
-            self._thread_pools[pool_name] = ThreadPool(processes=num_processes)
-        pool = self._thread_pools[pool_name]
-        assert isinstance(pool, multiprocessing.pool.ThreadPool)
-        if pool._state != multiprocessing.pool.RUN:
-            # pool is closed, open a new one
-            logger.debug('Global ThreadPool is not running. Creating a new one')
-            pool = ThreadPool(processes=num_processes)
-            self._thread_pools[pool_name] = pool
-        return pool
+        """
+        :param pool_name: item.upload, item.download, item.page, annotation.upload, annotation.download,
+                          annotation.update or entity.create
+        :return: ThreadPool-like handle (apply_async) of the pool's priority class in the shared executor
+        """
+        return self.executor.pool(pool_name=pool_name)
 
     @property
     def verify(self):
@@ -237,6 +274,35 @@ class ApiClient:
                 verify = environments[self.environment]['verify_ssl']
         return verify
 
+    @property
+    def compress_requests(self):
+        environments = self.environments
+        # off unless the environment's gateway decodes compressed bodies
+        compress = False
+        if self.environment in environments:
+            if 'compress_requests' in environments[self.environment]:
+                compress = environments[self.environment]['compress_requests']
+        return compress
+
+    @compress_requests.setter
+    def compress_requests(self, compress):
+        environments = self.environments
+        if self.environment not in environments:
+            raise ConnectionError('Unknown environment: {}'.format(self.environment))
+        environments[self.environment]['compress_requests'] = compress
+        self.environments = environments
+
+    @property
+    def query_projection(self):
+        """
+        True if the environment's queries return only the selected fields (Filters.select)
+        """
+        environments = self.environments
+        projection = False
+        if self.environment in environments:
+            projection = environments[self.environment].get('query_projection', False)
+        return projection
+
     @property
     def auth(self):
         return {'authorization': 'Bearer ' + self.token}
@@ -337,6 +403,44 @@ class ApiClient:
         assert isinstance(self._verbose, Verbose)
         return self._verbose
 
+    @property
+    def async_transport_settings(self):
+        if self._async_transport_settings is None:
+            self._async_transport_settings = AsyncTransportSettings(cookie=self.cookie_io,
+                                                                    on_change=self._reset_async_transport)
+        assert isinstance(self._async_transport_settings, AsyncTransportSettings)
+        return self._async_transport_settings
+
+    @property
+    def async_transport(self):
+        """
+        Shared aiohttp session and event loop used for items upload
+        :return: AsyncTransport
+        """
+        if self._async_transport is None:
+            with self._async_transport_lock:
+                if self._async_transport is None:
+                    self._async_transport = AsyncTransport(settings=self.async_transport_settings)
+        return self._async_transport
+
+    @property
+    def async_client(self):
+        """
+        asyncio interface to the platform, sharing this client's environment and token
+        :return: AsyncApiClient
+        """
+        if self._async_client is None:
+            self._async_client = AsyncApiClient(client_api=self)
+        return self._async_client
+
+    def _reset_session(self):
+        # next request creates a session with the transport adapter of the current state
+        self.session = None
+
+    def _reset_async_transport(self):
+        if self._async_transport is not None:
+            self._async_transport.reset()
+
     @property
     def token(self):
         _token = self._token
@@ -380,7 +484,8 @@ class ApiClient:
         self.environments = environments
 
     def add_environment(self, environment, audience, client_id, auth0_url,
-                        verify_ssl=True, token=None, refresh_token=None, alias=None):
+                        verify_ssl=True, token=None, refresh_token=None, alias=None, compress_requests=False,
+                        query_projection=False):
         environments = self.environments
         if environment in environments:
             logger.warning('Environment exists. Overwriting. env: {}'.format(environment))
@@ -394,7 +499,9 @@ class ApiClient:
                                      'alias': alias,
                                      'token': token,
                                      'refresh_token': refresh_token,
-                                     'verify_ssl': verify_ssl}
+                                     'verify_ssl': verify_ssl,
+                                     'compress_requests': compress_requests,
+                                     'query_projection': query_projection}
         self.environments = environments
 
     def info(self, with_token=True):
@@ -435,11 +542,15 @@ class ApiClient:
         # prepare request
         headers_req = self.auth
         headers_req['User-Agent'] = requests_toolbelt.user_agent('dtlpy', __version__.version)
+        headers_req['Accept-Encoding'] = Compression.ACCEPT_ENCODING
         if headers is not None:
             if not isinstance(headers, dict):
                 raise exceptions.PlatformException(error=400, message="Input 'headers' must be a dictionary")
             for k, v in headers.items():
                 headers_req[k] = v
+        if req_type in ['POST', 'PUT'] and IDEMPOTENCY_HEADER not in headers_req:
+            # transport retries replay the same key
+            headers_req[IDEMPOTENCY_HEADER] = self.retry_policy.new_idempotency_key()
         req = requests.Request(method=req_type,
                                url=self.environment + path,
                                json=json_req,
@@ -448,18 +559,36 @@ class ApiClient:
                                headers=headers_req)
         # prepare to send
         prepared = req.prepare()
-        # save curl for debug
-        command = "curl -X {method} -H {headers} -d '{data}' '{uri}'"
-        method = prepared.method
-        uri = prepared.url
-        data = prepared.body
-        headers = ['"{0}: {1}"'.format(k, v) for k, v in prepared.headers.items()]
-        headers = " -H ".join(headers)
-        self.last_curl = command.format(method=method, headers=headers, data=data, uri=uri)
         self.last_request = prepared
+        span = None
+        if self.tracer.active:
+            # listeners see the request before compression
+            span = self.tracer.start_span('http.request',
+                                          request=prepared,
+                                          method=req_type,
+                                          route=Metrics.route_template(path),
+                                          url=prepared.url)
+        if json_req is not None and files is None and self.compress_requests:
+            body, encoding = self.compression.compress(prepared.body)
+            if body is not None:
+                prepared.body = body
+                prepared.headers['Content-Encoding'] = encoding
+                prepared.prepare_content_length(body)
         # send request
-        resp = self.send_session(prepared=prepared, stream=stream)
+        try:
+            if req_type == 'GET' and not stream:
+                resp = self.__send_get(prepared=prepared, path=path)
+            else:
+                resp = self.send_session(prepared=prepared, stream=stream)
+                if self.response_cache.is_on and req_type != 'GET':
+                    # a write drops cached copies of the resource (not a streamed read)
+                    self.response_cache.invalidate(path=path)
+        except Exception as err:
+            self.tracer.end_span(span, error=err)
+            raise
         self.last_response = resp
+        if span is not None:
+            self.__end_request_span(span=span, prepared=prepared, resp=resp, stream=stream)
         # handle output
         if not resp.ok:
             self.print_bad_response(resp, log_error=log_error and not self.is_cli)
@@ -475,10 +604,67 @@ class ApiClient:
             return_type = True
         return return_type, resp
 
+    def __end_request_span(self, span, prepared, resp, stream):
+        span.response = resp
+        span.set_attribute('status_code', resp.status_code)
+        span.set_attribute('bytes_out', int(prepared.headers.get('Content-Length', 0)))
+        if 'Content-Length' in resp.headers:
+            span.set_attribute('bytes_in', int(resp.headers['Content-Length']))
+        elif not stream:
+            span.set_attribute('bytes_in', len(resp.content))
+        if resp.elapsed is not None:
+            # requests measures until the response headers are parsed
+            span.timings['ttfb'] = resp.elapsed.total_seconds()
+            if not stream:
+                span.timings['body'] = max(0.0, time.time() - span.start_time - span.timings['ttfb'])
+        self.tracer.end_span(span)
+
+    @property
+    def last_curl(self):
+        """
+        Last request as curl command. Requires a CurlListener: client_api.tracer.add_listener(CurlListener())
+        """
+        for listener in self.tracer.listeners:
+            if isinstance(listener, CurlListener):
+                return listener.last_curl
+        return None
+
+    def __send_get(self, prepared, path):
+        key = (prepared.url, tuple(sorted(prepared.headers.items())))
+        entry = None
+        cache = self.response_cache
+        if cache.is_on and cache.cacheable(path=path):
+            entry = cache.lookup(key=key)
+            if entry is not None:
+                if entry.fresh:
+                    return entry.response
+                if entry.revalidatable:
+                    prepared.headers.update(entry.validation_headers())
+
+        if self.single_flight.is_on:
+            # concurrent identical GETs share one http call and its response
+            resp = self.single_flight.do(key=key,
+                                         func=lambda: self.send_session(prepared=prepared))
+        else:
+            resp = self.send_session(prepared=prepared)
+
+        if cache.is_on:
+            if entry is not None and resp.status_code == 304:
+                resp = cache.revalidated(key=key, entry=entry)
+            else:
+                cache.store(key=key, path=path, response=resp)
+        return resp
+
     async def __upload_file_async(self, to_upload, item_type, item_size, remote_url, uploaded_filename,
-                                  remote_path=None, callback=None, mode='skip', item_metadata=None):
+                                  remote_path=None, callback=None, mode='skip', item_metadata=None,
+                                  idempotency_key=None, span=None):
+        import aiohttp
+        import tqdm
         headers = self.auth
         headers['User-Agent'] = requests_toolbelt.user_agent('dtlpy', __version__.version)
+        if idempotency_key is None:
+            idempotency_key = self.retry_policy.new_idempotency_key()
+        headers[IDEMPOTENCY_HEADER] = idempotency_key
 
         if callback is None:
             if item_size > 10e6:
@@ -496,56 +682,80 @@ class ApiClient:
                 def callback(bytes_read):
                     pass
 
-        timeout = aiohttp.ClientTimeout(total=0)
-        async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-            try:
-                form = aiohttp.FormData({})
-                form.add_field('type', item_type)
-                form.add_field('path', os.path.join(remote_path, uploaded_filename).replace('\\', '/'))
-                if item_metadata is not None:
-                    form.add_field('metadata', json.dumps(item_metadata))
-                form.add_field('file', AsyncUploadStream(buffer=to_upload, callback=callback))
-                url = '{}?mode={}'.format(self.environment + remote_url, mode)
-                async with session.post(url, data=form, verify_ssl=self.verify) as resp:
-                    text = await resp.text()
-                    try:
-                        _json = await resp.json()
-                    except:
-                        _json = dict()
-                    response = AsyncResponse(text=text,
-                                             _json=_json,
-                                             async_resp=resp)
-            except Exception as err:
-                response = AsyncResponseError(error=err, trace=traceback.format_exc())
+        session = await self.async_transport.get_session()
+        try:
+            form = aiohttp.FormData({})
+            form.add_field('type', item_type)
+            form.add_field('path', os.path.join(remote_path, uploaded_filename).replace('\\', '/'))
+            if item_metadata is not None:
+                form.add_field('metadata', json.dumps(item_metadata))
+            form.add_field('file', AsyncUploadStream(buffer=to_upload, callback=callback), filename='file')
+            url = '{}?mode={}'.format(self.environment + remote_url, mode)
+            async with session.post(url, data=form, headers=headers, ssl=None if self.verify else False,
+                                    trace_request_ctx=span) as resp:
+                text = await resp.text()
+                try:
+                    _json = await resp.json()
+                except:
+                    _json = dict()
+                response = AsyncResponse(text=text,
+                                         _json=_json,
+                                         async_resp=resp)
+        except Exception as err:
+            response = AsyncResponseError(error=err, trace=traceback.format_exc())
         return response
 
     def upload_from_local(self, to_upload, item_type, item_size, remote_url, uploaded_filename, remote_path=None,
-                          callback=None, log_error=True, mode='skip', item_metadata=None):
-        def exception_handler(loop, context):
-            logger.debug("[Asyc] Upload item caught the following exception: {}".format(context['message']))
-
+                          callback=None, log_error=True, mode='skip', item_metadata=None, idempotency_key=None):
         if remote_path is None:
             remote_path = '/'
-        loop = asyncio.new_event_loop()
-        loop.set_exception_handler(exception_handler)
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(self.__upload_file_async(to_upload=to_upload,
-                                                                    item_type=item_type,
-                                                                    item_size=item_size,
-                                                                    item_metadata=item_metadata,
-                                                                    remote_url=remote_url,
-                                                                    uploaded_filename=uploaded_filename,
-                                                                    remote_path=remote_path,
-                                                                    callback=callback,
-                                                                    mode=mode))
+        # run on the shared transport loop - reuses pooled connections between uploads
+        self.retry_policy.record_request()
+        ticket = self.concurrency_limiter.acquire()
+        metrics_ticket = self.metrics.start()
+        span = self.tracer.start_span('item.upload',
+                                      method='POST',
+                                      route=Metrics.route_template(remote_url),
+                                      filename=uploaded_filename,
+                                      bytes_out=item_size)
+        status_code = None
+        error = None
+        try:
+            response = self.async_transport.run(self.__upload_file_async(to_upload=to_upload,
+                                                                         item_type=item_type,
+                                                                         item_size=item_size,
+                                                                         item_metadata=item_metadata,
+                                                                         remote_url=remote_url,
+                                                                         uploaded_filename=uploaded_filename,
+                                                                         remote_path=remote_path,
+                                                                         callback=callback,
+                                                                         mode=mode,
+                                                                         idempotency_key=idempotency_key,
+                                                                         span=span))
+            if not isinstance(response, AsyncResponseError):
+                status_code = response.status_code
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            self.concurrency_limiter.release(ticket=ticket, status_code=status_code)
+            if span is not None:
+                span.set_attribute('status_code', status_code)
+                self.tracer.end_span(span, error=error)
+            self.metrics.record(ticket=metrics_ticket,
+                                method='POST',
+                                path=remote_url,
+                                status_code=status_code,
+                                bytes_out=item_size)
         with threadLock:
             self.calls_counter.add()
-        loop.stop()
-        loop.close()
         if not response.ok:
             self.print_bad_response(response, log_error)
             success = False
         else:
+            if self.response_cache.is_on:
+                # a new item - drop cached copies of the dataset and its items
+                self.response_cache.invalidate(path=remote_url)
             try:
                 # print only what is printable (don't print get steam etc..)
                 self.print_response(response)
@@ -556,30 +766,69 @@ class ApiClient:
         return success, response
 
     def send_session(self, prepared, stream=None):
-        if self.session is None:
-            self.session = requests.Session()
-            retry = Retry(
-                total=5,
-                read=5,
-                connect=5,
-                backoff_factor=0.3,
-                # use on any request type
-                method_whitelist=False,
-                # force retry on those status responses
-                status_forcelist=(501, 502, 503, 504, 505, 506, 507, 508, 510, 511),
-                raise_on_status=False
-            )
-            adapter = HTTPAdapter(max_retries=retry,
-                                  pool_maxsize=np.sum(list(self._thread_pools_names.values())),
-                                  pool_connections=np.sum(list(self._thread_pools_names.values())))
-            self.session.mount('http://', adapter)
-            self.session.mount('https://', adapter)
-        resp = self.session.send(request=prepared, stream=stream, verify=self.verify, timeout=None)
+        session = self.session
+        if session is None:
+            session = requests.Session()
+            adapter = self.traffic.adapter(max_retries=self.retry_policy.urllib3_retry(),
+                                           pool_maxsize=self._max_in_flight(),
+                                           pool_connections=self._max_in_flight())
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.session = session
+        responses = list()
+
+        def send(attempt):
+            if responses:
+                # retried - free the connection of the previous attempt
+                responses.pop().close()
+            responses.append(self.__send_once(session=session, prepared=prepared, stream=stream))
+            return responses[-1]
+
+        # status codes are retried here (connection errors by the adapter) - one retry layer
+        return self.retry_policy.execute(func=send,
+                                         name='{} {}'.format(prepared.method, prepared.path_url),
+                                         retry_result=self.retry_policy.retry_status)
+
+    def __send_once(self, session, prepared, stream):
+        self.retry_policy.record_request()
+        ticket = self.concurrency_limiter.acquire()
+        metrics_ticket = self.metrics.start()
+        status_code = None
+        resp = None
+        try:
+            resp = session.send(request=prepared, stream=stream, verify=self.verify, timeout=None)
+            status_code = resp.status_code
+        finally:
+            self.concurrency_limiter.release(ticket=ticket, status_code=status_code)
+            if metrics_ticket is not None:
+                self.__record_metrics(ticket=metrics_ticket, prepared=prepared, resp=resp, stream=stream)
+        if not stream:
+            self.compression.record_response(resp)
 
         with threadLock:
             self.calls_counter.add()
         return resp
 
+    def __record_metrics(self, ticket, prepared, resp, stream):
+        bytes_in = 0
+        retries = 0
+        if resp is not None:
+            if 'Content-Length' in resp.headers:
+                # wire size (compressed responses included)
+                bytes_in = int(resp.headers['Content-Length'])
+            elif not stream:
+                bytes_in = len(resp.content)
+            history = getattr(getattr(resp.raw, 'retries', None), 'history', None)
+            if history:
+                retries = len(history)
+        self.metrics.record(ticket=ticket,
+                            method=prepared.method,
+                            path=self._metrics_path(prepared.url),
+                            status_code=resp.status_code if resp is not None else None,
+                            bytes_out=int(prepared.headers.get('Content-Length', 0)),
+                            bytes_in=bytes_in,
+                            retries=retries)
+
     @staticmethod
     def check_proxy():
         """
@@ -706,6 +955,7 @@ class ApiClient:
         :param with_auth: print authentication
         :return:
         """
+        import aiohttp
         if not req:
             req = self.last_request
 
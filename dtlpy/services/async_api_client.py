@@ -0,0 +1,231 @@
+"""
+Dataloop platform calls - asyncio interface
+"""
+import requests_toolbelt
+import threading
+import weakref
+import logging
+import json
+import time
+
+from .async_entities import AsyncResponse
+from .retry_policy import IDEMPOTENCY_HEADER
+from .tracing import aiohttp_trace_config
+from .metrics import Metrics
+from .. import exceptions, miscellaneous, __version__
+
+# heavy - imported on first use
+aiohttp = miscellaneous.LazyImport('aiohttp')
+asyncio = miscellaneous.LazyImport('asyncio')
+
+logger = logging.getLogger(name=__name__)
+threadLock = threading.Lock()
+
+
+class AsyncStream:
+    """
+    Async iterator over the chunks of a streamed response.
+    The connection is released when the stream is exhausted or closed
+    """
+
+    def __init__(self, response, chunk_size=8192):
+        self.response = response
+        self.chunk_size = chunk_size
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.response.content.read(self.chunk_size)
+        if not chunk:
+            self.close()
+            raise StopAsyncIteration
+        return chunk
+
+    def close(self):
+        self.response.release()
+
+
+class AsyncApiClient:
+    """
+    asyncio API calls to Dataloop gate.
+    Shares environment, token and settings with the (blocking) ApiClient
+    """
+
+    def __init__(self, client_api):
+        self.client_api = client_api
+        # one session per event loop - aiohttp sessions cannot be shared between loops
+        self._sessions = weakref.WeakKeyDictionary()
+        self._renew_lock = threading.Lock()
+
+    async def get_session(self):
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop, None)
+        if session is None or session.closed:
+            settings = self.client_api.async_transport_settings
+            connector = aiohttp.TCPConnector(limit=settings.pool_size,
+                                             limit_per_host=settings.limit_per_host,
+                                             keepalive_timeout=settings.keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector,
+                                            timeout=aiohttp.ClientTimeout(total=0),
+                                            trace_configs=[aiohttp_trace_config()])
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """
+        Close the session of the current event loop
+        """
+        session = self._sessions.pop(asyncio.get_event_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def _renew_token(self):
+        # one renewal for all the coroutines that found the token expired
+        with self._renew_lock:
+            if not self.client_api.token_expired():
+                return True
+            return self.client_api.renew_token_method()
+
+    async def _prepare_headers(self, headers=None):
+        client_api = self.client_api
+        if client_api.token_expired():
+            # renewal is a blocking http call - not on the event loop
+            renewed = await asyncio.get_event_loop().run_in_executor(None, self._renew_token)
+            if renewed is False:
+                raise exceptions.PlatformException('600', 'Token expired, Please login.')
+        headers_req = client_api.auth
+        headers_req['User-Agent'] = requests_toolbelt.user_agent('dtlpy', __version__.version)
+        if headers is not None:
+            if not isinstance(headers, dict):
+                raise exceptions.PlatformException(error=400, message="Input 'headers' must be a dictionary")
+            headers_req.update(headers)
+        return headers_req
+
+    @staticmethod
+    def _request_body(data, json_req):
+        if json_req is not None:
+            return json.dumps(json_req).encode('utf-8')
+        if isinstance(data, str):
+            return data.encode('utf-8')
+        if data is None or isinstance(data, bytes):
+            return data
+        # form data and streams are not read
+        return None
+
+    async def _send(self, req_type, path, data=None, json_req=None, headers=None, url=None):
+        req_type = req_type.upper()
+        valid_request_type = ['GET', 'DELETE', 'POST', 'PUT', 'PATCH']
+        assert req_type in valid_request_type, '[ERROR] type: %s NOT in valid requests' % req_type
+
+        if url is None:
+            url = self.client_api.environment + path
+            headers = await self._prepare_headers(headers=headers)
+            if req_type in ['POST', 'PUT'] and IDEMPOTENCY_HEADER not in headers:
+                headers[IDEMPOTENCY_HEADER] = self.client_api.retry_policy.new_idempotency_key()
+        traffic = self.client_api.traffic
+        metrics_ticket = self.client_api.metrics.start()
+        span = None
+        if self.client_api.tracer.active:
+            # coroutines interleave on the loop thread - not a parent of later spans
+            span = self.client_api.tracer.start_span('http.request',
+                                                     nest=False,
+                                                     method=req_type,
+                                                     route=Metrics.route_template(path) if path is not None else None,
+                                                     url=url)
+        resp = None
+        error = None
+        try:
+            if traffic.is_replaying:
+                resp = await traffic.replayed(method=req_type, url=url, headers=headers,
+                                              body=self._request_body(data=data, json_req=json_req))
+            else:
+                session = await self.get_session()
+                start = time.time()
+                resp = await session.request(method=req_type,
+                                             url=url,
+                                             data=data,
+                                             json=json_req,
+                                             headers=headers,
+                                             ssl=None if self.client_api.verify else False,
+                                             trace_request_ctx=span)
+                if traffic.is_capturing:
+                    resp = await traffic.captured(resp=resp, method=req_type, url=url, headers=headers,
+                                                  body=self._request_body(data=data, json_req=json_req),
+                                                  start=start)
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            if span is not None:
+                span.response = resp
+                if resp is not None:
+                    span.set_attribute('status_code', resp.status)
+                    span.set_attribute('bytes_in', resp.content_length)
+                self.client_api.tracer.end_span(span, error=error)
+            if metrics_ticket is not None:
+                self.client_api.metrics.record(ticket=metrics_ticket,
+                                               method=req_type,
+                                               path=self.client_api._metrics_path(url),
+                                               status_code=resp.status if resp is not None else None,
+                                               bytes_out=len(data) if isinstance(data, bytes) else 0,
+                                               bytes_in=(resp.content_length or 0) if resp is not None else 0)
+        with threadLock:
+            self.client_api.calls_counter.add()
+        return resp
+
+    async def gen_request(self, req_type, path, data=None, json_req=None, headers=None, log_error=True):
+        """
+        Generic request from platform
+
+        :param req_type:
+        :param path:
+        :param data:
+        :param json_req:
+        :param headers:
+        :param log_error:
+        :return: success, AsyncResponse
+        """
+        async with await self._send(req_type=req_type,
+                                    path=path,
+                                    data=data,
+                                    json_req=json_req,
+                                    headers=headers) as resp:
+            text = await resp.text()
+            try:
+                _json = await resp.json(content_type=None)
+            except ValueError:
+                _json = dict()
+            if _json is None:
+                # empty body (e.g. 204) - same as a body that is not json
+                _json = dict()
+            response = AsyncResponse(text=text,
+                                     _json=_json,
+                                     async_resp=resp)
+        if not response.ok:
+            self.client_api.print_bad_response(response, log_error=log_error and not self.client_api.is_cli)
+            return False, response
+        return True, response
+
+    async def stream(self, path=None, chunk_size=8192, headers=None, url=None):
+        """
+        Stream a GET response from platform
+
+        :param path: platform path
+        :param chunk_size: size of each chunk
+        :param headers:
+        :param url: optional - external url to stream from (no authorization is sent)
+        :return: AsyncStream
+        """
+        resp = await self._send(req_type='GET', path=path, headers=headers, url=url)
+        if resp.status >= 400:
+            text = await resp.text()
+            resp.release()
+            response = AsyncResponse(text=text, _json=dict(), async_resp=resp)
+            self.client_api.print_bad_response(response)
+            raise exceptions.PlatformException(response)
+        return AsyncStream(response=resp, chunk_size=chunk_size)
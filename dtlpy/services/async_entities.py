@@ -1,4 +1,7 @@
-import io
+from .. import miscellaneous
+
+# heavy - imported on first use
+asyncio = miscellaneous.LazyImport('asyncio')
 
 
 class AsyncResponse:
@@ -45,18 +48,30 @@ class AsyncResponseError(AsyncResponse):
         async_resp = DummyErrorResponse(error=error, trace=trace)
         _json = {'error': error}
         text = error
-        super(AsyncResponseError).__init__(async_resp=async_resp,
-                                           _json=_json,
-                                           text=text)
+        super(AsyncResponseError, self).__init__(async_resp=async_resp,
+                                                 _json=_json,
+                                                 text=text)
+
 
+class AsyncUploadStream:
+    """
+    Upload body as an async iterator of chunks. The chunks are read on the loop's default executor -
+    uploads sharing the transport loop do not wait for each other's disk reads
+    """
 
-class AsyncUploadStream(io.IOBase):
-    def __init__(self, buffer, callback=None):
+    def __init__(self, buffer, callback=None, chunk_size=64 * 1024):
         self.buffer = buffer
         self.buffer.seek(0)
         self.callback = callback
+        self.chunk_size = chunk_size
+
+    def __aiter__(self):
+        return self
 
-    def read(self, size):
+    async def __anext__(self):
+        chunk = await asyncio.get_event_loop().run_in_executor(None, self.buffer.read, self.chunk_size)
+        if not chunk:
+            raise StopAsyncIteration
         if self.callback is not None:
-            self.callback(size)
-        return self.buffer.read(size)
+            self.callback(len(chunk))
+        return chunk
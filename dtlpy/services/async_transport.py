@@ -0,0 +1,193 @@
+"""
+Long-lived aiohttp transport running on a dedicated event loop
+"""
+import threading
+import logging
+import atexit
+import os
+
+from .tracing import aiohttp_trace_config
+from .. import miscellaneous
+
+# heavy - imported on first use
+aiohttp = miscellaneous.LazyImport('aiohttp')
+asyncio = miscellaneous.LazyImport('asyncio')
+
+logger = logging.getLogger(name=__name__)
+
+
+class AsyncTransportSettings:
+    """
+    Connection pool settings for the async transport (saved in cookie)
+    """
+    __DEFAULT_POOL_SIZE = 100
+    __DEFAULT_LIMIT_PER_HOST = 0
+    __DEFAULT_KEEPALIVE_TIMEOUT = 15
+
+    def __init__(self, cookie, on_change=None):
+        self.cookie = cookie
+        self.on_change = on_change
+        dictionary = self.cookie.get('async_transport')
+        if isinstance(dictionary, dict):
+            self.from_cookie(dictionary)
+        else:
+            self._pool_size = self.__DEFAULT_POOL_SIZE
+            self._limit_per_host = self.__DEFAULT_LIMIT_PER_HOST
+            self._keepalive_timeout = self.__DEFAULT_KEEPALIVE_TIMEOUT
+            self.to_cookie()
+
+    def to_cookie(self):
+        dictionary = {'pool_size': self._pool_size,
+                      'limit_per_host': self._limit_per_host,
+                      'keepalive_timeout': self._keepalive_timeout}
+        self.cookie.put(key='async_transport', value=dictionary)
+
+    def from_cookie(self, dictionary):
+        self._pool_size = dictionary.get('pool_size', self.__DEFAULT_POOL_SIZE)
+        self._limit_per_host = dictionary.get('limit_per_host', self.__DEFAULT_LIMIT_PER_HOST)
+        self._keepalive_timeout = dictionary.get('keepalive_timeout', self.__DEFAULT_KEEPALIVE_TIMEOUT)
+
+    def __changed(self):
+        self.to_cookie()
+        if self.on_change is not None:
+            self.on_change()
+
+    @property
+    def pool_size(self):
+        """
+        Total number of simultaneous connections (0 for unlimited)
+        """
+        return self._pool_size
+
+    @pool_size.setter
+    def pool_size(self, val):
+        self._pool_size = val
+        self.__changed()
+
+    @property
+    def limit_per_host(self):
+        """
+        Number of simultaneous connections to a single host (0 for unlimited)
+        """
+        return self._limit_per_host
+
+    @limit_per_host.setter
+    def limit_per_host(self, val):
+        self._limit_per_host = val
+        self.__changed()
+
+    @property
+    def keepalive_timeout(self):
+        """
+        Seconds to keep an idle connection open for reuse
+        """
+        return self._keepalive_timeout
+
+    @keepalive_timeout.setter
+    def keepalive_timeout(self, val):
+        self._keepalive_timeout = val
+        self.__changed()
+
+
+class AsyncTransport:
+    """
+    One connection-pooled aiohttp session living on a background event loop.
+    Worker threads submit coroutines with "run" and block on the result.
+    """
+
+    def __init__(self, settings):
+        assert isinstance(settings, AsyncTransportSettings)
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._pid = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _exception_handler(loop, context):
+        logger.debug("[Async] Transport caught the following exception: {}".format(context['message']))
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            # new process (fork) or first use - start a fresh loop
+            self._session = None
+            self._pid = os.getpid()
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_exception_handler(self._exception_handler)
+            self._thread = threading.Thread(target=self._run_loop,
+                                            args=(self._loop,),
+                                            name='dtlpy-async-transport')
+            self._thread.daemon = True
+            self._thread.start()
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    @property
+    def loop(self):
+        self._start()
+        return self._loop
+
+    async def get_session(self):
+        """
+        Get the shared session. Must be awaited from inside the transport loop.
+
+        :return: aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.settings.pool_size,
+                                             limit_per_host=self.settings.limit_per_host,
+                                             keepalive_timeout=self.settings.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=0),
+                                                  trace_configs=[aiohttp_trace_config()])
+        return self._session
+
+    def run(self, coro):
+        """
+        Run a coroutine on the transport loop and wait for its result
+
+        :param coro: coroutine to run
+        :return: the coroutine's result
+        """
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            # waiting here would block the loop that has to run the coroutine
+            coro.close()
+            raise RuntimeError('AsyncTransport.run was called from the transport loop - await the coroutine instead')
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result()
+
+    def reset(self):
+        """
+        Close the current session. A new one will be created (with current settings) on next use
+        """
+        if self._loop is None or self._session is None or self._pid != os.getpid():
+            return
+        session = self._session
+        self._session = None
+        if threading.current_thread() is self._thread:
+            # on the loop - close when the current callback returns
+            self._loop.create_task(session.close())
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(session.close(), self._loop).result(timeout=10)
+        except Exception:
+            logger.debug('Failed closing async transport session')
+
+    def close(self):
+        """
+        Close the session and stop the background loop
+        """
+        self.reset()
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+            self._thread = None
@@ -1,3 +1,5 @@
+import threading
+
 from .cookie import CookieIO
 
 
@@ -6,21 +8,40 @@ class CallsCounter:
         self.io = CookieIO(filepath)
         self.state = 'off'
         self.number = 0
+        # calls counted since last write - added to the file value (other processes may count too)
+        self._unsaved = 0
+        self._lock = threading.Lock()
         self.load()
 
     def add(self):
         if self.state == 'on':
-            self.load()
-            self.number += 1
+            with self._lock:
+                self.number += 1
+                self._unsaved += 1
+            # in-memory put - the file is written in the background
             self.save()
 
     def reset(self):
-        self.number = 0
-        self.save()
+        with self._lock:
+            self.number = 0
+            self._unsaved = 0
+        self.io.put('calls_counter', {'state': self.state,
+                                      'number': self.number})
+
+    def _merge(self, saved, calls):
+        with self._lock:
+            number = self._unsaved
+            self._unsaved = 0
+        if isinstance(saved, dict):
+            number += saved.get('number', 0)
+        self.number = number
+        return {'state': calls['state'],
+                'number': number}
 
     def save(self):
         self.io.put('calls_counter', {'state': self.state,
-                                      'number': self.number})
+                                      'number': self.number},
+                    merge=self._merge)
 
     def on(self):
         self.state = 'on'
@@ -32,6 +53,7 @@ class CallsCounter:
 
     def on_exit(self):
         self.save()
+        self.io.flush()
 
     def load(self):
         calls = self.io.get('calls_counter')
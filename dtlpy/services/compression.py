@@ -0,0 +1,91 @@
+import threading
+import logging
+import gzip
+
+logger = logging.getLogger(name=__name__)
+
+
+class Compression:
+    """
+    Compress request bodies above a size threshold and count the bytes saved
+    (requests and negotiated responses)
+    """
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+    def __init__(self, threshold=2048, algorithm='gzip', level=5):
+        """
+        :param threshold: minimal body size (bytes) to compress
+        :param algorithm: 'gzip' or 'zstd' (requires the zstandard package)
+        :param level: compression level
+        """
+        self.threshold = threshold
+        self.level = level
+        self._algorithm = None
+        self.algorithm = algorithm
+        self._lock = threading.Lock()
+        # counters
+        self.requests_compressed = 0
+        self.request_bytes_saved = 0
+        self.response_bytes_saved = 0
+
+    @property
+    def algorithm(self):
+        return self._algorithm
+
+    @algorithm.setter
+    def algorithm(self, algorithm):
+        if algorithm not in ['gzip', 'zstd']:
+            raise ValueError('Unknown compression algorithm: {}. known: gzip, zstd'.format(algorithm))
+        if algorithm == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstd compression requires the "zstandard" package')
+        self._algorithm = algorithm
+
+    @property
+    def bytes_saved(self):
+        return self.request_bytes_saved + self.response_bytes_saved
+
+    def stats(self):
+        with self._lock:
+            return {'requests_compressed': self.requests_compressed,
+                    'request_bytes_saved': self.request_bytes_saved,
+                    'response_bytes_saved': self.response_bytes_saved,
+                    'bytes_saved': self.bytes_saved}
+
+    def compress(self, body):
+        """
+        :param body: request body
+        :return: (compressed body, content encoding) or (None, None) if not worth compressing
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if not isinstance(body, bytes) or len(body) < self.threshold:
+            return None, None
+        if self._algorithm == 'zstd':
+            import zstandard
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(body)
+            encoding = 'zstd'
+        else:
+            compressed = gzip.compress(body, compresslevel=self.level)
+            encoding = 'gzip'
+        if len(compressed) >= len(body):
+            return None, None
+        with self._lock:
+            self.requests_compressed += 1
+            self.request_bytes_saved += len(body) - len(compressed)
+        return compressed, encoding
+
+    def record_response(self, response):
+        """
+        Count the bytes saved by a compressed (already decoded) response
+        """
+        if response.headers.get('Content-Encoding', None) not in ['gzip', 'deflate']:
+            return
+        try:
+            wire_size = int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self.response_bytes_saved += max(0, len(response.content) - wire_size)
@@ -0,0 +1,137 @@
+import collections
+import threading
+import time
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on the number of in-flight requests.
+    The limit grows additively while latency is stable and is cut multiplicatively
+    on 429/503 responses, connection errors or when the p95 latency rises above the baseline.
+    """
+    THROTTLE_STATUS_CODES = (429, 503)
+
+    def __init__(self, max_limit, min_limit=1, initial_limit=None, backoff=0.5, latency_tolerance=2.0,
+                 window=200):
+        """
+        :param max_limit: upper bound of in-flight requests
+        :param min_limit: lower bound of in-flight requests
+        :param initial_limit: starting limit. default is max_limit
+        :param backoff: multiplicative decrease factor
+        :param latency_tolerance: decrease when p95 latency > latency_tolerance * baseline p95
+        :param window: number of latest requests used for the latency percentiles
+        """
+        if initial_limit is None:
+            initial_limit = max_limit
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.state = 'on'
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._latencies = collections.deque(maxlen=window)
+        self._since_check = 0
+        self._p50 = None
+        self._p95 = None
+        self._baseline_p95 = None
+        self._last_decrease = 0
+        # counters
+        self.decreases = 0
+        self.throttled = 0
+
+    @property
+    def is_on(self):
+        return self.state == 'on'
+
+    def on(self):
+        self.state = 'on'
+
+    def off(self):
+        self.state = 'off'
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def limit(self):
+        return max(self.min_limit, min(self.max_limit, int(self._limit)))
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def stats(self):
+        """
+        :return: dictionary with current limit, in-flight requests and observed latency (seconds)
+        """
+        with self._cond:
+            return {'limit': self.limit,
+                    'in_flight': self._in_flight,
+                    'latency_p50': self._p50,
+                    'latency_p95': self._p95,
+                    'baseline_latency_p95': self._baseline_p95,
+                    'decreases': self.decreases,
+                    'throttled': self.throttled}
+
+    def acquire(self):
+        """
+        Wait for a free slot
+
+        :return: ticket to pass to "release" (None if limiter is off)
+        """
+        if not self.is_on:
+            return None
+        with self._cond:
+            while self.is_on and self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        return time.time()
+
+    def release(self, ticket, status_code=None):
+        """
+        Free a slot and update the limit
+
+        :param ticket: acquire's return value
+        :param status_code: response status code. None for connection errors
+        """
+        if ticket is None:
+            return
+        now = time.time()
+        latency = now - ticket
+        with self._cond:
+            self._in_flight -= 1
+            if status_code is None or status_code in self.THROTTLE_STATUS_CODES:
+                self.throttled += 1
+                self._decrease(now=now)
+            else:
+                self._latencies.append(latency)
+                self._since_check += 1
+                if self._since_check >= max(10, self._latencies.maxlen // 10):
+                    self._since_check = 0
+                    self._update_percentiles()
+                    if self._baseline_p95 is not None and self._p95 > self.latency_tolerance * self._baseline_p95:
+                        self._decrease(now=now)
+                    else:
+                        # latency is stable - follow it slowly
+                        if self._baseline_p95 is None:
+                            self._baseline_p95 = self._p95
+                        else:
+                            self._baseline_p95 = 0.9 * self._baseline_p95 + 0.1 * self._p95
+                # additive increase: about one more slot per round trip of the whole window
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+            self._cond.notify_all()
+
+    def _update_percentiles(self):
+        latencies = sorted(self._latencies)
+        self._p50 = latencies[int(0.5 * (len(latencies) - 1))]
+        self._p95 = latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _decrease(self, now):
+        # at most one decrease per round trip - a burst of errors is one congestion signal
+        cooldown = self._p50 if self._p50 is not None else 0.1
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        self.decreases += 1
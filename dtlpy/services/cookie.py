@@ -2,24 +2,48 @@
 Dataloop cookie state
 """
 
+import threading
+import tempfile
+import atexit
+import stat
+import copy
 import os
 import time
 import json
 import logging
 
+try:
+    import fcntl
+except ImportError:
+    # windows - no advisory locks, writes are still atomic
+    fcntl = None
+
 logger = logging.getLogger(name=__name__)
 
 NUM_TRIES = 3
+# seconds to wait for more writes before flushing to file
+FLUSH_DELAY = 0.5
 
 
 class CookieIO:
     """
-    Cookie interface for Dataloop parameters
+    Cookie interface for Dataloop parameters.
+    Keeps an in-memory copy that is re-read only when the file changes on disk.
+    Writes are batched and flushed in the background (atomic rename, under an advisory file lock)
     """
 
     def __init__(self, path, create=True, local=False):
         self.COOKIE = path
         self.local = local
+        self._lock = threading.RLock()
+        # in-memory copy and the file signature it was read from
+        self._cfg = None
+        self._signature = None
+        self._cfg_path = None
+        # keys waiting for flush: key -> (value, merge)
+        self._dirty = dict()
+        self._timer = None
+        atexit.register(self.flush)
         if create:
             self.create()
 
@@ -54,7 +78,33 @@ class CookieIO:
             print('{} is corrupted'.format(self.COOKIE))
             raise SystemExit
 
-    def read_json(self, create=False):
+    @staticmethod
+    def _file_signature(path):
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        # atomic rename changes the inode - catches writes within the same mtime tick
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+    def _load_file(self):
+        cfg = {}
+        for i in range(NUM_TRIES):
+            try:
+                with open(self.COOKIE, 'r') as fp:
+                    cfg = json.load(fp)
+                break
+            except ValueError:
+                if i == (NUM_TRIES - 1):
+                    raise
+                time.sleep(0.1)
+                continue
+        return cfg
+
+    def _refresh(self, create=False):
+        """
+        Re-read the file if it changed since last read (by this or another process)
+        """
         # which cookie
         if self.local:
             self.COOKIE = os.path.join(os.getcwd(), '.dataloop', 'state.json')
@@ -63,47 +113,146 @@ class CookieIO:
         if not os.path.isfile(self.COOKIE) and create:
             self.create()
 
-        # check if file exists
-        if not os.path.isfile(self.COOKIE):
+        signature = self._file_signature(self.COOKIE)
+        if self._cfg is not None and signature == self._signature and self._cfg_path == self.COOKIE:
+            return
+        if signature is None:
             logger.debug('COOKIE.read: File does not exist: {}. Return None'.format(self.COOKIE))
             cfg = {}
         else:
-            # read cookie
-            cfg = {}
-            for i in range(NUM_TRIES):
-                try:
-                    with open(self.COOKIE, 'r') as fp:
-                        cfg = json.load(fp)
-                    break
-                except ValueError:
-                    if i == (NUM_TRIES - 1):
-                        raise
-                    time.sleep(0.1)
-                    continue
-        return cfg
+            cfg = self._load_file()
+        if self._cfg_path != self.COOKIE:
+            # local cookie moved with the working directory
+            self._dirty = dict()
+        # pending writes of this process win over the file
+        for key, (value, _) in self._dirty.items():
+            cfg[key] = value
+        self._cfg = cfg
+        self._signature = signature
+        self._cfg_path = self.COOKIE
+
+    def read_json(self, create=False):
+        with self._lock:
+            self._refresh(create=create)
+            return copy.deepcopy(self._cfg)
 
     def get(self, key):
         if key not in ['calls_counter']:
             # ignore logging for some keys
             logger.debug('COOKIE.read: key: {}'.format(key))
-        cfg = self.read_json()
-        if key in cfg.keys():
-            value = cfg[key]
-        else:
+        with self._lock:
+            self._refresh()
+            found = key in self._cfg
+            value = copy.deepcopy(self._cfg[key]) if found else None
+        if not found:
             logger.warning(msg='Key not in platform cookie file: %s. Return None' % key)
-            value = None
         return value
 
-    def put(self, key, value):
+    def put(self, key, value, merge=None):
+        """
+        Set a key. The file is written in the background
+
+        :param key:
+        :param value: json serializable value
+        :param merge: optional - callable(value_on_file, value) that returns the value to write.
+                      called at flush time under the file lock (e.g. to sum counters of several processes)
+        """
         if key not in ['calls_counter']:
             # ignore logging for some keys
             logger.debug('COOKIE.write: key: {}'.format(key))
-        # read and write
-        cfg = self.read_json(create=True)
-        cfg[key] = value
-        with open(self.COOKIE, 'w') as fp:
-            json.dump(cfg, fp, indent=2)
+        with self._lock:
+            self._refresh(create=True)
+            value = copy.deepcopy(value)
+            self._cfg[key] = value
+            self._dirty[key] = (value, merge)
+            if self._timer is None:
+                self._timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Write pending keys to file
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            dirty = self._dirty
+            self._dirty = dict()
+            try:
+                with self._file_lock():
+                    # merge into the latest file - keys written by other processes are kept
+                    cfg = self._load_file() if os.path.isfile(self.COOKIE) else {}
+                    for key, (value, merge) in dirty.items():
+                        if merge is not None:
+                            value = merge(cfg.get(key, None), value)
+                        cfg[key] = value
+                    self._write(cfg)
+            except Exception:
+                logger.exception('COOKIE.write: failed to write: {}'.format(self.COOKIE))
+                # keep for next flush (unless overwritten meanwhile)
+                for key, pending in dirty.items():
+                    self._dirty.setdefault(key, pending)
+                return
+            self._cfg = cfg
+            self._cfg_path = self.COOKIE
+            self._signature = self._file_signature(self.COOKIE)
+
+    def _file_lock(self):
+        return _FileLock(self.COOKIE + '.lock')
+
+    def _write(self, cfg):
+        # write to temp file and rename - readers never see a half written cookie
+        directory = os.path.dirname(self.COOKIE)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.cookie', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(cfg, fp, indent=2)
+            if os.path.isfile(self.COOKIE):
+                # keep the permissions of the existing file (mkstemp creates 0600)
+                os.chmod(temp_path, stat.S_IMODE(os.stat(self.COOKIE).st_mode))
+            os.replace(temp_path, self.COOKIE)
+        except Exception:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            raise
 
     def reset(self):
-        with open(self.COOKIE, 'w') as fp:
-            json.dump({}, fp, indent=2)
+        with self._lock:
+            self._dirty = dict()
+            with self._file_lock():
+                self._write({})
+            self._cfg = {}
+            self._cfg_path = self.COOKIE
+            self._signature = self._file_signature(self.COOKIE)
+
+
+class _FileLock:
+    """
+    Advisory inter-process lock on a side file (no-op where fcntl is not available)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._fp = open(self.path, 'a')
+        fcntl.flock(self._fp.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._fp is not None:
+            fcntl.flock(self._fp.fileno(), fcntl.LOCK_UN)
+            self._fp.close()
+            self._fp = None
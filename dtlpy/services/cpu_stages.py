@@ -0,0 +1,159 @@
+import multiprocessing
+import threading
+import logging
+
+logger = logging.getLogger(name=__name__)
+
+# CPU-bound stages that can run in a process pool
+STAGES = ('mask.render',
+          'segmentation.encode',
+          'segmentation.decode',
+          'polygon.from_segmentation',
+          'coco.rle')
+THREAD = 'thread'
+PROCESS = 'process'
+# arrays from this size are returned through shared memory instead of the result pipe
+SHARED_MEMORY_MIN_BYTES = 1024 * 1024
+
+
+class SharedArray:
+    """
+    Picklable reference of a numpy array in shared memory (process -> caller)
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+def share(value):
+    """
+    Called in the worker process: replace large numpy arrays with SharedArray
+
+    :param value: stage's return value (array, tuple or anything picklable)
+    :return: picklable value
+    """
+    if isinstance(value, tuple):
+        return tuple(share(v) for v in value)
+    nbytes = getattr(value, 'nbytes', 0)
+    if nbytes < SHARED_MEMORY_MIN_BYTES or not hasattr(value, 'shape'):
+        return value
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        # python < 3.8 - pickled through the result pipe
+        return value
+    import numpy as np
+    memory = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        np.ndarray(value.shape, dtype=value.dtype, buffer=memory.buf)[...] = value
+        # the caller unlinks it - this process' resource tracker must not
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+        return SharedArray(name=memory.name, shape=value.shape, dtype=value.dtype.str)
+    finally:
+        memory.close()
+
+
+def receive(value):
+    """
+    Called in the caller process: copy SharedArray back to numpy and free the shared memory
+
+    :param value: share's return value
+    :return: stage's return value
+    """
+    if isinstance(value, tuple):
+        return tuple(receive(v) for v in value)
+    if not isinstance(value, SharedArray):
+        return value
+    from multiprocessing import shared_memory
+    import numpy as np
+    memory = shared_memory.SharedMemory(name=value.name)
+    try:
+        return np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=memory.buf).copy()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def _run_stage(func, payload):
+    # process pool entry point
+    return share(func(**payload))
+
+
+class CpuStages:
+    """
+    Where the CPU-bound stages run: in the calling thread (default) or, per stage, in a process pool.
+    Stage functions are module-level/static functions with picklable payloads (json, arrays, shapes) -
+    never entities holding a client.
+    e.g. dl.client_api.cpu_stages.set_mode(stage='mask.render', mode='process')
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: process pool size. default: number of cpus
+        """
+        self.max_workers = max_workers
+        self._modes = {stage: THREAD for stage in STAGES}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def modes(self):
+        return dict(self._modes)
+
+    def mode(self, stage):
+        if stage not in self._modes:
+            raise ValueError('unknown cpu stage: {}. known stages: {}'.format(stage, list(STAGES)))
+        return self._modes[stage]
+
+    def set_mode(self, stage, mode):
+        """
+        :param stage: one of STAGES or "all"
+        :param mode: "thread" or "process". process workers are not forked - the main script
+                     needs an "if __name__ == '__main__':" guard
+        """
+        if mode not in [THREAD, PROCESS]:
+            raise ValueError('unknown cpu stage mode: {}. known modes: {}'.format(mode, [THREAD, PROCESS]))
+        stages = list(STAGES) if stage == 'all' else [stage]
+        for name in stages:
+            self.mode(name)
+            self._modes[name] = mode
+
+    def run(self, stage, func, **payload):
+        """
+        Run a stage
+
+        :param stage: stage name
+        :param func: picklable (module-level or static) function
+        :param payload: func's keyword arguments - picklable and small where possible
+        :return: func's return value
+        """
+        if self.mode(stage) == THREAD:
+            return func(**payload)
+        # the calling thread waits - other threads keep feeding the processes
+        return receive(self._get_pool().apply_async(_run_stage, args=(func, payload)).get())
+
+    def close(self):
+        """
+        Stop the process pool (started again on the next process stage)
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                logger.debug('Starting cpu stages process pool')
+                # not forked - a fork copies the locks held by the executor, transport and cookie threads
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = multiprocessing.get_context(method).Pool(processes=self.max_workers)
+            return self._pool
+
+
+# one process pool for all clients - the cpus are shared anyway
+default = CpuStages()
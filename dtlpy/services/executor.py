@@ -0,0 +1,369 @@
+import multiprocessing
+import collections
+import threading
+import logging
+import time
+
+logger = logging.getLogger(name=__name__)
+
+# priority classes, highest first: page fetches feed entity creation which feeds the bulk I/O
+PRIORITY_CLASSES = ('page', 'entity', 'bulk')
+# named pools -> priority class
+POOLS = {'item.page': 'page',
+         'entity.create': 'entity',
+         'item.upload': 'bulk',
+         'item.download': 'bulk',
+         'annotation.upload': 'bulk',
+         'annotation.download': 'bulk',
+         'annotation.update': 'bulk'}
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+
+
+class ExecutorTask:
+    """
+    Result of PriorityExecutor.apply_async (same interface as multiprocessing's ApplyResult)
+    """
+
+    def __init__(self, executor, priority_class, func, args, kwds, callback, error_callback):
+        self._executor = executor
+        self.priority_class = priority_class
+        self._func = func
+        self._args = args
+        self._kwds = kwds
+        self._callback = callback
+        self._error_callback = error_callback
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+        # changed under the executor lock
+        self.state = PENDING
+
+    def run(self):
+        stats = self._executor.classes[self.priority_class]
+        local = self._executor._local
+        # class of the task running on this thread - nested inline tasks restore the outer one
+        outer_class = getattr(local, 'priority_class', None)
+        local.priority_class = self.priority_class
+        start = time.time()
+        try:
+            self._value = self._func(*self._args, **self._kwds)
+        except Exception as err:
+            self._error = err
+        finally:
+            local.priority_class = outer_class
+            self._executor._task_done(stats=stats, failed=self._error is not None, busy=time.time() - start)
+        callback = self._error_callback if self._error is not None else self._callback
+        # free the references before waking the waiters
+        self._func = self._args = self._kwds = self._callback = self._error_callback = None
+        try:
+            if callback is not None:
+                callback(self._error if self._error is not None else self._value)
+        except Exception:
+            logger.exception('Executor callback failed:')
+        finally:
+            self.state = DONE
+            self._event.set()
+
+    def ready(self):
+        return self._event.is_set()
+
+    def successful(self):
+        if not self.ready():
+            raise ValueError('Task is not ready')
+        return self._error is None
+
+    def try_run(self):
+        """
+        Run the task on the calling worker if no other worker picked it yet
+
+        :return: True if the task ran
+        """
+        if self.state == PENDING and self._executor.in_worker() and self._executor._claim(self):
+            self.run()
+            return True
+        return False
+
+    def wait(self, timeout=None):
+        # a worker waiting for a task no other worker picked yet runs it itself - no self-deadlock
+        self.try_run()
+        self._event.wait(timeout)
+
+    def get(self, timeout=None):
+        self.wait(timeout)
+        if not self.ready():
+            raise multiprocessing.TimeoutError
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class ClassStats:
+    """
+    Counters of one priority class
+    """
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        # run on the submitting worker's thread (nested submission with no free worker or the class at its limit)
+        self.inline = 0
+        self.queued = 0
+        self.running = 0
+        self.busy_seconds = 0.0
+
+    def to_json(self):
+        return {'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'inline': self.inline,
+                'queued': self.queued,
+                'running': self.running,
+                'busy_seconds': self.busy_seconds}
+
+
+class ExecutorPool:
+    """
+    ThreadPool-like handle of a named pool: submits to its priority class of the shared executor
+    """
+
+    def __init__(self, executor, name, priority_class):
+        self.executor = executor
+        self.name = name
+        self.priority_class = priority_class
+
+    @property
+    def processes(self):
+        return self.executor.num_workers
+
+    def in_worker(self):
+        return self.executor.in_worker()
+
+    def apply_async(self, func, args=(), kwds=None, callback=None, error_callback=None):
+        return self.executor.apply_async(priority_class=self.priority_class,
+                                         func=func,
+                                         args=args,
+                                         kwds=kwds,
+                                         callback=callback,
+                                         error_callback=error_callback)
+
+
+class PriorityExecutor:
+    """
+    One pool of worker threads for all the SDK fan-outs.
+    Queued tasks run by priority class (page > entity > bulk), FIFO within a class.
+    A class leaves "reserved" workers free for each class above it - bulk I/O cannot take all the workers.
+    A worker submitting to its own class at the limit runs the task inline - nested fan-outs cannot deadlock.
+    Workers are started on demand, resize() never interrupts running tasks
+    """
+
+    def __init__(self, num_workers, reserved=0):
+        """
+        :param num_workers: max number of worker threads
+        :param reserved: workers kept for each higher priority class. a class runs at most
+                         num_workers - reserved * (classes above it) tasks (at least one)
+        """
+        if num_workers < 1:
+            raise ValueError('num_workers must be a positive number, got: {}'.format(num_workers))
+        self._num_workers = num_workers
+        self._reserved = reserved
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # FIFO per priority class
+        self._queues = {priority_class: collections.deque() for priority_class in PRIORITY_CLASSES}
+        self._workers = set()
+        self._idle = 0
+        self._local = threading.local()
+        self._pools = dict()
+        self._started_at = time.time()
+        self.classes = {priority_class: ClassStats() for priority_class in PRIORITY_CLASSES}
+
+    @property
+    def num_workers(self):
+        return self._num_workers
+
+    def class_limit(self, priority_class):
+        """
+        :param priority_class: one of PRIORITY_CLASSES
+        :return: max tasks of the class running on workers
+        """
+        return max(1, self._num_workers - self._reserved * PRIORITY_CLASSES.index(priority_class))
+
+    def _queued(self):
+        return sum(class_stats.queued for class_stats in self.classes.values())
+
+    def resize(self, num_workers):
+        """
+        Change the number of workers. Extra workers exit after their current task
+
+        :param num_workers: max number of worker threads
+        """
+        if num_workers < 1:
+            raise ValueError('num_workers must be a positive number, got: {}'.format(num_workers))
+        with self._cond:
+            self._num_workers = num_workers
+            # growing is lazy (on submit), shrinking wakes the idle workers to exit
+            self._idle = 0
+            self._cond.notify_all()
+            while self._queued() > self._idle and len(self._workers) < self._num_workers:
+                self._start_worker()
+
+    def pool(self, pool_name):
+        """
+        :param pool_name: named pool (e.g. item.download)
+        :return: ExecutorPool
+        """
+        if pool_name not in POOLS:
+            raise ValueError('unknown thread pool name: {}. known name: {}'.format(pool_name, list(POOLS.keys())))
+        pool = self._pools.get(pool_name, None)
+        if pool is None:
+            pool = ExecutorPool(executor=self, name=pool_name, priority_class=POOLS[pool_name])
+            self._pools[pool_name] = pool
+        return pool
+
+    def in_worker(self):
+        """
+        :return: True if called from one of this executor's workers
+        """
+        return getattr(self._local, 'is_worker', False)
+
+    def apply_async(self, priority_class, func, args=(), kwds=None, callback=None, error_callback=None):
+        """
+        Submit a task
+
+        :param priority_class: one of PRIORITY_CLASSES
+        :param func: callable
+        :param args: func's positional arguments
+        :param kwds: func's keyword arguments
+        :param callback: called with the result
+        :param error_callback: called with the exception if func fails
+        :return: ExecutorTask
+        """
+        if priority_class not in self.classes:
+            raise ValueError('unknown priority class: {}. known: {}'.format(priority_class, PRIORITY_CLASSES))
+        task = ExecutorTask(executor=self,
+                            priority_class=priority_class,
+                            func=func,
+                            args=tuple(args),
+                            kwds=kwds if kwds is not None else dict(),
+                            callback=callback,
+                            error_callback=error_callback)
+        stats = self.classes[priority_class]
+        with self._cond:
+            stats.submitted += 1
+            # nested submission and all workers are busy, or the caller runs a task of a class at its limit
+            # (e.g. bulk upload -> bulk annotations upload) - queuing could wait for the caller's own thread
+            at_limit = (getattr(self._local, 'priority_class', None) == priority_class and
+                        stats.running >= self.class_limit(priority_class))
+            run_inline = self.in_worker() and (at_limit or
+                                               self._idle == 0 and len(self._workers) >= self._num_workers)
+            if run_inline:
+                stats.inline += 1
+                stats.running += 1
+                task.state = RUNNING
+            else:
+                stats.queued += 1
+                self._queues[priority_class].append(task)
+                if self._idle > 0:
+                    # the woken worker is not idle anymore even before it gets the lock
+                    self._idle -= 1
+                    self._cond.notify()
+                elif len(self._workers) < self._num_workers:
+                    self._start_worker()
+        if run_inline:
+            task.run()
+        return task
+
+    def stats(self):
+        """
+        :return: dictionary with workers counts and per priority class counters and utilization
+                 (share of the workers busy on the class since the executor was created)
+        """
+        with self._lock:
+            elapsed = max(time.time() - self._started_at, 1e-9)
+            classes = dict()
+            for priority_class, class_stats in self.classes.items():
+                classes[priority_class] = class_stats.to_json()
+                classes[priority_class]['utilization'] = class_stats.busy_seconds / (elapsed * self._num_workers)
+            return {'num_workers': self._num_workers,
+                    'workers': len(self._workers),
+                    'idle': self._idle,
+                    'classes': classes}
+
+    def queue_depth(self):
+        """
+        :return: dictionary of priority class -> tasks waiting for a worker
+        """
+        return {priority_class: class_stats.queued for priority_class, class_stats in self.classes.items()}
+
+    def running(self):
+        """
+        :return: dictionary of priority class -> running tasks
+        """
+        return {priority_class: class_stats.running for priority_class, class_stats in self.classes.items()}
+
+    def _start_worker(self):
+        # called under the lock
+        worker = threading.Thread(target=self._work, name='dtlpy-executor')
+        worker.daemon = True
+        self._workers.add(worker)
+        worker.start()
+
+    def _claim(self, task):
+        with self._lock:
+            if task.state != PENDING:
+                return False
+            # stays in the queue - workers skip tasks that are not pending
+            task.state = RUNNING
+            stats = self.classes[task.priority_class]
+            stats.queued -= 1
+            stats.running += 1
+            return True
+
+    def _task_done(self, stats, failed, busy):
+        with self._lock:
+            stats.running -= 1
+            stats.busy_seconds += busy
+            if failed:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+            if stats.queued > 0 and self._idle > 0:
+                # a task of a class at its limit can run now
+                self._idle -= 1
+                self._cond.notify()
+
+    def _next_task(self):
+        # called under the lock. returns None when the worker should exit
+        while True:
+            if len(self._workers) > self._num_workers:
+                return None
+            for priority_class in PRIORITY_CLASSES:
+                queue = self._queues[priority_class]
+                while queue and queue[0].state != PENDING:
+                    # claimed by a waiting worker
+                    queue.popleft()
+                stats = self.classes[priority_class]
+                if queue and stats.running < self.class_limit(priority_class):
+                    task = queue.popleft()
+                    task.state = RUNNING
+                    stats.queued -= 1
+                    stats.running += 1
+                    return task
+            # the notifier takes the worker off the idle count
+            self._idle += 1
+            self._cond.wait()
+
+    def _work(self):
+        self._local.is_worker = True
+        current = threading.current_thread()
+        while True:
+            with self._cond:
+                task = self._next_task()
+                if task is None:
+                    self._workers.discard(current)
+                    return
+            task.run()
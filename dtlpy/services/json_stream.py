@@ -0,0 +1,130 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+
+class JsonObjectStream:
+    """
+    Incremental reader of a JSON object whose biggest part is one array (e.g. a query page "items").
+    Elements of the array are decoded and yielded one at a time. All other fields of the object
+    are collected to "fields" (complete once the iteration is done).
+    Memory is bounded by one element and one chunk, not by the whole response
+    """
+
+    def __init__(self, chunks, array_key='items', encoding='utf-8', on_close=None):
+        """
+        :param chunks: iterable of bytes (e.g. response.iter_content())
+        :param array_key: name of the array field to stream
+        :param encoding: response encoding
+        :param on_close: callable to release the source (e.g. response.close)
+        """
+        self.array_key = array_key
+        self.fields = dict()
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._on_close = on_close
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError('JsonObjectStream can be iterated only once')
+        self._started = True
+        try:
+            self._expect('{')
+            while True:
+                char = self._next_char()
+                if char == '}':
+                    break
+                if char == ',':
+                    self._pos += 1
+                    continue
+                key = self._decode_value()
+                self._expect(':')
+                if key == self.array_key and self._next_char() == '[':
+                    self._pos += 1
+                    for element in self._iter_array():
+                        yield element
+                else:
+                    self.fields[key] = self._decode_value()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+
+    def _iter_array(self):
+        while True:
+            char = self._next_char()
+            if char == ']':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+            yield self._decode_value()
+
+    def _read(self, min_chars=1):
+        """
+        Append the next chunks (at least min_chars) to the buffer. drop the consumed part of the buffer
+
+        :return: False on end of data
+        """
+        if self._eof:
+            return False
+        parts = [self._buffer[self._pos:]]
+        n_chars = 0
+        while n_chars < min_chars:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                parts.append(self._decoder.decode(b'', final=True))
+                break
+            text = self._decoder.decode(chunk)
+            parts.append(text)
+            n_chars += len(text)
+        # one join for all chunks - a big element is not copied on every chunk
+        self._buffer = ''.join(parts)
+        self._pos = 0
+        return n_chars > 0 or not self._eof
+
+    def _next_char(self):
+        """
+        :return: next non whitespace char (not consumed)
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read():
+                raise ValueError('Unexpected end of JSON stream')
+
+    def _expect(self, char):
+        found = self._next_char()
+        if found != char:
+            raise ValueError('Expected "{}" in JSON stream, got "{}"'.format(char, found))
+        self._pos += 1
+
+    def _decode_value(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                # a number cut by the chunk ("12.", "1e") might continue in the next chunk
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in DELIMITERS):
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise
+            # double the buffer before trying again - a big element is not re-parsed on every chunk
+            self._read(min_chars=len(self._buffer) - self._pos)
@@ -0,0 +1,292 @@
+import threading
+import logging
+import bisect
+import time
+import re
+
+logger = logging.getLogger(name=__name__)
+
+# seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# path segments replaced by "{id}" in route templates: object id, uuid, number
+ID_SEGMENT = re.compile(r'^([0-9a-fA-F]{24}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)$')
+OTHER_ROUTE = '{other}'
+
+
+class Histogram:
+    """
+    Fixed buckets histogram (upper bounds, cumulative on export)
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple([float(upper) for upper in buckets])
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside its bucket
+
+        :param q: 0-1
+        :return: value (seconds) or None if empty
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i_bucket, count in enumerate(self.counts):
+            if cumulative + count >= rank and count > 0:
+                lower = self.buckets[i_bucket - 1] if i_bucket > 0 else 0.0
+                if i_bucket == len(self.buckets):
+                    # above the last bucket - nothing to interpolate with
+                    return lower
+                upper = self.buckets[i_bucket]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def to_json(self):
+        cumulative = 0
+        buckets = list()
+        for upper, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            # upper bound as text - "+Inf" is not valid json as a number
+            buckets.append([_number(upper), cumulative])
+        return {'count': self.count,
+                'sum': self.sum,
+                'buckets': buckets,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99)}
+
+
+class EndpointMetrics:
+    """
+    Counters of one method and route template
+    """
+
+    def __init__(self, method, route, buckets=DEFAULT_BUCKETS):
+        self.method = method
+        self.route = route
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.statuses = dict()
+        self.latency = Histogram(buckets=buckets)
+
+    def to_json(self):
+        return {'method': self.method,
+                'route': self.route,
+                'requests': self.requests,
+                'statuses': dict(self.statuses),
+                'errors': self.errors,
+                'retries': self.retries,
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in,
+                'latency': self.latency.to_json()}
+
+
+class Metrics:
+    """
+    In-memory registry of the platform calls: per method and route template
+    (e.g. GET /items/{id}/stream) counts, status codes, retries, bytes and latency histogram,
+    plus gauges (e.g. thread pools queue depth) read on snapshot
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_routes=500):
+        """
+        :param buckets: latency histogram buckets (seconds)
+        :param max_routes: bound of the number of tracked method-routes. more are counted under "{other}"
+        """
+        self.buckets = tuple(buckets)
+        self.max_routes = max_routes
+        self.state = 'on'
+        self._lock = threading.Lock()
+        self._endpoints = dict()
+        self._gauges = dict()
+        self._in_flight = 0
+
+    @property
+    def is_on(self):
+        return self.state == 'on'
+
+    def on(self):
+        self.state = 'on'
+
+    def off(self):
+        self.state = 'off'
+
+    @staticmethod
+    def route_template(path):
+        """
+        Replace ids in path with "{id}" and drop the query string
+
+        :param path: request path (e.g. /items/5e1f0b4a2c1d3e0012345678/stream?x=1)
+        :return: route template (e.g. /items/{id}/stream)
+        """
+        path = path.split('?', 1)[0]
+        return '/'.join(['{id}' if ID_SEGMENT.match(segment) else segment for segment in path.split('/')])
+
+    def add_gauge(self, name, func, label=None, help_text=''):
+        """
+        Register a gauge read on snapshot
+
+        :param name: metric name (e.g. thread_pool_queue_depth)
+        :param func: callable returning a number, or a dictionary of label value -> number
+        :param label: label name for a dictionary gauge (e.g. pool)
+        :param help_text: description for the OpenMetrics export
+        """
+        with self._lock:
+            self._gauges[name] = (func, label, help_text)
+
+    def start(self):
+        """
+        Mark a request start
+
+        :return: ticket to pass to "record" (None if metrics are off)
+        """
+        if not self.is_on:
+            return None
+        with self._lock:
+            self._in_flight += 1
+        return time.time()
+
+    def record(self, ticket, method, path, status_code=None, bytes_out=0, bytes_in=0, retries=0):
+        """
+        Record a finished request
+
+        :param ticket: start's return value
+        :param method: http method
+        :param path: request path or route template
+        :param status_code: response status code. None for connection errors
+        :param bytes_out: request body size
+        :param bytes_in: response body size
+        :param retries: transport retries of the request
+        """
+        if ticket is None:
+            return
+        latency = time.time() - ticket
+        route = self.route_template(path)
+        key = (method, route)
+        with self._lock:
+            self._in_flight -= 1
+            endpoint = self._endpoints.get(key, None)
+            if endpoint is None:
+                if len(self._endpoints) >= self.max_routes:
+                    key = (method, OTHER_ROUTE)
+                    endpoint = self._endpoints.get(key, None)
+                if endpoint is None:
+                    endpoint = EndpointMetrics(method=key[0], route=key[1], buckets=self.buckets)
+                    self._endpoints[key] = endpoint
+            endpoint.requests += 1
+            if status_code is None:
+                endpoint.errors += 1
+            else:
+                status_code = str(status_code)
+                endpoint.statuses[status_code] = endpoint.statuses.get(status_code, 0) + 1
+            endpoint.retries += retries
+            endpoint.bytes_out += bytes_out
+            endpoint.bytes_in += bytes_in
+            endpoint.latency.observe(latency)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = dict()
+
+    def _read_gauges(self):
+        gauges = dict()
+        for name, (func, label, help_text) in list(self._gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception:
+                logger.debug('Failed reading gauge: {}'.format(name))
+        return gauges
+
+    def snapshot(self):
+        """
+        :return: dictionary with "endpoints" (list of per method-route counters), "gauges" and "in_flight"
+        """
+        with self._lock:
+            endpoints = [endpoint.to_json() for endpoint in self._endpoints.values()]
+            in_flight = self._in_flight
+        return {'endpoints': sorted(endpoints, key=lambda e: (e['route'], e['method'])),
+                'gauges': self._read_gauges(),
+                'in_flight': in_flight}
+
+    def to_openmetrics(self, prefix='dtlpy'):
+        """
+        Render the registry in OpenMetrics (Prometheus) text format
+
+        :param prefix: metrics names prefix
+        :return: str
+        """
+        snapshot = self.snapshot()
+        endpoints = snapshot['endpoints']
+        lines = list()
+
+        def family(name, metric_type, help_text):
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, metric_type))
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+
+        def sample(name, labels, value):
+            if labels:
+                labels = '{' + ','.join(['{}="{}"'.format(k, _escape(v)) for k, v in labels]) + '}'
+            else:
+                labels = ''
+            lines.append('{}_{}{} {}'.format(prefix, name, labels, _number(value)))
+
+        family('requests', 'counter', 'Platform requests by status code')
+        for e in endpoints:
+            for status_code, count in sorted(e['statuses'].items()):
+                sample('requests_total', [('method', e['method']), ('route', e['route']), ('code', status_code)], count)
+        family('request_errors', 'counter', 'Platform requests failed without a response')
+        for e in endpoints:
+            sample('request_errors_total', [('method', e['method']), ('route', e['route'])], e['errors'])
+        family('request_retries', 'counter', 'Transport retries of platform requests')
+        for e in endpoints:
+            sample('request_retries_total', [('method', e['method']), ('route', e['route'])], e['retries'])
+        family('request_sent_bytes', 'counter', 'Request body bytes')
+        for e in endpoints:
+            sample('request_sent_bytes_total', [('method', e['method']), ('route', e['route'])], e['bytes_out'])
+        family('response_received_bytes', 'counter', 'Response body bytes')
+        for e in endpoints:
+            sample('response_received_bytes_total', [('method', e['method']), ('route', e['route'])], e['bytes_in'])
+        family('request_duration_seconds', 'histogram', 'Platform requests latency')
+        for e in endpoints:
+            labels = [('method', e['method']), ('route', e['route'])]
+            for upper, count in e['latency']['buckets']:
+                sample('request_duration_seconds_bucket', labels + [('le', upper)], count)
+            sample('request_duration_seconds_count', labels, e['latency']['count'])
+            sample('request_duration_seconds_sum', labels, e['latency']['sum'])
+        family('requests_in_flight', 'gauge', 'Platform requests in flight')
+        sample('requests_in_flight', None, snapshot['in_flight'])
+        for name, value in sorted(snapshot['gauges'].items()):
+            _, label, help_text = self._gauges[name]
+            family(name, 'gauge', help_text)
+            if isinstance(value, dict):
+                for label_value, gauge_value in sorted(value.items()):
+                    sample(name, [(label, label_value)], gauge_value)
+            else:
+                sample(name, None, value)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return '{:.1f}'.format(value)
+    return str(value)
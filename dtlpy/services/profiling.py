@@ -0,0 +1,468 @@
+"""
+Opt-in memory and cpu profiling of the long-running SDK operations
+(upload, download, download_annotations, convert_dataset and PagedEntities.all):
+
+    with dl.profiling.session() as session:
+        dataset.items.download(local_path='/tmp/dataset')
+    session.print_report()
+
+Off by default - without a session the profiled entry points cost one attribute check
+"""
+import collections
+import contextlib
+import tracemalloc
+import functools
+import threading
+import datetime
+import inspect
+import logging
+import json
+import time
+import sys
+import os
+
+from .. import exceptions
+
+logger = logging.getLogger(name=__name__)
+
+DEFAULT_COUNTED_CLASSES = ['Item', 'Annotation', 'FrameAnnotation']
+# leaf frames of threads waiting for work - counted as idle, not as stage samples
+IDLE_MODULES = ['threading.py', 'queue.py', 'selectors.py', 'socket.py', 'ssl.py']
+# background threads that never work for a stage
+IGNORED_THREADS = ['dtlpy-profiler', 'dtlpy-check-sdk']
+
+# the running ProfilingSession (one per process)
+_session = None
+_session_lock = threading.Lock()
+# thread ident -> stack of the stage paths entered by the thread
+_thread_stages = dict()
+
+
+def _rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+
+
+def _frame_name(frame):
+    filename = frame.f_code.co_filename
+    if os.sep + 'dtlpy' + os.sep in filename:
+        filename = 'dtlpy/' + filename.rsplit(os.sep + 'dtlpy' + os.sep, 1)[1].replace(os.sep, '/')
+    else:
+        filename = os.path.basename(filename)
+    return '{} ({}:{})'.format(frame.f_code.co_name, filename, frame.f_lineno)
+
+
+class StageStats:
+    """
+    Time, memory, stack samples and allocations of one stage (nested stages are "parent/child")
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.max_traced_bytes = 0
+        self.max_rss_bytes = 0
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self.self_samples = collections.Counter()
+        self.inclusive_samples = collections.Counter()
+        self.allocations = collections.Counter()
+
+    def to_json(self, top=10):
+        return {'calls': self.calls,
+                'wall_time': self.wall_time,
+                'cpu_time': self.cpu_time,
+                'max_traced_bytes': self.max_traced_bytes,
+                'max_rss_bytes': self.max_rss_bytes,
+                'samples': self.samples,
+                'allocations': dict(self.allocations),
+                'top_functions': [{'function': function,
+                                   'self_samples': count,
+                                   'inclusive_samples': self.inclusive_samples[function]}
+                                  for function, count in self.self_samples.most_common(top)],
+                'top_stacks': [{'stack': list(stack), 'samples': count}
+                               for stack, count in self.stacks.most_common(top)]}
+
+
+class ProfilingSession:
+    """
+    Periodic tracemalloc snapshots, stack sampling of the threads per stage and allocation counts of
+    the entity classes. Use as a context manager (see session())
+    """
+
+    def __init__(self, sample_interval=0.01, snapshot_interval=1.0, traceback_frames=1, max_depth=32,
+                 counted_classes=None):
+        """
+        :param sample_interval: seconds between stack samples of all the threads
+        :param snapshot_interval: seconds between memory measurements (a tracemalloc snapshot is taken at peaks)
+        :param traceback_frames: frames stored per tracemalloc allocation (more frames - more overhead)
+        :param max_depth: frames per sampled stack
+        :param counted_classes: entities classes names to count the instances created of
+        """
+        if counted_classes is None:
+            counted_classes = DEFAULT_COUNTED_CLASSES
+        self.sample_interval = sample_interval
+        self.snapshot_interval = snapshot_interval
+        self.traceback_frames = traceback_frames
+        self.max_depth = max_depth
+        self.counted_classes = counted_classes
+        self.stages = collections.OrderedDict()
+        self.allocations = collections.Counter()
+        self.timeline = list()
+        self.idle_samples = 0
+        self.start_time = None
+        self.end_time = None
+        self.cpu_time = None
+        self.peak_traced_bytes = 0
+        self.peak_rss_bytes = 0
+        self._open = list()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracemalloc = False
+        self._start_snapshot = None
+        self._peak_snapshot = None
+        self._patched = list()
+        self._cpu_start = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    ###########
+    # Running #
+    ###########
+    def start(self):
+        global _session
+        with _session_lock:
+            if _session is not None:
+                raise exceptions.PlatformException('400', 'A profiling session is already running')
+            _session = self
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+            self._started_tracemalloc = True
+        self._start_snapshot = self._snapshot()
+        self._patch_classes()
+        self.start_time = time.time()
+        self._cpu_start = time.process_time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dtlpy-profiler')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        global _session
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._measure_memory()
+        with _session_lock:
+            _session = None
+        self._unpatch_classes()
+        self.end_time = time.time()
+        self.cpu_time = time.process_time() - self._cpu_start
+        if self._peak_snapshot is None:
+            self._peak_snapshot = self._snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _run(self):
+        next_measure = time.time()
+        while not self._stop.wait(self.sample_interval):
+            self._sample_stacks()
+            if time.time() >= next_measure:
+                self._measure_memory()
+                next_measure = time.time() + self.snapshot_interval
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                          tracemalloc.Filter(False, __file__)])
+
+    def _measure_memory(self):
+        traced, _ = tracemalloc.get_traced_memory()
+        rss = _rss_bytes() or 0
+        with self._lock:
+            self.timeline.append((time.time() - self.start_time, traced, rss))
+            for name in self._open:
+                stats = self.stages[name]
+                stats.max_traced_bytes = max(stats.max_traced_bytes, traced)
+                stats.max_rss_bytes = max(stats.max_rss_bytes, rss)
+            new_peak = traced > self.peak_traced_bytes
+            self.peak_traced_bytes = max(self.peak_traced_bytes, traced)
+            self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        if new_peak:
+            # what holds the memory at its highest
+            self._peak_snapshot = self._snapshot()
+
+    def _sample_stacks(self):
+        ignored = set(thread.ident for thread in threading.enumerate() if thread.name in IGNORED_THREADS)
+        for ident, frame in sys._current_frames().items():
+            if ident in ignored:
+                continue
+            name = self._stage_of(ident)
+            if name is None:
+                continue
+            if os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                with self._lock:
+                    self.idle_samples += 1
+                continue
+            stack = list()
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            # functions are counted without the line number
+            functions = [entry.rsplit(':', 1)[0] + ')' for entry in stack]
+            with self._lock:
+                stats = self.stages[name]
+                stats.samples += 1
+                stats.stacks[tuple(stack)] += 1
+                stats.self_samples[functions[0]] += 1
+                for function in set(functions):
+                    stats.inclusive_samples[function] += 1
+
+    def _stage_of(self, ident):
+        """
+        :return: innermost stage of the thread, or the latest open stage for worker threads
+        """
+        stack = _thread_stages.get(ident, None)
+        if stack:
+            return stack[-1]
+        open_stages = self._open
+        return open_stages[-1] if open_stages else None
+
+    ###############
+    # Allocations #
+    ###############
+    def _patch_classes(self):
+        from .. import entities
+        for name in self.counted_classes:
+            cls = getattr(entities, name)
+            original = cls.__dict__['__init__']
+            cls.__init__ = self._counting_init(cls=cls, original=original)
+            self._patched.append((cls, original))
+
+    def _unpatch_classes(self):
+        for cls, original in self._patched:
+            cls.__init__ = original
+        self._patched = list()
+
+    def _counting_init(self, cls, original):
+        name = cls.__name__
+
+        @functools.wraps(original)
+        def __init__(instance, *args, **kwargs):
+            stage_name = self._stage_of(threading.get_ident())
+            with self._lock:
+                self.allocations[name] += 1
+                if stage_name is not None:
+                    self.stages[stage_name].allocations[name] += 1
+            original(instance, *args, **kwargs)
+
+        return __init__
+
+    ##########
+    # Stages #
+    ##########
+    def _entered(self, name, call):
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageStats(name=name)
+            if call:
+                self.stages[name].calls += 1
+            self._open.append(name)
+        return time.time(), time.process_time()
+
+    def _exited(self, name, start):
+        wall_start, cpu_start = start
+        with self._lock:
+            stats = self.stages[name]
+            stats.wall_time += time.time() - wall_start
+            stats.cpu_time += time.process_time() - cpu_start
+            if name in self._open:
+                self._open.remove(name)
+
+    ##########
+    # Report #
+    ##########
+    def top_allocators(self, top=10, key_type='lineno'):
+        """
+        :param top: number of allocators
+        :param key_type: tracemalloc grouping - 'lineno', 'filename' or 'traceback'
+        :return: allocation sites holding the most memory at the peak (compared to the session start)
+        """
+        if self._peak_snapshot is None:
+            return list()
+        stats = self._peak_snapshot.compare_to(self._start_snapshot, key_type)
+        return [{'location': '{}:{}'.format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                 'traceback': [str(frame) for frame in stat.traceback],
+                 'size': stat.size_diff,
+                 'count': stat.count_diff}
+                for stat in stats[:top] if stat.size_diff > 0]
+
+    def report(self, top=10):
+        """
+        :param top: number of top allocators, functions and stacks
+        :return: dictionary - per stage time/memory/samples/allocations, top allocators and the memory timeline
+        """
+        end_time = self.end_time if self.end_time is not None else time.time()
+        cpu_time = self.cpu_time if self.cpu_time is not None else time.process_time() - self._cpu_start
+        with self._lock:
+            stages = collections.OrderedDict((name, stats.to_json(top=top)) for name, stats in self.stages.items())
+            timeline = list(self.timeline)
+            allocations = dict(self.allocations)
+        return {'created_at': datetime.datetime.utcfromtimestamp(self.start_time).isoformat() + 'Z',
+                'wall_time': end_time - self.start_time,
+                'cpu_time': cpu_time,
+                'peak_traced_bytes': self.peak_traced_bytes,
+                'peak_rss_bytes': self.peak_rss_bytes,
+                'idle_samples': self.idle_samples,
+                'allocations': allocations,
+                'stages': stages,
+                'top_allocators': self.top_allocators(top=top),
+                'timeline': timeline}
+
+    def save(self, filepath, top=10):
+        with open(filepath, 'w') as f:
+            json.dump(self.report(top=top), f, indent=2)
+
+    def print_report(self, top=10):
+        report = self.report(top=top)
+        mb = 1024 * 1024
+        print('wall: {:.2f}[s], cpu: {:.2f}[s], peak traced: {:.1f}[MB], peak rss: {:.1f}[MB]'.format(
+            report['wall_time'], report['cpu_time'], report['peak_traced_bytes'] / mb,
+            report['peak_rss_bytes'] / mb))
+        print('allocations: {}'.format(', '.join('{}={}'.format(name, count)
+                                                 for name, count in sorted(report['allocations'].items()))))
+        print('\n{:<40} {:>6} {:>10} {:>10} {:>12} {:>8}'.format('stage', 'calls', 'wall[s]', 'cpu[s]',
+                                                                 'traced[MB]', 'samples'))
+        for name, stats in report['stages'].items():
+            print('{:<40} {:>6} {:>10.2f} {:>10.2f} {:>12.1f} {:>8}'.format(name, stats['calls'],
+                                                                            stats['wall_time'], stats['cpu_time'],
+                                                                            stats['max_traced_bytes'] / mb,
+                                                                            stats['samples']))
+        for name, stats in report['stages'].items():
+            if not stats['top_functions']:
+                continue
+            print('\n[{}] top functions (self / inclusive samples)'.format(name))
+            for function in stats['top_functions']:
+                print('  {:>6} {:>6}  {}'.format(function['self_samples'], function['inclusive_samples'],
+                                                 function['function']))
+        print('\ntop allocators at peak')
+        for allocator in report['top_allocators']:
+            print('  {:>10.1f}[KB] {:>8} blocks  {}'.format(allocator['size'] / 1024, allocator['count'],
+                                                             allocator['location']))
+
+
+def session(sample_interval=0.01, snapshot_interval=1.0, traceback_frames=1, max_depth=32,
+            counted_classes=None):
+    """
+    Profiling context of the SDK's long operations. See ProfilingSession
+
+    :return: ProfilingSession (not started) - use "with dl.profiling.session() as session:"
+    """
+    return ProfilingSession(sample_interval=sample_interval,
+                            snapshot_interval=snapshot_interval,
+                            traceback_frames=traceback_frames,
+                            max_depth=max_depth,
+                            counted_classes=counted_classes)
+
+
+def active_session():
+    return _session
+
+
+def _enter(name, call=True):
+    profiling_session = _session
+    if profiling_session is None:
+        return None
+    stack = _thread_stages.setdefault(threading.get_ident(), list())
+    name = stack[-1] + '/' + name if stack else name
+    stack.append(name)
+    return profiling_session, name, profiling_session._entered(name=name, call=call)
+
+
+def _exit(token):
+    if token is None:
+        return
+    profiling_session, name, start = token
+    ident = threading.get_ident()
+    stack = _thread_stages.get(ident, None)
+    if stack:
+        stack.pop()
+        if not stack:
+            _thread_stages.pop(ident, None)
+    profiling_session._exited(name=name, start=start)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Measure a block as a stage of the running session (nothing without a session)
+    """
+    token = _enter(name)
+    try:
+        yield
+    finally:
+        _exit(token)
+
+
+def _staged_generator(name, generator):
+    # only the time inside the generator is the stage's - not the consumer's
+    call = True
+    while True:
+        token = _enter(name, call=call)
+        call = False
+        try:
+            value = next(generator)
+        except StopIteration:
+            return
+        finally:
+            _exit(token)
+        yield value
+
+
+def profiled(name):
+    """
+    Decorator of an SDK entry point - a stage of the running profiling session (generators included)
+    """
+
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _session is None:
+                    return func(*args, **kwargs)
+                return _staged_generator(name=name, generator=func(*args, **kwargs))
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _session is None:
+                    return func(*args, **kwargs)
+                token = _enter(name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _exit(token)
+        return wrapper
+
+    return decorator
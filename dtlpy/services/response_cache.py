@@ -0,0 +1,177 @@
+import collections
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class CacheEntry:
+    def __init__(self, response, resource, path, ttl):
+        self.response = response
+        self.resource = resource
+        self.path = path
+        self.size = len(response.content) if response.content is not None else 0
+        self.etag = response.headers.get('ETag', None)
+        self.last_modified = response.headers.get('Last-Modified', None)
+        self.expires = time.time() + ttl
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    @property
+    def revalidatable(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def validation_headers(self):
+        headers = dict()
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    LRU cache of GET responses for metadata endpoints (recipes, ontologies, datasets, projects, bots).
+    Entries expire after a per-resource TTL and are revalidated with If-None-Match/If-Modified-Since
+    when the gate sent an ETag/Last-Modified.
+    Any PATCH/PUT/POST/DELETE on a resource from this client drops the cached entries of that resource.
+
+    To plug a different cache set client_api.response_cache to an object with the same public methods
+    """
+    DEFAULT_TTLS = {'recipes': 300,
+                    'ontologies': 300,
+                    'datasets': 60,
+                    'projects': 300,
+                    'bots': 300}
+
+    def __init__(self, max_bytes=50 * 1024 * 1024, ttls=None):
+        if ttls is None:
+            ttls = dict(self.DEFAULT_TTLS)
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self.state = 'off'
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._by_resource = collections.defaultdict(set)
+        self._by_path = collections.defaultdict(set)
+        self.size = 0
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @property
+    def is_on(self):
+        return self.state == 'on'
+
+    def on(self):
+        self.state = 'on'
+
+    def off(self):
+        self.state = 'off'
+        self.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'size': self.size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'revalidations': self.revalidations,
+                    'evictions': self.evictions}
+
+    @staticmethod
+    def _split(path):
+        """
+        :param path: request path (relative to the environment url)
+        :return: path without query string and the resource (last collection name in path)
+        """
+        segments = [segment for segment in urlparse(path).path.split('/') if segment]
+        resource = segments[-1 if len(segments) % 2 == 1 else -2] if segments else None
+        return '/' + '/'.join(segments), resource
+
+    def cacheable(self, path):
+        _, resource = self._split(path)
+        return resource in self.ttls
+
+    def lookup(self, key):
+        """
+        :param key: request key (url and auth)
+        :return: CacheEntry or None
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def store(self, key, path, response):
+        path, resource = self._split(path)
+        if resource not in self.ttls or not response.ok:
+            return
+        entry = CacheEntry(response=response, resource=resource, path=path, ttl=self.ttls[resource])
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._by_resource[resource].add(key)
+            self._by_path[path].add(key)
+            self.size += entry.size
+            while self.size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def revalidated(self, key, entry):
+        """
+        Gate answered 304 - extend entry life
+        :return: cached response
+        """
+        with self._lock:
+            entry.expires = time.time() + self.ttls.get(entry.resource, 0)
+            self.revalidations += 1
+            if key not in self._entries:
+                # evicted while revalidating
+                self._entries[key] = entry
+                self._by_resource[entry.resource].add(key)
+                self._by_path[entry.path].add(key)
+                self.size += entry.size
+            return entry.response
+
+    def invalidate(self, path):
+        """
+        Drop all entries of the written resource and of its parent entities
+        """
+        path, resource = self._split(path)
+        segments = path.split('/')[1:]
+        with self._lock:
+            keys = set(self._by_resource.get(resource, set()))
+            for i in range(2, len(segments) + 1, 2):
+                keys.update(self._by_path.get('/' + '/'.join(segments[:i]), set()))
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_resource.clear()
+            self._by_path.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        self._by_resource[entry.resource].discard(key)
+        self._by_path[entry.path].discard(key)
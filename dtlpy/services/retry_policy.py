@@ -0,0 +1,229 @@
+import threading
+import logging
+import random
+import uuid
+import time
+import requests
+from urllib3.util import Retry
+
+logger = logging.getLogger(name=__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a ratio of requests.
+    Every request deposits "ratio" tokens (up to max_tokens) and every retry withdraws one
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=50):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(max_tokens)
+        self._lock = threading.Lock()
+        # counters
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def deposit(self):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        :return: True if a retry is allowed
+        """
+        with self._lock:
+            if self._tokens < 1:
+                self.rejected += 1
+                return False
+            self._tokens -= 1
+            self.retries += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests,
+                    'retries': self.retries,
+                    'rejected': self.rejected,
+                    'tokens': self._tokens}
+
+
+class RetryAttempt:
+    def __init__(self, idempotency_key):
+        self.number = 0
+        self.last = False
+        # same key for all attempts of the same operation - server can drop replays
+        self.idempotency_key = idempotency_key
+
+    @property
+    def headers(self):
+        return {IDEMPOTENCY_HEADER: self.idempotency_key}
+
+
+class RetryPolicy:
+    """
+    Single retry policy for all platform calls: max attempts, decorrelated-jitter backoff
+    and a global retry budget.
+    The transport (urllib3) retries connection and read errors only. Status codes are retried by "execute" -
+    the outermost call on a thread owns the retries, nested calls are single attempts
+    """
+    RETRY_STATUS_CODES = (429, 501, 502, 503, 504, 505, 506, 507, 508, 510, 511)
+    # errors that will fail the same way on every try
+    FATAL_STATUS_CODES = ('400', '401', '403', '404', '409', '422', '600')
+
+    def __init__(self, max_attempts=3, base_delay=0.3, max_delay=10, budget=None, status_codes=None):
+        """
+        :param max_attempts: attempts of each operation (first try included)
+        :param base_delay: minimal sleep between attempts (seconds)
+        :param max_delay: maximal sleep between attempts (seconds)
+        :param budget: RetryBudget. default: retries up to 20% of the requests
+        :param status_codes: response status codes that are retried
+        """
+        if budget is None:
+            budget = RetryBudget()
+        if status_codes is None:
+            status_codes = self.RETRY_STATUS_CODES
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.status_codes = status_codes
+        self._local = threading.local()
+
+    @staticmethod
+    def new_idempotency_key():
+        return str(uuid.uuid4())
+
+    def backoff(self, previous=None):
+        """
+        Decorrelated jitter: random sleep between base_delay and 3 times the previous sleep
+
+        :param previous: previous sleep. None for first retry
+        :return: seconds to sleep
+        """
+        if previous is None:
+            previous = self.base_delay
+        return min(self.max_delay, random.uniform(self.base_delay, previous * 3))
+
+    def retryable(self, error):
+        if isinstance(error, requests.exceptions.ConnectionError):
+            # the transport already retried it
+            return False
+        return str(getattr(error, 'status_code', None)) not in self.FATAL_STATUS_CODES
+
+    def retry_status(self, response):
+        """
+        :return: True if the response status should be retried
+        """
+        return response is not None and response.status_code in self.status_codes
+
+    def record_request(self):
+        self.budget.deposit()
+
+    def stats(self):
+        return self.budget.stats()
+
+    def execute(self, func, name='call', retry_result=None):
+        """
+        Call func until it returns a truthy value without raising,
+        up to max_attempts and while the retry budget allows.
+        Inside another execute call on the same thread func is called once - the outer call retries
+
+        :param func: callable receiving a RetryAttempt (attempt.last, attempt.idempotency_key)
+        :param name: name for logging
+        :param retry_result: callable(result) - True if the result should be retried. default: falsy results
+        :return: func's last result. the last error is raised if the last attempt raised
+                 or on errors that can't be fixed by retrying (e.g. 400, 404)
+        """
+        if retry_result is None:
+            retry_result = self._falsy
+        attempt = RetryAttempt(idempotency_key=self.new_idempotency_key())
+        nested = getattr(self._local, 'active', False)
+        if nested:
+            attempt.last = True
+            return func(attempt)
+        self._local.active = True
+        try:
+            delay = None
+            while True:
+                attempt.last = attempt.number + 1 >= self.max_attempts or self.budget.tokens < 1
+                logger.debug('{}. Try {}/{}. Starting..'.format(name, attempt.number + 1, self.max_attempts))
+                try:
+                    result = func(attempt)
+                except Exception as err:
+                    logger.debug('{}. Try {}/{}. Fail.'.format(name, attempt.number + 1, self.max_attempts))
+                    if attempt.last or not self.retryable(err) or not self.budget.withdraw():
+                        raise
+                else:
+                    if not retry_result(result) or attempt.last or not self.budget.withdraw():
+                        return result
+                delay = self.backoff(previous=delay)
+                time.sleep(delay)
+                attempt.number += 1
+        finally:
+            self._local.active = False
+
+    @staticmethod
+    def _falsy(result):
+        return not result
+
+    def urllib3_retry(self):
+        """
+        :return: urllib3 Retry for the requests session adapter - connection and read errors only
+        """
+        total = self.max_attempts - 1
+        kwargs = {'policy': self,
+                  'total': total,
+                  'read': total,
+                  'connect': total,
+                  # status codes are retried by execute
+                  'status': 0,
+                  'raise_on_status': False}
+        try:
+            # any request type - POST/PUT carry an idempotency key
+            return BudgetRetry(allowed_methods=None, **kwargs)
+        except TypeError:
+            # urllib3 < 1.26
+            return BudgetRetry(method_whitelist=False, **kwargs)
+
+
+class BudgetRetry(Retry):
+    """
+    urllib3 Retry that sleeps with the policy's jitter and stops when the retry budget is empty
+    """
+
+    def __init__(self, policy=None, previous_delay=None, **kwargs):
+        super(BudgetRetry, self).__init__(**kwargs)
+        self.policy = policy
+        self.previous_delay = previous_delay
+
+    def new(self, **kwargs):
+        new_retry = super(BudgetRetry, self).new(**kwargs)
+        new_retry.policy = self.policy
+        new_retry.previous_delay = self.previous_delay
+        return new_retry
+
+    def increment(self, *args, **kwargs):
+        new_retry = super(BudgetRetry, self).increment(*args, **kwargs)
+        if self.policy is None:
+            return new_retry
+        if not self.policy.budget.withdraw():
+            # budget is empty - exhaust the retries (raises MaxRetryError)
+            exhausted = self.new(total=0)
+            exhausted.policy = None
+            return exhausted.increment(*args, **kwargs)
+        new_retry.previous_delay = self.policy.backoff(previous=self.previous_delay)
+        return new_retry
+
+    def get_backoff_time(self):
+        if self.previous_delay is None:
+            return super(BudgetRetry, self).get_backoff_time()
+        return self.previous_delay
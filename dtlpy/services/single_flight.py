@@ -0,0 +1,85 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Merge concurrent identical calls into one.
+    While a call for a key is in flight, other callers with the same key wait for it and share its result
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = dict()
+        self.state = 'off'
+        # number of calls that actually ran
+        self.calls = 0
+        # number of calls that were merged into an in-flight call
+        self.merged = 0
+
+    @property
+    def is_on(self):
+        return self.state == 'on'
+
+    def on(self):
+        self.state = 'on'
+
+    def off(self):
+        self.state = 'off'
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.merged = 0
+
+    def stats(self):
+        """
+        :return: dictionary with number of calls, merged calls and the merged ratio
+        """
+        with self._lock:
+            total = self.calls + self.merged
+            return {'calls': self.calls,
+                    'merged': self.merged,
+                    'merged_ratio': self.merged / total if total > 0 else 0}
+
+    def do(self, key, func):
+        """
+        Run func once for all concurrent callers of the same key
+
+        :param key: hashable call identifier
+        :param func: callable with no arguments
+        :return: func's result
+        """
+        with self._lock:
+            call = self._calls.get(key, None)
+            if call is not None:
+                self.merged += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
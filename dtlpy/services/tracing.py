@@ -0,0 +1,317 @@
+import collections
+import contextlib
+import threading
+import itertools
+import logging
+import time
+import sys
+
+logger = logging.getLogger(name=__name__)
+
+
+class Span:
+    """
+    One traced operation (http request, item upload, item download)
+    """
+
+    def __init__(self, name, span_id, parent_id=None, attributes=None):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes if attributes is not None else dict()
+        # seconds: dns, connect, ttfb, body - where the transport exposes them
+        self.timings = dict()
+        self.start_time = time.time()
+        self.end_time = None
+        self.error = None
+        # prepared request and response objects of http spans
+        self.request = None
+        self.response = None
+
+    @property
+    def duration(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_json(self):
+        return {'name': self.name,
+                'spanId': self.span_id,
+                'parentId': self.parent_id,
+                'attributes': dict(self.attributes),
+                'timings': dict(self.timings),
+                'startTime': self.start_time,
+                'endTime': self.end_time,
+                'duration': self.duration,
+                'error': None if self.error is None else repr(self.error)}
+
+
+class SpanListener:
+    """
+    Base class of tracing listeners. Override on_start and/or on_end
+    """
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        pass
+
+
+class Tracer:
+    """
+    Emits spans to the registered listeners.
+    Without listeners start_span returns None and nothing is measured or formatted
+    """
+
+    def __init__(self):
+        self._listeners = list()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        # checked on every request - plain attribute, no property call
+        self.active = False
+
+    @property
+    def listeners(self):
+        return list(self._listeners)
+
+    def add_listener(self, listener):
+        """
+        :param listener: SpanListener
+        :return: the listener
+        """
+        if not isinstance(listener, SpanListener):
+            raise ValueError('listener must be a SpanListener, got: {}'.format(type(listener)))
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+            self.active = True
+        return listener
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners = [existing for existing in self._listeners if existing is not listener]
+            self.active = len(self._listeners) > 0
+
+    @property
+    def current_span(self):
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @staticmethod
+    def caller():
+        """
+        :return: the innermost calling repository method (e.g. Items.get) or None
+        """
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_globals.get('__name__', '').startswith('dtlpy.repositories.'):
+                instance = frame.f_locals.get('self', None)
+                if instance is None:
+                    return frame.f_code.co_name
+                return '{}.{}'.format(type(instance).__name__, frame.f_code.co_name)
+            frame = frame.f_back
+        return None
+
+    def start_span(self, name, nest=True, request=None, **attributes):
+        """
+        Start a span and notify the listeners
+
+        :param name: span name
+        :param nest: make it the parent of spans started later in this thread (use False in coroutines)
+        :param request: optional - the request object of http spans
+        :param attributes: span attributes
+        :return: Span, or None if there are no listeners
+        """
+        if not self.active:
+            return None
+        parent = self.current_span
+        if 'caller' not in attributes:
+            attributes['caller'] = parent.attributes.get('caller') if parent is not None else self.caller()
+        span = Span(name=name,
+                    span_id=next(self._ids),
+                    parent_id=parent.span_id if parent is not None else None,
+                    attributes=attributes)
+        span.request = request
+        if nest:
+            if not hasattr(self._local, 'stack'):
+                self._local.stack = list()
+            self._local.stack.append(span)
+        self._notify('on_start', span)
+        return span
+
+    def end_span(self, span, error=None):
+        """
+        End a span and notify the listeners
+
+        :param span: start_span's return value (None is ignored)
+        :param error: exception if the operation failed
+        """
+        if span is None:
+            return
+        span.end_time = time.time()
+        if error is not None:
+            span.error = error
+        stack = getattr(self._local, 'stack', None)
+        if stack and stack[-1] is span:
+            stack.pop()
+        self._notify('on_end', span)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """
+        Context manager of start_span/end_span. yields the Span or None
+        """
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except Exception as err:
+            self.end_span(span, error=err)
+            raise
+        self.end_span(span)
+
+    def _notify(self, event, span):
+        for listener in self._listeners:
+            try:
+                getattr(listener, event)(span)
+            except Exception:
+                # a listener never fails the traced operation
+                logger.debug('Tracing listener {} failed on {}'.format(type(listener).__name__, event),
+                             exc_info=True)
+
+
+class CurlListener(SpanListener):
+    """
+    Keep the latest requests as curl commands (debug)
+    """
+
+    def __init__(self, with_auth=False, max_size=100):
+        """
+        :param with_auth: include the authorization header
+        :param max_size: number of commands to keep
+        """
+        self.with_auth = with_auth
+        self.curls = collections.deque(maxlen=max_size)
+
+    @property
+    def last_curl(self):
+        return self.curls[-1] if self.curls else None
+
+    def on_start(self, span):
+        request = span.request
+        if request is None or not hasattr(request, 'headers'):
+            return
+        headers = ['"{0}: {1}"'.format(k, v) for k, v in request.headers.items()
+                   if self.with_auth or k.lower() != 'authorization']
+        data = request.body
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        self.curls.append("curl -X {method} -H {headers} -d '{data}' '{uri}'".format(method=request.method,
+                                                                                    headers=' -H '.join(headers),
+                                                                                    data=data,
+                                                                                    uri=request.url))
+
+
+class OpenTelemetryListener(SpanListener):
+    """
+    Export spans to OpenTelemetry (requires the opentelemetry-api package)
+    """
+    ATTRIBUTES = {'method': 'http.method',
+                  'route': 'http.route',
+                  'url': 'http.url',
+                  'status_code': 'http.status_code',
+                  'bytes_out': 'http.request_content_length',
+                  'bytes_in': 'http.response_content_length'}
+
+    def __init__(self, tracer=None):
+        """
+        :param tracer: opentelemetry tracer. default: the global tracer provider's "dtlpy" tracer
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError('OpenTelemetryListener requires the "opentelemetry-api" package')
+        self._trace = trace
+        if tracer is None:
+            tracer = trace.get_tracer('dtlpy')
+        self.tracer = tracer
+        self._spans = dict()
+        self._lock = threading.Lock()
+
+    def _attributes(self, span):
+        attributes = dict()
+        for key, value in span.attributes.items():
+            if value is None or not isinstance(value, (str, bool, int, float)):
+                continue
+            attributes[self.ATTRIBUTES.get(key, 'dtlpy.{}'.format(key))] = value
+        for key, value in span.timings.items():
+            attributes['dtlpy.timing.{}'.format(key)] = value
+        return attributes
+
+    def on_start(self, span):
+        context = None
+        with self._lock:
+            parent = self._spans.get(span.parent_id, None)
+        if parent is not None:
+            context = self._trace.set_span_in_context(parent)
+        otel_span = self.tracer.start_span(name=span.name,
+                                           context=context,
+                                           attributes=self._attributes(span),
+                                           start_time=int(span.start_time * 1e9))
+        with self._lock:
+            self._spans[span.span_id] = otel_span
+
+    def on_end(self, span):
+        with self._lock:
+            otel_span = self._spans.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        for key, value in self._attributes(span).items():
+            otel_span.set_attribute(key, value)
+        if span.error is not None:
+            otel_span.record_exception(span.error)
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(span.error)))
+        otel_span.end(end_time=int(span.end_time * 1e9))
+
+
+def aiohttp_trace_config():
+    """
+    aiohttp TraceConfig that fills the timings of the span passed as trace_request_ctx
+    (no-op for requests without a span)
+
+    :return: aiohttp.TraceConfig
+    """
+    import aiohttp
+
+    def starter(name):
+        async def on_event(session, context, params):
+            span = context.trace_request_ctx
+            if span is not None:
+                context.started[name] = time.time()
+
+        return on_event
+
+    def ender(name):
+        async def on_event(session, context, params):
+            span = context.trace_request_ctx
+            if span is not None and name in context.started:
+                span.timings[name] = time.time() - context.started[name]
+
+        return on_event
+
+    async def on_request_start(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.started = {'ttfb': time.time()}
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(starter('dns'))
+    trace_config.on_dns_resolvehost_end.append(ender('dns'))
+    trace_config.on_connection_create_start.append(starter('connect'))
+    trace_config.on_connection_create_end.append(ender('connect'))
+    # request end is called when the response headers arrive
+    trace_config.on_request_end.append(ender('ttfb'))
+    return trace_config
@@ -0,0 +1,613 @@
+"""
+Capture the platform traffic of a client to a compact on-disk trace and replay it without the platform
+"""
+import collections
+import threading
+import datetime
+import hashlib
+import logging
+import random
+import base64
+import gzip
+import json
+import time
+import io
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .. import __version__
+
+logger = logging.getLogger(name=__name__)
+
+TRACE_VERSION = 1
+REDACTED = '<redacted>'
+DEFAULT_REDACTED_HEADERS = ['authorization', 'proxy-authorization', 'cookie', 'set-cookie', 'x-api-key']
+# bodies are stored decoded - the wire framing headers are not replayed
+DROPPED_RESPONSE_HEADERS = ['content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive']
+TEXT_CONTENT_TYPES = ['application/json', 'application/xml', 'application/javascript', 'text/']
+
+
+def request_body(body, headers):
+    """
+    :param body: request body as sent
+    :param headers: request headers
+    :return: uncompressed body (bytes) or None if the body is a stream (files, multipart uploads)
+    """
+    if body is None:
+        return b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes):
+        return None
+    encoding = headers.get('Content-Encoding', None)
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'zstd':
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return body
+
+
+def body_digest(body):
+    """
+    :param body: uncompressed request body
+    :return: digest of the body or None if empty. json bodies are canonical - keys order does not matter
+    """
+    if not body:
+        return None
+    try:
+        body = json.dumps(json.loads(body.decode('utf-8')), sort_keys=True).encode('utf-8')
+    except ValueError:
+        pass
+    return hashlib.sha1(body).hexdigest()
+
+
+def redact_headers(headers, names):
+    """
+    :param headers: headers dictionary
+    :param names: lower case names of the headers to redact
+    :return: headers with the values of the secret headers replaced
+    """
+    return {key: REDACTED if key.lower() in names else value for key, value in headers.items()}
+
+
+def _is_text(headers):
+    content_type = headers.get('Content-Type', '') or ''
+    return any(content_type.startswith(text_type) for text_type in TEXT_CONTENT_TYPES)
+
+
+def _pack(body, text):
+    """
+    :return: json-able body: {'text': str} or {'base64': str}
+    """
+    if text:
+        try:
+            return {'text': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            pass
+    return {'base64': base64.b64encode(body).decode('ascii')}
+
+
+def _unpack(packed):
+    if 'text' in packed:
+        return packed['text'].encode('utf-8')
+    return base64.b64decode(packed['base64'])
+
+
+class TrafficCapture:
+    """
+    Record request/response pairs to a gzip json-lines trace.
+    Text (json) response bodies are always stored - the replay needs them. Request bodies and binary
+    response bodies (item streams) are stored for a sample of the requests: the others keep only their
+    size and are replayed as zeros of the same size
+    """
+
+    def __init__(self, filepath, environment=None, body_sample_rate=1.0, max_body_bytes=10 * 1024 * 1024,
+                 redacted_headers=None, seed=None):
+        """
+        :param filepath: trace file (gzip json lines)
+        :param environment: environment url - trace paths are relative to it
+        :param body_sample_rate: 0-1 fraction of the requests to store the request and binary response bodies of
+        :param max_body_bytes: binary response bodies above this size are never stored
+        :param redacted_headers: names of the headers to redact (default: authorization and cookies)
+        :param seed: optional - seed of the body sampling
+        """
+        if not 0 <= body_sample_rate <= 1:
+            raise ValueError('body_sample_rate must be between 0 and 1. got: {}'.format(body_sample_rate))
+        if redacted_headers is None:
+            redacted_headers = DEFAULT_REDACTED_HEADERS
+        self.filepath = filepath
+        self.environment = environment
+        self.body_sample_rate = body_sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.redacted_headers = set(name.lower() for name in redacted_headers)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self.count = 0
+        self.closed = False
+        self._file = gzip.open(filepath, 'wt', encoding='utf-8')
+        self._write({'version': TRACE_VERSION,
+                     'dtlpy_version': __version__.version,
+                     'environment': environment,
+                     'created_at': datetime.datetime.utcnow().isoformat() + 'Z'})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, line):
+        self._file.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+    def path(self, url):
+        if self.environment is not None and url.startswith(self.environment):
+            return url[len(self.environment):]
+        return url
+
+    def record(self, method, url, request_headers, body, status, reason, response_headers, content, start,
+               elapsed):
+        """
+        Add a request/response pair to the trace
+
+        :param method: request method
+        :param url: request url
+        :param request_headers: request headers
+        :param body: uncompressed request body (bytes) or None if not readable
+        :param status: response status code
+        :param reason: response reason
+        :param response_headers: response headers
+        :param content: decoded response body (bytes)
+        :param start: epoch of the request start
+        :param elapsed: seconds until the response body was read
+        """
+        with self._lock:
+            if self.closed:
+                return
+            sampled = self._random.random() < self.body_sample_rate
+        content = content or b''
+        text = _is_text(response_headers)
+        line = {'t': round(start - self._start, 6),
+                'e': round(elapsed, 6),
+                'm': method,
+                'p': self.path(url),
+                'd': body_digest(body),
+                'h': redact_headers(request_headers, self.redacted_headers),
+                's': status,
+                'r': reason,
+                'rh': redact_headers({key: value for key, value in response_headers.items()
+                                      if key.lower() not in DROPPED_RESPONSE_HEADERS},
+                                     self.redacted_headers),
+                'n': len(content)}
+        if sampled and body:
+            line['q'] = _pack(body, text=True)
+        if text or (sampled and len(content) <= self.max_body_bytes):
+            line['b'] = _pack(content, text=text)
+        with self._lock:
+            if self.closed:
+                return
+            self._write(line)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+
+
+class TrafficRecord:
+    """
+    A recorded request/response pair
+    """
+    __slots__ = ['method', 'path', 'digest', 'status', 'reason', 'headers', 'size', 'start', 'elapsed',
+                 '_packed', 'used']
+
+    def __init__(self, line):
+        self.method = line['m']
+        self.path = line['p']
+        self.digest = line.get('d', None)
+        self.status = line['s']
+        self.reason = line.get('r', None)
+        self.headers = line.get('rh', dict())
+        self.size = line.get('n', 0)
+        self.start = line.get('t', 0)
+        self.elapsed = line.get('e', 0)
+        self._packed = line.get('b', None)
+        self.used = False
+
+    @property
+    def content(self):
+        if self._packed is None:
+            # body was not sampled
+            return bytes(self.size)
+        return _unpack(self._packed)
+
+
+def read_trace(filepath):
+    """
+    :param filepath: trace saved by TrafficCapture
+    :return: (header, list of TrafficRecord)
+    """
+    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version', None) != TRACE_VERSION:
+            raise ValueError('Unknown trace version: {}. expected: {}'.format(header.get('version', None),
+                                                                            TRACE_VERSION))
+        records = [TrafficRecord(json.loads(line)) for line in f if line.strip()]
+    return header, records
+
+
+class TrafficReplay:
+    """
+    Serve the responses of a trace. A request is matched by method, path and body digest - then by method
+    and path only (in recording order). Each response is delayed by its recorded latency (times "timing"),
+    so a new release runs the workload against the exact same responses and network time
+    """
+
+    def __init__(self, filepath, environment=None, timing=1.0):
+        """
+        :param filepath: trace saved by TrafficCapture
+        :param environment: environment url of the replaying client - paths are matched relative to it
+        :param timing: factor of the recorded latencies (0 - no delays)
+        """
+        self.filepath = filepath
+        self.environment = environment
+        self.timing = timing
+        self.header, self.records = read_trace(filepath)
+        self._exact = collections.defaultdict(collections.deque)
+        self._by_path = collections.defaultdict(collections.deque)
+        for record in self.records:
+            self._exact[(record.method, record.path, record.digest)].append(record)
+            self._by_path[(record.method, record.path)].append(record)
+        self._lock = threading.Lock()
+        # counters
+        self.requests = 0
+        self.matched = 0
+        self.fallbacks = 0
+        self.unmatched = 0
+        self.bytes_served = 0
+        self.restart()
+
+    def restart(self):
+        """
+        Reset the counters and the clocks of the replay
+        """
+        with self._lock:
+            for record in self.records:
+                record.used = False
+            self.requests = self.matched = self.fallbacks = self.unmatched = self.bytes_served = 0
+            self._wall_start = time.time()
+            self._cpu_start = time.process_time()
+
+    @property
+    def trace_wall_time(self):
+        """
+        Wall time of the recorded workload (first request start to last response end)
+        """
+        if not self.records:
+            return 0.0
+        return max(record.start + record.elapsed for record in self.records) - min(record.start
+                                                                                  for record in self.records)
+
+    def stats(self):
+        """
+        :return: requests, matched/unmatched counts, wall and cpu time since the replay (re)started
+        """
+        with self._lock:
+            return {'requests': self.requests,
+                    'matched': self.matched,
+                    'fallbacks': self.fallbacks,
+                    'unmatched': self.unmatched,
+                    'bytes_served': self.bytes_served,
+                    'trace_requests': len(self.records),
+                    'trace_wall_time': self.trace_wall_time,
+                    'wall_time': time.time() - self._wall_start,
+                    'cpu_time': time.process_time() - self._cpu_start}
+
+    def path(self, url):
+        if self.environment is not None and url.startswith(self.environment):
+            return url[len(self.environment):]
+        return url
+
+    @staticmethod
+    def _take(queue):
+        while len(queue) > 1 and queue[0].used:
+            queue.popleft()
+        record = queue[0]
+        if len(queue) > 1:
+            queue.popleft()
+        # the last response of a path is reused for extra calls
+        record.used = True
+        return record
+
+    def lookup(self, method, url, body):
+        """
+        :param method: request method
+        :param url: request url
+        :param body: uncompressed request body or None
+        :return: TrafficRecord or None if the request is not in the trace
+        """
+        path = self.path(url)
+        with self._lock:
+            self.requests += 1
+            queue = self._exact.get((method, path, body_digest(body)), None)
+            if queue:
+                self.matched += 1
+                record = self._take(queue)
+            else:
+                queue = self._by_path.get((method, path), None)
+                if not queue:
+                    self.unmatched += 1
+                    logger.debug('Request not in the trace: {} {}'.format(method, path))
+                    return None
+                self.fallbacks += 1
+                record = self._take(queue)
+            self.bytes_served += record.size
+        return record
+
+    def delay(self, record):
+        return record.elapsed * self.timing if record is not None else 0.0
+
+    @staticmethod
+    def not_found(method, url):
+        return {'status': 404,
+                'reason': 'Not In Trace',
+                'headers': {'Content-Type': 'application/json'},
+                'content': json.dumps({'message': 'Request not in the replayed trace: {} {}'.format(method, url)})
+                .encode('utf-8')}
+
+
+class CaptureAdapter(HTTPAdapter):
+    """
+    requests transport adapter that records every response to a TrafficCapture.
+    Streamed bodies are read before returning - the capture needs them
+    """
+
+    def __init__(self, capture, **kwargs):
+        super(CaptureAdapter, self).__init__(**kwargs)
+        self.capture = capture
+
+    def send(self, request, stream=False, **kwargs):
+        start = time.time()
+        resp = super(CaptureAdapter, self).send(request, stream=stream, **kwargs)
+        content = resp.content
+        self.capture.record(method=request.method,
+                            url=request.url,
+                            request_headers=request.headers,
+                            body=request_body(body=request.body, headers=request.headers),
+                            status=resp.status_code,
+                            reason=resp.reason,
+                            response_headers=resp.headers,
+                            content=content,
+                            start=start,
+                            elapsed=time.time() - start)
+        return resp
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    requests transport adapter that serves the responses of a TrafficReplay - no network
+    """
+
+    def __init__(self, replay):
+        super(ReplayAdapter, self).__init__()
+        self.replay = replay
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        record = self.replay.lookup(method=request.method,
+                                    url=request.url,
+                                    body=request_body(body=request.body, headers=request.headers))
+        if record is None:
+            served = self.replay.not_found(method=request.method, url=request.url)
+        else:
+            served = {'status': record.status,
+                      'reason': record.reason,
+                      'headers': record.headers,
+                      'content': record.content}
+            time.sleep(self.replay.delay(record))
+        resp = requests.Response()
+        resp.status_code = served['status']
+        resp.reason = served['reason']
+        resp.headers = CaseInsensitiveDict(served['headers'])
+        resp.headers['Content-Length'] = str(len(served['content']))
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        resp.raw = io.BytesIO(served['content'])
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self):
+        pass
+
+
+class RecordedRequestInfo:
+    def __init__(self, method, url, headers):
+        self.method = method
+        self.url = url
+        self.headers = headers
+
+
+class RecordedStreamReader:
+    def __init__(self, content):
+        self._buffer = io.BytesIO(content)
+
+    async def read(self, n=-1):
+        return self._buffer.read(n)
+
+
+class RecordedAsyncResponse:
+    """
+    aiohttp-like response of a captured or replayed body
+    """
+
+    def __init__(self, method, url, request_headers, status, reason, headers, content):
+        self.status = status
+        self.reason = reason
+        self.headers = CaseInsensitiveDict({key: value for key, value in headers.items()
+                                            if key.lower() not in DROPPED_RESPONSE_HEADERS})
+        self.headers['Content-Length'] = str(len(content))
+        self.content_length = len(content)
+        self.content = RecordedStreamReader(content)
+        self.request_info = RecordedRequestInfo(method=method, url=url, headers=request_headers)
+        self._body = content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    async def read(self):
+        return self._body
+
+    async def text(self, encoding=None):
+        return self._body.decode(encoding or 'utf-8', errors='replace')
+
+    async def json(self, content_type=None, loads=json.loads):
+        text = await self.text()
+        if not text.strip():
+            return None
+        return loads(text)
+
+    def release(self):
+        pass
+
+
+class Traffic:
+    """
+    Capture or replay the platform traffic of a client (off by default).
+        client_api.traffic.capture(filepath='nightly.dltrace')  # record the calls of a workload
+        client_api.traffic.replay(filepath='nightly.dltrace')  # serve them back - no platform
+        client_api.traffic.replaying.stats()  # requests, unmatched, wall and cpu time
+        client_api.traffic.off()
+    Covers the calls of the blocking and asyncio clients (not the async multipart file uploads)
+    """
+
+    def __init__(self, environment, on_change=None):
+        """
+        :param environment: callable - current environment url of the client
+        :param on_change: callable - called when the state changes (drop the transport sessions)
+        """
+        self._environment = environment
+        self._on_change = on_change
+        self.capturing = None
+        self.replaying = None
+
+    @property
+    def state(self):
+        if self.capturing is not None:
+            return 'capture'
+        if self.replaying is not None:
+            return 'replay'
+        return 'off'
+
+    @property
+    def is_on(self):
+        return self.state != 'off'
+
+    @property
+    def is_capturing(self):
+        return self.capturing is not None
+
+    @property
+    def is_replaying(self):
+        return self.replaying is not None
+
+    def capture(self, filepath, body_sample_rate=1.0, max_body_bytes=10 * 1024 * 1024, redacted_headers=None,
+                seed=None):
+        """
+        Start recording to a trace file (see TrafficCapture)
+
+        :return: TrafficCapture
+        """
+        self.off()
+        self.capturing = TrafficCapture(filepath=filepath,
+                                        environment=self._environment(),
+                                        body_sample_rate=body_sample_rate,
+                                        max_body_bytes=max_body_bytes,
+                                        redacted_headers=redacted_headers,
+                                        seed=seed)
+        self.__changed()
+        return self.capturing
+
+    def replay(self, filepath, timing=1.0):
+        """
+        Serve the client's requests from a trace file (see TrafficReplay)
+
+        :return: TrafficReplay
+        """
+        self.off()
+        self.replaying = TrafficReplay(filepath=filepath, environment=self._environment(), timing=timing)
+        self.__changed()
+        return self.replaying
+
+    def off(self):
+        if not self.is_on:
+            return
+        if self.capturing is not None:
+            self.capturing.close()
+        self.capturing = None
+        self.replaying = None
+        self.__changed()
+
+    def __changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+    def adapter(self, **kwargs):
+        """
+        :param kwargs: HTTPAdapter arguments
+        :return: requests transport adapter of the current state
+        """
+        if self.replaying is not None:
+            return ReplayAdapter(replay=self.replaying)
+        if self.capturing is not None:
+            return CaptureAdapter(capture=self.capturing, **kwargs)
+        return HTTPAdapter(**kwargs)
+
+    async def replayed(self, method, url, headers, body):
+        """
+        :return: RecordedAsyncResponse of an asyncio client request
+        """
+        import asyncio
+        replay = self.replaying
+        record = replay.lookup(method=method, url=url, body=body)
+        if record is None:
+            served = replay.not_found(method=method, url=url)
+        else:
+            served = {'status': record.status,
+                      'reason': record.reason,
+                      'headers': record.headers,
+                      'content': record.content}
+            await asyncio.sleep(replay.delay(record))
+        return RecordedAsyncResponse(method=method, url=url, request_headers=headers, **served)
+
+    async def captured(self, resp, method, url, headers, body, start):
+        """
+        Record an aiohttp response. The body is read and the connection released
+
+        :return: RecordedAsyncResponse with the same body
+        """
+        try:
+            content = await resp.read()
+        finally:
+            resp.release()
+        capture = self.capturing
+        if capture is not None:
+            capture.record(method=method,
+                           url=url,
+                           request_headers=headers or dict(),
+                           body=body,
+                           status=resp.status,
+                           reason=resp.reason,
+                           response_headers=resp.headers,
+                           content=content,
+                           start=start,
+                           elapsed=time.time() - start)
+        return RecordedAsyncResponse(method=method, url=url, request_headers=headers, status=resp.status,
+                                     reason=resp.reason, headers=resp.headers, content=content)
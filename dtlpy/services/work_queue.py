@@ -0,0 +1,144 @@
+import collections
+import threading
+import logging
+
+logger = logging.getLogger(name=__name__)
+
+# jobs in flight per pool worker - keeps the workers busy while the caller prepares the next jobs
+WINDOW_PER_WORKER = 2
+
+
+class BoundedWorkQueue:
+    """
+    Submit jobs to a pool with a bounded number in flight.
+    "submit" blocks while the window is full, results are passed to on_result as jobs finish
+    and are not kept - memory is bounded by the window and not by the number of jobs.
+    Called from one of the pool's workers, "submit" and "join" run the queue's pending jobs instead of waiting
+    """
+
+    def __init__(self, pool, window=None, on_result=None, on_error=None):
+        """
+        :param pool: pool with apply_async(func, args, kwds, callback, error_callback) (e.g. ApiClient.thread_pools)
+        :param window: max jobs submitted and not finished. default: 2 per pool worker
+        :param on_result: callable(result, tag) called for each finished job (one call at a time)
+        :param on_error: callable(exception, tag) called for each failed job. default: log the error
+        """
+        if window is None:
+            # executor pools expose "processes", multiprocessing pools "_processes"
+            window = WINDOW_PER_WORKER * getattr(pool, 'processes', getattr(pool, '_processes', 32))
+        if window < 1:
+            raise ValueError('window must be a positive number, got: {}'.format(window))
+        self.pool = pool
+        self.window = window
+        self.on_result = on_result
+        self.on_error = on_error
+        self._slots = threading.Semaphore(window)
+        self._cond = threading.Condition()
+        self._callback_lock = threading.Lock()
+        self._in_flight = 0
+        # jobs that a waiting pool worker may run itself (executor pools only)
+        self._tasks = collections.deque()
+        # counters
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.join()
+
+    def submit(self, func, tag=None, **kwargs):
+        """
+        Submit a job. Blocks while the window is full
+
+        :param func: callable
+        :param tag: optional - passed to on_result/on_error with the job's outcome (e.g. input index)
+        :param kwargs: func's keyword arguments
+        """
+        in_worker = self._in_worker()
+        if in_worker:
+            while not self._slots.acquire(False):
+                if not self._run_pending():
+                    # the queue's jobs are all running - one of them frees a slot
+                    self._slots.acquire()
+                    break
+        else:
+            self._slots.acquire()
+        with self._cond:
+            self._in_flight += 1
+            self.submitted += 1
+        try:
+            task = self.pool.apply_async(func,
+                                         kwds=kwargs,
+                                         callback=lambda result: self._on_done(result, tag),
+                                         error_callback=lambda error: self._on_failed(error, tag))
+        except Exception:
+            self._release()
+            raise
+        if in_worker and hasattr(task, 'try_run'):
+            while self._tasks and self._tasks[0].ready():
+                self._tasks.popleft()
+            self._tasks.append(task)
+
+    def join(self):
+        """
+        Wait for all submitted jobs to finish
+        """
+        if self._in_worker():
+            while self._run_pending():
+                pass
+        with self._cond:
+            while self._in_flight > 0:
+                self._cond.wait()
+
+    def _in_worker(self):
+        in_worker = getattr(self.pool, 'in_worker', None)
+        return in_worker is not None and in_worker()
+
+    def _run_pending(self):
+        """
+        Run the oldest job no pool worker picked yet on the calling worker
+
+        :return: True if a job ran
+        """
+        while self._tasks:
+            if self._tasks.popleft().try_run():
+                return True
+        return False
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+        self._slots.release()
+
+    def _on_done(self, result, tag):
+        # an exception here would kill the pool's result handler - never raise
+        try:
+            with self._callback_lock:
+                self.completed += 1
+                if self.on_result is not None:
+                    self.on_result(result, tag)
+        except Exception:
+            logger.exception('Failed handling a job result:')
+        finally:
+            self._release()
+
+    def _on_failed(self, error, tag):
+        try:
+            with self._callback_lock:
+                self.failed += 1
+                if self.on_error is not None:
+                    self.on_error(error, tag)
+                else:
+                    logger.error('Job failed: {!r}'.format(error))
+        except Exception:
+            logger.exception('Failed handling a job error:')
+        finally:
+            self._release()
@@ -4,11 +4,9 @@ from itertools import groupby
 from multiprocessing.pool import ThreadPool
 import os
 import json
-import tqdm
 import pickle
-from .. import exceptions, entities, utilities
-from jinja2 import Environment, PackageLoader
-import numpy as np
+from .. import exceptions, entities, utilities, services
+from ..services.profiling import profiled
 import logging
 
 logger = logging.getLogger(name=__name__)
@@ -30,6 +28,7 @@ class Converter:
         self.item = None
         self.save_to_format = None
 
+    @profiled('convert_dataset')
     def convert_dataset(self,
                         dataset,
                         to_format,
@@ -48,6 +47,7 @@ class Converter:
         :param filters: optional
         :return:
         """
+        import tqdm
         if to_format.lower() == 'coco':
             return self.__convert_dataset_to_coco(dataset=dataset,
                                                   local_path=local_path,
@@ -139,6 +139,7 @@ class Converter:
 
     @staticmethod
     def _binary_mask_to_rle(binary_mask):
+        import numpy as np
         size = np.sum(binary_mask > 0)
         rle = {'counts': [], 'size': size}
         counts = rle.get('counts')
@@ -149,6 +150,8 @@ class Converter:
         return rle
 
     def __convert_dataset_to_coco(self, dataset: entities.Dataset, local_path, filters=None, annotation_filter=None):
+        import numpy as np
+        import tqdm
         pages = dataset.items.list(filters=filters)
         dataset.download_annotations(local_path=local_path)
         path_to_dataloop_annotations_dir = os.path.join(local_path, 'json')
@@ -233,7 +236,9 @@ class Converter:
                                                                             shape=(item.height, item.width),
                                                                             is_open=annotation.is_open)
                         annotation = entities.Annotation.new(item=item, annotation_definition=annotation_def)
-                    rle = self._binary_mask_to_rle(annotation.geo)
+                    rle = services.cpu_stages.default.run('coco.rle',
+                                                          self._binary_mask_to_rle,
+                                                          binary_mask=annotation.geo)
                     segmentation = [rle['counts']]
                     area = float(rle['size'])
                     x = annotation.left
@@ -364,6 +369,7 @@ class Converter:
         :param item:
         :return:
         """
+        from jinja2 import Environment, PackageLoader
         # what file format
         if self.save_to_format is None:
             if to_format.lower() in ["dataloop", "coco"]:
@@ -563,7 +569,9 @@ class Converter:
             if not isinstance(annotation, entities.Annotation):
                 annotation = entities.Annotation.from_json(annotation, item=item)
             # create segmentation list
-            rle = self._binary_mask_to_rle(annotation.geo)
+            rle = services.cpu_stages.default.run('coco.rle',
+                                                  self._binary_mask_to_rle,
+                                                  binary_mask=annotation.geo)
 
             # build annotation
             if annotation.type == 'binary':
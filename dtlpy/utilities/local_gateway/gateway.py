@@ -0,0 +1,575 @@
+"""
+In-process stand-in of the Dataloop gateway: the REST routes used by the repositories over an in-memory store,
+with latency, bandwidth and error injection
+"""
+import collections
+import threading
+import asyncio
+import logging
+import random
+import socket
+import json
+import time
+import gzip
+import jwt
+
+from aiohttp import web
+
+from .store import GatewayStore, StoreError
+from ...services.metrics import Metrics
+
+logger = logging.getLogger(name=__name__)
+
+API_PREFIX = '/api/v1'
+# bytes per write/read when the bandwidth is limited
+CHUNK_SIZE = 64 * 1024
+TOKEN_SECRET = 'local-gateway'
+FAULT_KEYS = ('latency', 'jitter', 'bandwidth', 'error_rate', 'error_status')
+
+
+class GatewaySettings:
+    """
+    Network conditions of the local gateway. Route settings override the global ones
+    e.g. settings.set_route('/items/{id}/stream', method='GET', error_rate=0.1)
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, error_status=503, seed=0):
+        """
+        :param latency: seconds added to every request
+        :param jitter: max random seconds added on top of the latency
+        :param bandwidth: bytes per second of request and response bodies. None - unlimited
+        :param error_rate: share of the requests answered with error_status (0-1)
+        :param error_status: status code of the injected errors
+        :param seed: seed of the jitter and error injection
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.routes = dict()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def set_route(self, route, method=None, **settings):
+        """
+        Override the settings of one route
+
+        :param route: route template (e.g. /datasets/{id}/query - see Metrics.route_template)
+        :param method: optional - only this http method
+        :param settings: latency, jitter, bandwidth, error_rate, error_status
+        """
+        unknown = [key for key in settings if key not in FAULT_KEYS]
+        if unknown:
+            raise ValueError('unknown route settings: {}. known: {}'.format(unknown, list(FAULT_KEYS)))
+        key = route if method is None else '{} {}'.format(method.upper(), route)
+        self.routes.setdefault(key, dict()).update(settings)
+
+    def reset(self):
+        """
+        Remove the route settings and restart the random sequence
+        """
+        with self._lock:
+            self.routes = dict()
+            self._random = random.Random(self.seed)
+
+    def for_route(self, method, route):
+        """
+        :return: dictionary of the settings applied to a request
+        """
+        settings = {key: getattr(self, key) for key in FAULT_KEYS}
+        settings.update(self.routes.get(route, dict()))
+        settings.update(self.routes.get('{} {}'.format(method, route), dict()))
+        return settings
+
+    def draw(self, settings):
+        """
+        :return: (delay in seconds, inject an error)
+        """
+        with self._lock:
+            jitter = self._random.uniform(0, settings['jitter']) if settings['jitter'] else 0.0
+            error = settings['error_rate'] > 0 and self._random.random() < settings['error_rate']
+        return settings['latency'] + jitter, error
+
+
+class LocalGateway:
+    """
+    Local Dataloop gateway (aiohttp app on a background thread).
+
+    e.g.
+        with LocalGateway() as gateway:
+            gateway.connect(dl.client_api)
+            project = dl.projects.create('project')
+    """
+
+    def __init__(self, store=None, settings=None, host='127.0.0.1', port=0, email=None):
+        """
+        :param store: optional - GatewayStore (e.g. prepopulated). default: empty store
+        :param settings: optional - GatewaySettings. default: no latency, no errors
+        :param host: host to listen on
+        :param port: port to listen on. 0 - any free port
+        :param email: optional - the user's email (token and entities creator)
+        """
+        if store is None:
+            store = GatewayStore() if email is None else GatewayStore(email=email)
+        self.store = store
+        self.settings = settings if settings is not None else GatewaySettings()
+        self.host = host
+        self.port = port
+        # 'METHOD /route' -> count
+        self.requests = collections.Counter()
+        self.errors_injected = 0
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._connected = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}{}'.format(self.host, self.port, API_PREFIX)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    ###########
+    # Running #
+    ###########
+    def start(self):
+        """
+        Start listening (returns when the gateway is ready)
+
+        :return: self
+        """
+        if self._thread is not None:
+            return self
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self.store.base_url = self.url
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        errors = list()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._runner = web.AppRunner(self.app(), access_log=None)
+                self._loop.run_until_complete(self._runner.setup())
+                self._loop.run_until_complete(web.SockSite(self._runner, sock).start())
+            except Exception as err:
+                errors.append(err)
+                return
+            finally:
+                ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='dtlpy-local-gateway')
+        self._thread.daemon = True
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+        logger.info('Local gateway is listening on: {}'.format(self.url))
+        return self
+
+    def stop(self):
+        """
+        Stop the gateway (and disconnect the client)
+        """
+        if self._connected is not None:
+            self.disconnect()
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def token(self, expires_in=24 * 60 * 60):
+        """
+        :param expires_in: seconds
+        :return: jwt for the gateway's user
+        """
+        token = jwt.encode({'email': self.store.email, 'exp': int(time.time()) + expires_in},
+                           TOKEN_SECRET,
+                           algorithm='HS256')
+        if isinstance(token, bytes):
+            # PyJWT < 2
+            token = token.decode('utf-8')
+        return token
+
+    def connect(self, client_api=None, alias='local-gateway'):
+        """
+        Point a client at the gateway (add_environment + setenv + token)
+
+        :param client_api: optional - ApiClient. default: dl.client_api
+        :param alias: environment alias
+        :return: client_api
+        """
+        if client_api is None:
+            import dtlpy
+            client_api = dtlpy.client_api
+        previous = client_api.environment if client_api.environment in client_api.environments else None
+        client_api.add_environment(environment=self.url,
+                                   audience='local',
+                                   client_id='local',
+                                   auth0_url='local',
+                                   verify_ssl=False,
+                                   alias=alias,
+                                   compress_requests=True,
+                                   query_projection=True)
+        client_api.setenv(self.url)
+        client_api.token = self.token()
+        self._connected = (client_api, previous)
+        return client_api
+
+    def disconnect(self):
+        """
+        Remove the gateway's environment from the client and go back to the previous environment
+        """
+        if self._connected is None:
+            return
+        client_api, previous = self._connected
+        self._connected = None
+        environments = client_api.environments
+        environments.pop(self.url, None)
+        client_api.environments = environments
+        if previous is not None:
+            client_api.setenv(previous)
+
+    def reset_stats(self):
+        self.requests = collections.Counter()
+        self.errors_injected = 0
+
+    ##########
+    # Routes #
+    ##########
+    def app(self):
+        """
+        :return: aiohttp application
+        """
+        app = web.Application(middlewares=[self._middleware], client_max_size=1024 ** 4)
+        routes = [('POST', '/sdk/check', self._sdk_check),
+                  # projects
+                  ('GET', '/projects', self._list_projects),
+                  ('POST', '/projects', self._create_project),
+                  ('GET', '/projects/{id}', self._get_project),
+                  ('PATCH', '/projects/{id}', self._update_project),
+                  ('DELETE', '/projects/{id}', self._delete_project),
+                  # datasets
+                  ('GET', '/datasets', self._list_datasets),
+                  ('POST', '/datasets', self._create_dataset),
+                  ('GET', '/datasets/{id}', self._get_dataset),
+                  ('PATCH', '/datasets/{id}', self._update_dataset),
+                  ('DELETE', '/datasets/{id}', self._delete_dataset),
+                  ('GET', '/datasets/{id}/directoryTree', self._directory_tree),
+                  ('POST', '/datasets/{id}/query', self._query),
+                  ('POST', '/datasets/{id}/items', self._upload_item),
+                  ('GET', '/datasets/{id}/annotations/zip', self._export_zip),
+                  # items
+                  ('GET', '/items/{id}', self._get_item),
+                  ('PATCH', '/items/{id}', self._update_item),
+                  ('DELETE', '/items/{id}', self._delete_item),
+                  ('GET', '/items/{id}/stream', self._stream_item),
+                  ('GET', '/items/{id}/annotations', self._list_annotations),
+                  ('POST', '/items/{id}/annotations', self._create_annotations),
+                  # annotations
+                  ('GET', '/annotations/{id}', self._get_annotation),
+                  ('PUT', '/annotations/{id}', self._update_annotation),
+                  ('DELETE', '/annotations/{id}', self._delete_annotation),
+                  # recipes and ontologies
+                  ('POST', '/recipes', self._create_recipe),
+                  ('GET', '/recipes/{id}', self._get_recipe),
+                  ('PATCH', '/recipes/{id}', self._update_recipe),
+                  ('DELETE', '/recipes/{id}', self._delete_recipe),
+                  ('POST', '/ontologies', self._create_ontology),
+                  ('GET', '/ontologies/{id}', self._get_ontology),
+                  ('PUT', '/ontologies/{id}', self._update_ontology),
+                  ('DELETE', '/ontologies/{id}', self._delete_ontology),
+                  # executions
+                  ('GET', '/executions', self._list_executions),
+                  ('POST', '/executions/{id}', self._create_execution),
+                  ('GET', '/executions/{id}', self._get_execution),
+                  ('POST', '/executions/{id}/progress', self._execution_progress)]
+        for method, path, handler in routes:
+            app.router.add_route(method, API_PREFIX + path, handler)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        route = Metrics.route_template(request.path[len(API_PREFIX):])
+        self.requests['{} {}'.format(request.method, route)] += 1
+        settings = self.settings.for_route(method=request.method, route=route)
+        request['settings'] = settings
+        delay, inject_error = self.settings.draw(settings)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if inject_error:
+            self.errors_injected += 1
+            await self._read_body(request)
+            headers = {'Retry-After': '0'} if settings['error_status'] in [429, 503] else None
+            return web.json_response({'message': 'injected error', 'status': settings['error_status']},
+                                     status=settings['error_status'],
+                                     headers=headers)
+        if 'Authorization' not in request.headers:
+            return web.json_response({'message': 'Unauthorized', 'status': 401}, status=401)
+        try:
+            return await handler(request)
+        except StoreError as err:
+            return web.json_response({'message': err.message, 'status': err.status}, status=err.status)
+        except web.HTTPException:
+            raise
+        except Exception as err:
+            logger.exception('Local gateway handler failed:')
+            return web.json_response({'message': repr(err), 'status': 500}, status=500)
+
+    ###########
+    # Helpers #
+    ###########
+    async def _throttle(self, request, num_bytes):
+        bandwidth = request['settings']['bandwidth']
+        if bandwidth and num_bytes:
+            await asyncio.sleep(num_bytes / float(bandwidth))
+
+    async def _read_body(self, request):
+        body = b''
+        while True:
+            chunk = await request.content.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await self._throttle(request, len(chunk))
+            body += chunk
+        encoding = request.headers.get('Content-Encoding', None)
+        if encoding == 'zstd':
+            import zstandard
+            body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        elif encoding == 'gzip' and body[:2] == b'\x1f\x8b':
+            body = gzip.decompress(body)
+        return body
+
+    async def _json(self, request):
+        body = await self._read_body(request)
+        if not body:
+            return dict()
+        if request.content_type == 'application/x-www-form-urlencoded':
+            from urllib.parse import parse_qsl
+            return dict(parse_qsl(body.decode('utf-8')))
+        return json.loads(body.decode('utf-8'))
+
+    async def _respond(self, request, body, content_type='application/json', headers=None, status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        if not request['settings']['bandwidth']:
+            return web.Response(body=body, content_type=content_type, headers=headers, status=status)
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_type = content_type
+        response.content_length = len(body)
+        await response.prepare(request)
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            await self._throttle(request, len(chunk))
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _projects_query(request):
+        projects = request.query.getall('projects', list())
+        return [project_id for value in projects for project_id in value.split(',')]
+
+    ############
+    # Handlers #
+    ############
+    async def _sdk_check(self, request):
+        return await self._respond(request, {'level': 'debug', 'msg': ''})
+
+    async def _list_projects(self, request):
+        return await self._respond(request, list(self.store.projects.values()))
+
+    async def _create_project(self, request):
+        payload = await self._json(request)
+        return await self._respond(request, self.store.create_project(name=payload['name']))
+
+    async def _get_project(self, request):
+        return await self._respond(request, self.store.get_project(request.match_info['id']))
+
+    async def _update_project(self, request):
+        payload = await self._json(request)
+        project = self.store.get_project(request.match_info['id'])
+        project['name'] = payload.get('name', project['name'])
+        return await self._respond(request, project)
+
+    async def _delete_project(self, request):
+        self.store.delete_project(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _list_datasets(self, request):
+        datasets = self.store.list_datasets(project_ids=self._projects_query(request),
+                                            name=request.query.get('name', None))
+        return await self._respond(request, datasets)
+
+    async def _create_dataset(self, request):
+        payload = await self._json(request)
+        dataset = self.store.create_dataset(name=payload['name'], projects=payload.get('projects', list()))
+        return await self._respond(request, dataset)
+
+    async def _get_dataset(self, request):
+        return await self._respond(request, self.store.get_dataset(request.match_info['id']))
+
+    async def _update_dataset(self, request):
+        payload = await self._json(request)
+        with self.store.lock:
+            dataset = self.store.get_dataset(request.match_info['id'])
+            for key in ['name', 'metadata']:
+                if key in payload:
+                    dataset[key] = payload[key]
+        return await self._respond(request, dataset)
+
+    async def _delete_dataset(self, request):
+        self.store.delete_dataset(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _directory_tree(self, request):
+        return await self._respond(request, self.store.directory_tree(request.match_info['id']))
+
+    async def _query(self, request):
+        payload = await self._json(request)
+        return await self._respond(request, self.store.query(dataset_id=request.match_info['id'], payload=payload))
+
+    async def _upload_item(self, request):
+        reader = await request.multipart()
+        fields = dict()
+        data = b''
+        while True:
+            part = await reader.next()
+            if part is None:
+                break
+            if part.name == 'file':
+                chunks = list()
+                while True:
+                    chunk = await part.read_chunk(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await self._throttle(request, len(chunk))
+                    chunks.append(chunk)
+                data = b''.join(chunks)
+                fields['filename'] = part.filename
+            else:
+                fields[part.name] = await part.text()
+        if fields.get('type', 'file') != 'file':
+            raise StoreError(status=400, message='unsupported item type: {}'.format(fields['type']))
+        metadata = json.loads(fields['metadata']) if 'metadata' in fields else None
+        item, operation = self.store.add_item(dataset_id=request.match_info['id'],
+                                              filename=fields.get('path', None) or fields['filename'],
+                                              data=data,
+                                              metadata=metadata,
+                                              mode=request.query.get('mode', 'skip'))
+        return await self._respond(request, item, headers={'x-item-op': operation})
+
+    async def _export_zip(self, request):
+        body = self.store.export_zip(dataset_id=request.match_info['id'],
+                                     directory=request.query.get('directory', None))
+        return await self._respond(request, body, content_type='application/zip')
+
+    async def _get_item(self, request):
+        return await self._respond(request, self.store.get_item(request.match_info['id']))
+
+    async def _update_item(self, request):
+        payload = await self._json(request)
+        return await self._respond(request, self.store.update_item(item_id=request.match_info['id'], payload=payload))
+
+    async def _delete_item(self, request):
+        self.store.delete_item(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _stream_item(self, request):
+        item = self.store.get_item(request.match_info['id'])
+        return await self._respond(request,
+                                   self.store.binaries[item['id']],
+                                   content_type=item['metadata']['system'].get('mimetype', 'application/octet-stream'))
+
+    async def _list_annotations(self, request):
+        return await self._respond(request, self.store.list_annotations(request.match_info['id']))
+
+    async def _create_annotations(self, request):
+        payload = await self._json(request)
+        item_id = request.match_info['id']
+        if isinstance(payload, list):
+            annotations = [self.store.add_annotation(item_id=item_id, payload=annotation) for annotation in payload]
+        else:
+            annotations = self.store.add_annotation(item_id=item_id, payload=payload)
+        return await self._respond(request, annotations)
+
+    async def _get_annotation(self, request):
+        return await self._respond(request, self.store.get_annotation(request.match_info['id']))
+
+    async def _update_annotation(self, request):
+        payload = await self._json(request)
+        annotation = self.store.update_annotation(annotation_id=request.match_info['id'], payload=payload)
+        return await self._respond(request, annotation)
+
+    async def _delete_annotation(self, request):
+        self.store.delete_annotation(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _create_recipe(self, request):
+        payload = await self._json(request)
+        return await self._respond(request, self.store.create_recipe(payload))
+
+    async def _get_recipe(self, request):
+        return await self._respond(request, self.store.get_recipe(request.match_info['id']))
+
+    async def _update_recipe(self, request):
+        payload = await self._json(request)
+        recipe = self.store.get_recipe(request.match_info['id'])
+        recipe.update({key: value for key, value in payload.items() if key not in ['id', 'url', 'creator']})
+        return await self._respond(request, recipe)
+
+    async def _delete_recipe(self, request):
+        self.store.get_recipe(request.match_info['id'])
+        self.store.recipes.pop(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _create_ontology(self, request):
+        payload = await self._json(request)
+        return await self._respond(request, self.store.create_ontology(payload))
+
+    async def _get_ontology(self, request):
+        return await self._respond(request, self.store.get_ontology(request.match_info['id']))
+
+    async def _update_ontology(self, request):
+        payload = await self._json(request)
+        ontology = self.store.update_ontology(ontology_id=request.match_info['id'], payload=payload)
+        return await self._respond(request, ontology)
+
+    async def _delete_ontology(self, request):
+        self.store.get_ontology(request.match_info['id'])
+        self.store.ontologies.pop(request.match_info['id'])
+        return await self._respond(request, {})
+
+    async def _list_executions(self, request):
+        executions = self.store.list_executions(service_id=request.query.get('service', None),
+                                                project_ids=self._projects_query(request),
+                                                status=request.query.get('status', None),
+                                                page_offset=int(request.query.get('pageOffset', 0)),
+                                                page_size=int(request.query.get('pageSize', 1000)))
+        return await self._respond(request, executions)
+
+    async def _create_execution(self, request):
+        payload = await self._json(request)
+        execution = self.store.create_execution(service_id=request.match_info['id'], payload=payload)
+        return await self._respond(request, execution)
+
+    async def _get_execution(self, request):
+        return await self._respond(request, self.store.get_execution(request.match_info['id']))
+
+    async def _execution_progress(self, request):
+        payload = await self._json(request)
+        execution = self.store.progress_execution(execution_id=request.match_info['id'], payload=payload)
+        return await self._respond(request, execution)
@@ -0,0 +1,652 @@
+import collections
+import threading
+import datetime
+import itertools
+import fnmatch
+import logging
+import json
+import copy
+import zipfile
+import io
+import os
+
+logger = logging.getLogger(name=__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_EMAIL = 'local@dataloop.ai'
+DEFAULT_ORG = {'id': 'local-org', 'name': 'local'}
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat()[:-3] + 'Z'
+
+
+def _field(doc, key):
+    # dotted field of a json document (e.g. metadata.system.mimetype)
+    value = doc
+    for part in key.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part, None)
+    return value
+
+
+def _compare(value, operator, arg):
+    if operator == '$eq':
+        return value == arg if not isinstance(value, list) else arg in value
+    if operator == '$ne':
+        return value != arg if not isinstance(value, list) else arg not in value
+    if operator == '$in':
+        if isinstance(value, list):
+            return any(v in arg for v in value)
+        return value in arg
+    if operator == '$nin':
+        return not _compare(value, '$in', arg)
+    if operator == '$exists':
+        return (value is not None) == bool(arg)
+    if operator == '$glob':
+        return value is not None and fnmatch.fnmatchcase(str(value), arg)
+    if operator in ['$gt', '$lt', '$gte', '$lte']:
+        if value is None:
+            return False
+        try:
+            if operator == '$gt':
+                return value > arg
+            if operator == '$lt':
+                return value < arg
+            if operator == '$gte':
+                return value >= arg
+            return value <= arg
+        except TypeError:
+            return False
+    raise ValueError('unknown filter operator: {}'.format(operator))
+
+
+def match(doc, query):
+    """
+    Evaluate a platform filter (Filters.prepare()['filter']) on a json document
+
+    :param doc: json document
+    :param query: filter dictionary ($and/$or of field conditions)
+    :return: True if the document matches
+    """
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(match(doc, sub_query) for sub_query in condition):
+                return False
+        elif key == '$or':
+            if not any(match(doc, sub_query) for sub_query in condition):
+                return False
+        else:
+            value = _field(doc, key)
+            if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+                if not all(_compare(value, op, arg) for op, arg in condition.items()):
+                    return False
+            elif isinstance(condition, str) and '*' in condition:
+                # the platform matches plain values with wildcards as globs (e.g. "filename": "/folder/*")
+                if not _compare(value, '$glob', condition):
+                    return False
+            elif not _compare(value, '$eq', condition):
+                return False
+    return True
+
+
+def _select(doc, fields):
+    # projected copy of a document - dotted fields (e.g. metadata.system.mimetype)
+    selected = dict()
+    for field in fields:
+        value = _field(doc, field)
+        if value is None:
+            continue
+        keys = field.split('.')
+        target = selected
+        for key in keys[:-1]:
+            target = target.setdefault(key, dict())
+        target[keys[-1]] = copy.deepcopy(value)
+    return selected
+
+
+def _roots(roots):
+    # label defaults filled by the platform
+    for root in roots:
+        value = root.setdefault('value', dict())
+        value.setdefault('displayLabel', value.get('tag', None))
+        value.setdefault('color', None)
+        value.setdefault('attributes', list())
+        root['children'] = _roots(root.get('children', list()))
+    return roots
+
+
+def _merge(target, update):
+    # recursive dictionary update (PATCH semantics)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(target.get(key, None), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class StoreError(Exception):
+    """
+    Raised by the store handlers - turned into an error response with the status code
+    """
+
+    def __init__(self, status, message):
+        super(StoreError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class GatewayStore:
+    """
+    In-memory platform state of the local gateway: projects, datasets, items (with their binaries), annotations,
+    recipes, ontologies and executions. All the entities are kept as the platform's json
+    """
+
+    def __init__(self, email=DEFAULT_EMAIL):
+        """
+        :param email: creator of the entities (and the token's user)
+        """
+        self.email = email
+        # base url of the entities' urls - set by the gateway when it starts
+        self.base_url = ''
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.projects = collections.OrderedDict()
+        self.datasets = collections.OrderedDict()
+        self.recipes = collections.OrderedDict()
+        self.ontologies = collections.OrderedDict()
+        self.executions = collections.OrderedDict()
+        self.items = dict()
+        self.annotations = dict()
+        # dataset id -> ordered item ids, item id -> ordered annotation ids
+        self.dataset_items = dict()
+        self.item_annotations = dict()
+        # dataset id -> filename -> item id
+        self.dataset_filenames = dict()
+        # item id -> bytes
+        self.binaries = dict()
+        # sorted query results per dataset (dropped when the dataset changes)
+        self._query_cache = dict()
+
+    def new_id(self):
+        # object-id like - matches Metrics.route_template
+        return '{:024x}'.format(next(self._ids))
+
+    def url(self, path):
+        return self.base_url + path
+
+    def _get(self, entities, entity_id, entity_type):
+        try:
+            return entities[entity_id]
+        except KeyError:
+            raise StoreError(status=404, message='{} not found: {}'.format(entity_type, entity_id))
+
+    def _changed(self, dataset_id):
+        self._query_cache.pop(dataset_id, None)
+
+    ############
+    # Projects #
+    ############
+    def create_project(self, name):
+        with self.lock:
+            project_id = self.new_id()
+            project = {'id': project_id,
+                       'name': name,
+                       'creator': self.email,
+                       'contributors': [{'email': self.email, 'role': 'owner'}],
+                       'org': DEFAULT_ORG,
+                       'createdAt': _now(),
+                       'updatedAt': _now(),
+                       'role': 'owner'}
+            self.projects[project_id] = project
+            return project
+
+    def get_project(self, project_id):
+        return self._get(self.projects, project_id, 'Project')
+
+    def delete_project(self, project_id):
+        with self.lock:
+            self.get_project(project_id)
+            for dataset in list(self.datasets.values()):
+                if project_id in dataset['projects']:
+                    self.delete_dataset(dataset['id'])
+            self.projects.pop(project_id)
+
+    ############
+    # Datasets #
+    ############
+    def create_dataset(self, name, projects, metadata=None):
+        with self.lock:
+            for project_id in projects:
+                self.get_project(project_id)
+            for dataset in self.datasets.values():
+                if dataset['name'] == name and set(dataset['projects']) & set(projects):
+                    raise StoreError(status=409, message='Dataset with the same name already exists: {}'.format(name))
+            dataset_id = self.new_id()
+            dataset = {'id': dataset_id,
+                       'name': name,
+                       'creator': self.email,
+                       'projects': list(projects),
+                       'createdAt': _now(),
+                       'itemsCount': 0,
+                       'annotated': 0,
+                       'directoryTree': {'dirs': [{'value': {'filename': '/', 'type': 'dir'}}]},
+                       'metadata': metadata if metadata is not None else {'system': {'recipes': list()}},
+                       'url': self.url('/datasets/{}'.format(dataset_id)),
+                       'items': self.url('/datasets/{}/items'.format(dataset_id)),
+                       'export': {'zip': self.url('/datasets/{}/annotations/zip'.format(dataset_id))}}
+            self.datasets[dataset_id] = dataset
+            self.dataset_items[dataset_id] = collections.OrderedDict()
+            self.dataset_filenames[dataset_id] = dict()
+            return dataset
+
+    def get_dataset(self, dataset_id):
+        return self._get(self.datasets, dataset_id, 'Dataset')
+
+    def list_datasets(self, project_ids=None, name=None):
+        with self.lock:
+            return [dataset for dataset in self.datasets.values()
+                    if (not project_ids or set(dataset['projects']) & set(project_ids)) and
+                    (name is None or dataset['name'] == name)]
+
+    def delete_dataset(self, dataset_id):
+        with self.lock:
+            self.get_dataset(dataset_id)
+            for item_id in list(self.dataset_items[dataset_id]):
+                self.delete_item(item_id)
+            self.datasets.pop(dataset_id)
+            self.dataset_items.pop(dataset_id)
+            self.dataset_filenames.pop(dataset_id)
+            self._changed(dataset_id)
+
+    def directory_tree(self, dataset_id):
+        with self.lock:
+            self.get_dataset(dataset_id)
+            dirs = sorted(set(self.items[item_id]['dir'] for item_id in self.dataset_items[dataset_id]) | {'/'})
+            return {'dirs': [{'value': {'filename': directory, 'type': 'dir'}} for directory in dirs]}
+
+    #########
+    # Items #
+    #########
+    def add_item(self, dataset_id, filename, data=b'', metadata=None, mode='skip'):
+        """
+        Add an item (upload)
+
+        :param dataset_id: dataset id
+        :param filename: remote path (e.g. /folder/image.jpg)
+        :param data: item's bytes
+        :param metadata: optional - item's metadata
+        :param mode: "skip" or "overwrite" an existing item with the same filename
+        :return: item json, operation (created, exist, updated)
+        """
+        if not filename.startswith('/'):
+            filename = '/' + filename
+        with self.lock:
+            self.get_dataset(dataset_id)
+            item_id = self.dataset_filenames[dataset_id].get(filename, None)
+            if item_id is not None:
+                if mode != 'overwrite':
+                    return self.items[item_id], 'exist'
+                self.binaries[item_id] = data
+                item = self.items[item_id]
+                item['metadata']['system']['size'] = len(data)
+                if metadata is not None:
+                    _merge(item['metadata'], metadata)
+                self._changed(dataset_id)
+                return item, 'updated'
+            item = self._item_json(dataset_id=dataset_id, filename=filename, size=len(data), metadata=metadata)
+            self._insert_item(item=item, data=data)
+            return item, 'created'
+
+    def populate(self, dataset_id, num_items, data=b'', directory='/', extension='.jpg', mimetype='image/jpeg',
+                 width=None, height=None, annotations=None):
+        """
+        Add many items at once (no upload) - for benchmarks
+
+        :param dataset_id: dataset id
+        :param num_items: number of items to add
+        :param data: bytes of every item (shared, not copied)
+        :param directory: remote directory of the items
+        :param extension: items' files extension
+        :param mimetype: items' mimetype
+        :param width: optional - items' width
+        :param height: optional - items' height
+        :param annotations: optional - list of annotations json (type, label, coordinates) added to every item
+        :return: list of item ids
+        """
+        item_ids = list()
+        directory = '/' + directory.strip('/') if directory.strip('/') else ''
+        with self.lock:
+            self.get_dataset(dataset_id)
+            offset = len(self.dataset_items[dataset_id])
+            for i_item in range(num_items):
+                filename = '{}/item_{:07d}{}'.format(directory, offset + i_item, extension)
+                system = {'mimetype': mimetype, 'width': width, 'height': height}
+                item = self._item_json(dataset_id=dataset_id,
+                                       filename=filename,
+                                       size=len(data),
+                                       metadata={'system': system})
+                self._insert_item(item=item, data=data)
+                for annotation in annotations or list():
+                    self.add_annotation(item_id=item['id'], payload=annotation)
+                item_ids.append(item['id'])
+        return item_ids
+
+    def _item_json(self, dataset_id, filename, size, metadata=None):
+        item_id = self.new_id()
+        name = filename.split('/')[-1]
+        item_metadata = {'system': {'originalname': name,
+                                    'size': size,
+                                    'encoding': '7bit',
+                                    'mimetype': 'application/octet-stream'}}
+        if metadata is not None:
+            _merge(item_metadata, metadata)
+        return {'id': item_id,
+                'datasetId': dataset_id,
+                'createdAt': _now(),
+                'dir': os.path.dirname(filename) or '/',
+                'filename': filename,
+                'name': name,
+                'type': 'file',
+                'hidden': False,
+                'annotated': False,
+                'metadata': item_metadata,
+                'url': self.url('/items/{}'.format(item_id)),
+                'stream': self.url('/items/{}/stream'.format(item_id)),
+                'thumbnail': self.url('/items/{}/thumbnail'.format(item_id)),
+                'annotations': self.url('/items/{}/annotations'.format(item_id)),
+                'dataset': self.url('/datasets/{}'.format(dataset_id))}
+
+    def _insert_item(self, item, data):
+        dataset_id = item['datasetId']
+        self.items[item['id']] = item
+        self.binaries[item['id']] = data
+        self.item_annotations[item['id']] = collections.OrderedDict()
+        self.dataset_items[dataset_id][item['id']] = True
+        self.dataset_filenames[dataset_id][item['filename']] = item['id']
+        self.datasets[dataset_id]['itemsCount'] += 1
+        self._changed(dataset_id)
+
+    def get_item(self, item_id):
+        return self._get(self.items, item_id, 'Item')
+
+    def update_item(self, item_id, payload):
+        with self.lock:
+            item = self.get_item(item_id)
+            for key in ['id', 'datasetId', 'url', 'stream', 'annotations', 'dataset']:
+                payload.pop(key, None)
+            if 'filename' in payload and payload['filename'] != item['filename']:
+                filenames = self.dataset_filenames[item['datasetId']]
+                filenames.pop(item['filename'], None)
+                filenames[payload['filename']] = item_id
+                payload['dir'] = os.path.dirname(payload['filename']) or '/'
+                payload['name'] = payload['filename'].split('/')[-1]
+            _merge(item, payload)
+            self._changed(item['datasetId'])
+            return item
+
+    def delete_item(self, item_id):
+        with self.lock:
+            item = self.get_item(item_id)
+            dataset_id = item['datasetId']
+            for annotation_id in list(self.item_annotations[item_id]):
+                self.delete_annotation(annotation_id)
+            self.items.pop(item_id)
+            self.binaries.pop(item_id, None)
+            self.item_annotations.pop(item_id)
+            self.dataset_items[dataset_id].pop(item_id, None)
+            self.dataset_filenames[dataset_id].pop(item['filename'], None)
+            self.datasets[dataset_id]['itemsCount'] -= 1
+            self._changed(dataset_id)
+
+    def query(self, dataset_id, payload):
+        """
+        Items/annotations query (POST /datasets/{id}/query)
+
+        :param dataset_id: dataset id
+        :param payload: Filters.prepare() format (optionally with an update/delete operation)
+        :return: response json
+        """
+        resource = payload.get('resource', 'items')
+        if resource not in ['items', 'annotations']:
+            raise StoreError(status=400, message='unknown query resource: {}'.format(resource))
+        with self.lock:
+            self.get_dataset(dataset_id)
+            ids = self._query_ids(dataset_id=dataset_id,
+                                  resource=resource,
+                                  query=payload.get('filter', dict()),
+                                  sort=payload.get('sort', None))
+            documents = self.items if resource == 'items' else self.annotations
+            if 'update' in payload:
+                for doc_id in ids:
+                    _merge(documents[doc_id], payload['update'])
+                self._changed(dataset_id)
+                return {'updated': len(ids)}
+            if payload.get('delete', False):
+                delete = self.delete_item if resource == 'items' else self.delete_annotation
+                for doc_id in ids:
+                    delete(doc_id)
+                return {'deleted': len(ids)}
+            total = len(ids)
+            if 'page' not in payload:
+                # annotations queries are not paged
+                page, page_size = 0, max(total, 1)
+            else:
+                page = int(payload['page'])
+                page_size = int(payload.get('pageSize', DEFAULT_PAGE_SIZE))
+            start = page * page_size
+            page_documents = [documents[doc_id] for doc_id in ids[start:start + page_size]]
+            if payload.get('select', None):
+                page_documents = [_select(doc, payload['select']) for doc in page_documents]
+            return {'items': page_documents,
+                    'totalItemsCount': total,
+                    'totalPagesCount': (total + page_size - 1) // page_size,
+                    'hasNextPage': start + page_size < total}
+
+    def _query_ids(self, dataset_id, resource, query, sort):
+        # paging through a dataset repeats the same query - keep the sorted ids until the dataset changes
+        key = json.dumps([resource, query, sort], sort_keys=True)
+        cache = self._query_cache.setdefault(dataset_id, dict())
+        if key in cache:
+            return cache[key]
+        if resource == 'items':
+            ids = [item_id for item_id in self.dataset_items[dataset_id] if match(self.items[item_id], query)]
+            documents = self.items
+        else:
+            ids = [annotation_id
+                   for item_id in self.dataset_items[dataset_id]
+                   for annotation_id in self.item_annotations[item_id]
+                   if match(self.annotations[annotation_id], query)]
+            documents = self.annotations
+        # ids are in creation order - stable sort from the last key to the first
+        for field, direction in reversed(list((sort or dict()).items())):
+            if field == 'createdAt':
+                if direction == 'descending':
+                    ids.reverse()
+                continue
+            ids.sort(key=lambda doc_id: str(_field(documents[doc_id], field)), reverse=direction == 'descending')
+        cache[key] = ids
+        return ids
+
+    ###############
+    # Annotations #
+    ###############
+    def add_annotation(self, item_id, payload):
+        with self.lock:
+            item = self.get_item(item_id)
+            annotation_id = self.new_id()
+            annotation = copy.deepcopy(payload)
+            annotation.update({'id': annotation_id,
+                               'itemId': item_id,
+                               'datasetId': item['datasetId'],
+                               'creator': self.email,
+                               'createdAt': _now(),
+                               'updatedBy': self.email,
+                               'updatedAt': _now(),
+                               'url': self.url('/annotations/{}'.format(annotation_id)),
+                               'item': item['url'],
+                               'dataset': item['dataset']})
+            annotation.setdefault('metadata', dict()).setdefault('system', dict())
+            annotation.setdefault('attributes', list())
+            self.annotations[annotation_id] = annotation
+            self.item_annotations[item_id][annotation_id] = True
+            if not item['annotated']:
+                item['annotated'] = True
+                self.datasets[item['datasetId']]['annotated'] += 1
+            self._changed(item['datasetId'])
+            return annotation
+
+    def list_annotations(self, item_id):
+        with self.lock:
+            self.get_item(item_id)
+            return [self.annotations[annotation_id] for annotation_id in self.item_annotations[item_id]]
+
+    def get_annotation(self, annotation_id):
+        return self._get(self.annotations, annotation_id, 'Annotation')
+
+    def update_annotation(self, annotation_id, payload):
+        with self.lock:
+            annotation = self.get_annotation(annotation_id)
+            for key in ['id', 'itemId', 'datasetId', 'creator', 'createdAt', 'url', 'item', 'dataset']:
+                payload.pop(key, None)
+            annotation.update(payload)
+            annotation['updatedAt'] = _now()
+            annotation['updatedBy'] = self.email
+            annotation.setdefault('metadata', dict()).setdefault('system', dict())
+            self._changed(annotation['datasetId'])
+            return annotation
+
+    def delete_annotation(self, annotation_id):
+        with self.lock:
+            annotation = self.get_annotation(annotation_id)
+            item_annotations = self.item_annotations[annotation['itemId']]
+            item_annotations.pop(annotation_id, None)
+            self.annotations.pop(annotation_id)
+            item = self.items[annotation['itemId']]
+            if item['annotated'] and not item_annotations:
+                item['annotated'] = False
+                self.datasets[item['datasetId']]['annotated'] -= 1
+            self._changed(annotation['datasetId'])
+
+    def export_zip(self, dataset_id, directory=None):
+        """
+        Annotations export: a zip with one json per item (json/<item's filename>.json)
+
+        :param dataset_id: dataset id
+        :param directory: optional - only items under this remote directory
+        :return: zip bytes
+        """
+        buffer = io.BytesIO()
+        with self.lock:
+            self.get_dataset(dataset_id)
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for item_id in self.dataset_items[dataset_id]:
+                    item = self.items[item_id]
+                    if directory is not None and not item['filename'].startswith(directory.rstrip('/') + '/'):
+                        continue
+                    content = {'_id': item_id,
+                               'filename': item['filename'],
+                               'annotations': self.list_annotations(item_id)}
+                    zip_file.writestr(os.path.splitext(item['filename'][1:])[0] + '.json', json.dumps(content))
+        return buffer.getvalue()
+
+    ##########################
+    # Recipes and ontologies #
+    ##########################
+    def create_recipe(self, payload):
+        with self.lock:
+            recipe_id = self.new_id()
+            recipe = {'id': recipe_id,
+                      'creator': self.email,
+                      'url': self.url('/recipes/{}'.format(recipe_id)),
+                      'title': payload.get('title', 'recipe'),
+                      'projectIds': payload.get('projectIds', list()),
+                      'description': payload.get('description', None),
+                      'ontologyIds': payload.get('ontologyIds', list()),
+                      'instructions': payload.get('instructions', list()),
+                      'metadata': payload.get('metadata', dict()),
+                      'examples': payload.get('examples', list()),
+                      'customActions': payload.get('customActions', list()),
+                      'uiSettings': payload.get('uiSettings', None)}
+            self.recipes[recipe_id] = recipe
+            return recipe
+
+    def get_recipe(self, recipe_id):
+        return self._get(self.recipes, recipe_id, 'Recipe')
+
+    def create_ontology(self, payload):
+        with self.lock:
+            ontology_id = self.new_id()
+            ontology = {'id': ontology_id,
+                        'creator': self.email,
+                        'url': self.url('/ontologies/{}'.format(ontology_id)),
+                        'roots': _roots(payload.get('roots', list())),
+                        'attributes': payload.get('attributes', list()),
+                        'metadata': payload.get('metadata', {'system': {'projectIds': payload.get('projectIds',
+                                                                                                   list())}})}
+            self.ontologies[ontology_id] = ontology
+            return ontology
+
+    def get_ontology(self, ontology_id):
+        return self._get(self.ontologies, ontology_id, 'Ontology')
+
+    def update_ontology(self, ontology_id, payload):
+        with self.lock:
+            ontology = self.get_ontology(ontology_id)
+            for key in ['roots', 'attributes', 'metadata']:
+                if key in payload:
+                    ontology[key] = _roots(payload[key]) if key == 'roots' else payload[key]
+            return ontology
+
+    ##############
+    # Executions #
+    ##############
+    def create_execution(self, service_id, payload):
+        with self.lock:
+            execution_id = self.new_id()
+            status = {'status': 'created', 'percentComplete': 0, 'timestamp': _now()}
+            execution = {'id': execution_id,
+                         'serviceId': service_id,
+                         'projectId': payload.get('projectId', None),
+                         'functionName': payload.get('functionName', 'run'),
+                         'input': payload.get('input', dict()),
+                         'creator': self.email,
+                         'createdAt': _now(),
+                         'updatedAt': _now(),
+                         'status': [status],
+                         'latestStatus': status,
+                         'output': None,
+                         'url': self.url('/executions/{}'.format(execution_id))}
+            self.executions[execution_id] = execution
+            return execution
+
+    def get_execution(self, execution_id):
+        return self._get(self.executions, execution_id, 'Execution')
+
+    def list_executions(self, service_id=None, project_ids=None, status=None, page_offset=0, page_size=1000):
+        with self.lock:
+            executions = [execution for execution in self.executions.values()
+                          if (service_id is None or execution['serviceId'] == service_id) and
+                          (not project_ids or execution['projectId'] in project_ids) and
+                          (status is None or execution['latestStatus']['status'] == status)]
+        start = page_offset * page_size
+        return {'items': executions[start:start + page_size],
+                'totalItemsCount': len(executions),
+                'totalPagesCount': (len(executions) + page_size - 1) // page_size,
+                'hasNextPage': start + page_size < len(executions)}
+
+    def progress_execution(self, execution_id, payload):
+        with self.lock:
+            execution = self.get_execution(execution_id)
+            status = {'status': payload.get('status', 'inProgress'),
+                      'percentComplete': payload.get('percentComplete', 0),
+                      'message': payload.get('message', None),
+                      'timestamp': _now()}
+            execution['status'].append(status)
+            execution['latestStatus'] = status
+            execution['updatedAt'] = _now()
+            if 'output' in payload:
+                execution['output'] = payload['output']
+            return execution
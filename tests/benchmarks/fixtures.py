@@ -0,0 +1,175 @@
+"""
+Platform-like json fixtures of the micro benchmarks: image and video items, every annotation type
+and a 1k-label ontology
+"""
+import base64
+import io
+
+DATASET_ID = '5f4d13ba4a958a2d0a1b2c3d'
+ITEM_ID = '5f4d13ba4a958a2d0a1b2c3e'
+VIDEO_ITEM_ID = '5f4d13ba4a958a2d0a1b2c3f'
+BASE_URL = 'https://gate.dataloop.ai/api/v1'
+CREATOR = 'annotator@dataloop.ai'
+NUM_LABELS = 1000
+LABEL_CHILDREN = 9
+
+
+def item_json(item_id=ITEM_ID, video=False):
+    system = {'originalname': 'frame.mp4' if video else 'image.jpg',
+              'size': 3145728 if video else 154321,
+              'encoding': '7bit',
+              'taskStatusLog': [],
+              'refs': [{'type': 'task', 'id': '5f4d13ba4a958a2d0a1b2c40'},
+                       {'type': 'assignment', 'id': '5f4d13ba4a958a2d0a1b2c41'}],
+              'mimetype': 'video/mp4' if video else 'image/jpeg',
+              'exif': {},
+              'width': 1920,
+              'height': 1080}
+    if video:
+        system.update({'fps': 25, 'duration': 60.0, 'nb_frames': 1500,
+                       'ffmpeg': {'codec_name': 'h264', 'avg_frame_rate': '25/1', 'nb_frames': '1500'}})
+    metadata = {'system': system,
+                'user': {'camera': 'front', 'weather': 'rain', 'tags': ['night', 'urban', 'highway']}}
+    if video:
+        metadata['fps'] = 25
+    filename = '/videos/drive_0001.mp4' if video else '/images/camera_front/frame_000123.jpg'
+    return {'id': item_id,
+            'datasetId': DATASET_ID,
+            'createdAt': '2020-08-31T14:22:18.000Z',
+            'dir': filename.rsplit('/', 1)[0],
+            'filename': filename,
+            'type': 'file',
+            'hidden': False,
+            'name': filename.rsplit('/', 1)[1],
+            'metadata': metadata,
+            'annotated': True,
+            'annotationsCount': 8,
+            'url': '{}/items/{}'.format(BASE_URL, item_id),
+            'thumbnail': '{}/items/{}/thumbnail'.format(BASE_URL, item_id),
+            'stream': '{}/items/{}/stream'.format(BASE_URL, item_id),
+            'annotations': '{}/items/{}/annotations'.format(BASE_URL, item_id),
+            'dataset': '{}/datasets/{}'.format(BASE_URL, DATASET_ID)}
+
+
+def _annotation(annotation_type, label, coordinates, i_annotation, item_id=ITEM_ID, system=None):
+    annotation_id = '5f4d13ba4a958a2d0a1b{:04x}'.format(i_annotation)
+    metadata = {'system': {'status': None, 'attributes': {}, 'clientId': 'c{}'.format(i_annotation),
+                           'objectId': str(i_annotation)},
+                'user': {}}
+    metadata['system'].update(system or dict())
+    return {'id': annotation_id,
+            'datasetId': DATASET_ID,
+            'itemId': item_id,
+            'url': '{}/annotations/{}'.format(BASE_URL, annotation_id),
+            'item': '{}/items/{}'.format(BASE_URL, item_id),
+            'dataset': '{}/datasets/{}'.format(BASE_URL, DATASET_ID),
+            'type': annotation_type,
+            'label': label,
+            'attributes': ['occluded', 'truncated'],
+            'coordinates': coordinates,
+            'metadata': metadata,
+            'creator': CREATOR,
+            'createdAt': '2020-08-31T14:25:01.000Z',
+            'updatedBy': CREATOR,
+            'updatedAt': '2020-08-31T14:25:01.000Z',
+            'hash': 'c6d3c2a6b0f0e5d0d7ca2b1e5d4b3a29',
+            'source': 'ui'}
+
+
+def polygon_points(num_points=64, radius=100.0, x=500.0, y=400.0):
+    import math
+    return [{'x': x + radius * math.cos(2 * math.pi * i / num_points),
+             'y': y + radius * math.sin(2 * math.pi * i / num_points),
+             'z': 0} for i in range(num_points)]
+
+
+def binary_png(height=256, width=256):
+    """
+    :return: base64 png coordinates of a binary annotation (as the platform sends them)
+    """
+    import numpy as np
+    from PIL import Image
+    mask = np.zeros((height, width, 4), dtype=np.uint8)
+    mask[height // 4:3 * height // 4, width // 4:3 * width // 4] = (255, 0, 0, 255)
+    buffer = io.BytesIO()
+    Image.fromarray(mask).save(buffer, format='png')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def image_annotations():
+    """
+    :return: dictionary of annotation type -> annotation json of an image item
+    """
+    return {'box': _annotation('box', 'car', [{'x': 100.5, 'y': 200.25, 'z': 0}, {'x': 340.0, 'y': 410.75, 'z': 0}],
+                               1),
+            'segment': _annotation('segment', 'person', [polygon_points()], 2, system={'isOpen': False}),
+            'polyline': _annotation('segment', 'lane', [polygon_points(num_points=32)], 3, system={'isOpen': True}),
+            'point': _annotation('point', 'keypoint', {'x': 120.5, 'y': 99.0, 'z': 0}, 4),
+            'ellipse': _annotation('ellipse', 'sign',
+                                   {'angle': 30.0, 'center': {'x': 300.0, 'y': 200.0, 'z': 0}, 'rx': 40.0,
+                                    'ry': 20.0}, 5),
+            'class': _annotation('class', 'daytime', [], 6),
+            'binary': _annotation('binary', 'road', binary_png(), 7)}
+
+
+def video_annotations(num_snapshots=50):
+    """
+    :return: dictionary of annotation type -> annotation json of a video item (with snapshots)
+    """
+    snapshots = [{'frame': frame,
+                  'startTime': frame / 25.0,
+                  'fixed': frame % 10 == 0,
+                  'label': 'car',
+                  'attributes': ['moving'],
+                  'type': 'box',
+                  'data': [{'x': 100.0 + frame, 'y': 200.0, 'z': 0}, {'x': 340.0 + frame, 'y': 410.0, 'z': 0}]}
+                 for frame in range(1, num_snapshots + 1)]
+    box = _annotation('box', 'car', [{'x': 100.0, 'y': 200.0, 'z': 0}, {'x': 340.0, 'y': 410.0, 'z': 0}], 8,
+                      item_id=VIDEO_ITEM_ID,
+                      system={'frame': 0, 'startTime': 0, 'endFrame': num_snapshots,
+                              'endTime': num_snapshots / 25.0, 'snapshots_': snapshots, 'automated': False})
+    classification = _annotation('class', 'daytime', [], 9,
+                                 item_id=VIDEO_ITEM_ID,
+                                 system={'frame': 0, 'startTime': 0, 'endFrame': num_snapshots,
+                                         'endTime': num_snapshots / 25.0, 'snapshots_': []})
+    return {'box': box, 'class': classification}
+
+
+def ontology_roots(num_labels=NUM_LABELS, children=LABEL_CHILDREN):
+    """
+    :return: ontology roots with num_labels labels (parents with children). colors in hex and rgb() formats
+    """
+    roots = list()
+    num_parents = num_labels // (children + 1)
+    for i_parent in range(num_parents):
+        child_roots = list()
+        for i_child in range(children):
+            i_label = i_parent * (children + 1) + i_child
+            color = 'rgb({},{},{})'.format(i_label % 256, (i_label * 7) % 256, (i_label * 13) % 256) \
+                if i_child % 2 else '#{:02x}{:02x}{:02x}'.format(i_label % 256, (i_label * 3) % 256, 128)
+            child_roots.append({'value': {'tag': 'child_{}'.format(i_child),
+                                          'displayLabel': 'Child {}'.format(i_child),
+                                          'color': color,
+                                          'attributes': ['a', 'b']},
+                                'children': []})
+        roots.append({'value': {'tag': 'label_{:04d}'.format(i_parent),
+                                'displayLabel': 'Label {}'.format(i_parent),
+                                'color': '#{:02x}{:02x}{:02x}'.format(i_parent % 256, 64, 200),
+                                'attributes': []},
+                      'children': child_roots})
+    return roots
+
+
+def dataset_json():
+    return {'id': DATASET_ID,
+            'name': 'benchmarks',
+            'creator': CREATOR,
+            'projects': ['5f4d13ba4a958a2d0a1b2c00'],
+            'createdAt': '2020-08-31T14:20:00.000Z',
+            'itemsCount': 100000,
+            'annotated': 80000,
+            'directoryTree': {'dirs': [{'value': {'filename': '/', 'type': 'dir'}}]},
+            'metadata': {'system': {'recipes': ['5f4d13ba4a958a2d0a1b2c01']}},
+            'url': '{}/datasets/{}'.format(BASE_URL, DATASET_ID),
+            'items': '{}/datasets/{}/items'.format(BASE_URL, DATASET_ID),
+            'export': {'zip': '{}/datasets/{}/annotations/zip'.format(BASE_URL, DATASET_ID)}}
@@ -0,0 +1,346 @@
+"""
+Macro benchmarks of the SDK's bulk paths against the local gateway (offline):
+upload, download, pagination, annotations export and dataset conversion.
+
+Every scenario runs in its own client process (clean peak RSS), the gateway runs in another process
+(its CPU and memory are not measured).
+
+    python tests/benchmarks/macro_benchmarks.py --output baseline.json
+    python tests/benchmarks/macro_benchmarks.py --scale 0.1 --compare baseline.json
+"""
+import multiprocessing
+import collections
+import subprocess
+import argparse
+import tempfile
+import shutil
+import json
+import time
+import sys
+import os
+
+import report
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+PACKAGE_DIR = os.path.dirname(os.path.dirname(BENCHMARKS_DIR))
+MB = 1024 * 1024
+# metric -> higher is better (regression direction of --compare)
+METRICS = collections.OrderedDict([('items_per_second', True),
+                                   ('mb_per_second', True),
+                                   ('cpu_seconds', False),
+                                   ('peak_rss_mb', False),
+                                   ('latency_p50', False),
+                                   ('latency_p99', False)])
+LABELS = collections.OrderedDict([('cat', '#ff0000'), ('dog', '#00ff00'), ('bird', '#0000ff')])
+ANNOTATIONS = [{'type': 'box', 'label': 'cat', 'coordinates': [{'x': 10, 'y': 10, 'z': 0}, {'x': 50, 'y': 60, 'z': 0}],
+                'metadata': {'system': {}}},
+               {'type': 'segment', 'label': 'dog',
+                'coordinates': [[{'x': 5, 'y': 5, 'z': 0}, {'x': 40, 'y': 8, 'z': 0}, {'x': 30, 'y': 45, 'z': 0}]],
+                'metadata': {'system': {}}},
+               {'type': 'point', 'label': 'bird', 'coordinates': {'x': 20, 'y': 30, 'z': 0},
+                'metadata': {'system': {}}}]
+
+
+class Scenario:
+    """
+    One benchmark: the gateway's fixture, the client's setup and the measured run
+    """
+
+    def __init__(self, name, run, items=0, item_size=0, annotated=False, span='http.request', route=None,
+                 setup=None):
+        """
+        :param name: scenario name
+        :param run: callable(dataset, workdir, context) -> (items, bytes) - the measured part
+        :param items: items in the dataset before the run (scaled)
+        :param item_size: bytes of each item in the dataset
+        :param annotated: add ANNOTATIONS to every item of the dataset
+        :param span: span name of the per-item latency
+        :param route: optional - only http spans of this route template
+        :param setup: optional - callable(workdir, scale) -> context, not measured (e.g. create files)
+        """
+        self.name = name
+        self.run = run
+        self.items = items
+        self.item_size = item_size
+        self.annotated = annotated
+        self.span = span
+        self.route = route
+        self.setup = setup
+
+
+#########
+# Setup #
+#########
+def write_files(workdir, num_files, size):
+    directory = os.path.join(workdir, 'upload')
+    os.makedirs(directory)
+    chunk = os.urandom(min(size, MB))
+    for i_file in range(num_files):
+        with open(os.path.join(directory, 'file_{:06d}.bin'.format(i_file)), 'wb') as f:
+            written = 0
+            while written < size:
+                f.write(chunk[:size - written])
+                written += len(chunk)
+    return {'directory': directory, 'num_files': num_files, 'bytes': num_files * size}
+
+
+def setup_small_files(workdir, scale):
+    return write_files(workdir=workdir, num_files=max(1, int(10000 * scale)), size=1024)
+
+
+def setup_large_files(workdir, scale):
+    # 10 files - the size is scaled
+    return write_files(workdir=workdir, num_files=10, size=max(MB, int(50 * MB * scale)))
+
+
+########
+# Runs #
+########
+def run_upload(dataset, workdir, context):
+    dataset.items.upload(local_path=context['directory'], remote_path='/upload')
+    return context['num_files'], context['bytes']
+
+
+def local_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, filename))
+               for root, _, filenames in os.walk(directory) for filename in filenames)
+
+
+def run_download(dataset, workdir, context):
+    local_path = os.path.join(workdir, 'download')
+    output = dataset.items.download(local_path=local_path)
+    return len(output), local_bytes(local_path)
+
+
+def run_download_with_annotations(dataset, workdir, context):
+    local_path = os.path.join(workdir, 'download')
+    options = ['json']
+    try:
+        import cv2
+        options.append('mask')
+    except ImportError:
+        pass
+    output = dataset.items.download(local_path=local_path, annotation_options=options)
+    return len(output), local_bytes(local_path)
+
+
+def run_pages_iterate(dataset, workdir, context):
+    count = 0
+    for page in dataset.items.list(page_size=1000):
+        count += len(page)
+    return count, 0
+
+
+def run_pages_all(dataset, workdir, context):
+    count = 0
+    for _ in dataset.items.list().all():
+        count += 1
+    return count, 0
+
+
+def run_download_annotations(dataset, workdir, context):
+    local_path = os.path.join(workdir, 'annotations')
+    dataset.download_annotations(local_path=local_path)
+    return dataset.itemsCount, local_bytes(local_path)
+
+
+def run_convert(to_format):
+    def run(dataset, workdir, context):
+        import dtlpy as dl
+        local_path = os.path.join(workdir, 'convert')
+        os.makedirs(local_path)
+        dl.utilities.Converter().convert_dataset(dataset=dataset, to_format=to_format, local_path=local_path)
+        return dataset.itemsCount, local_bytes(local_path)
+
+    return run
+
+
+SCENARIOS = collections.OrderedDict(
+    (scenario.name, scenario) for scenario in [
+        Scenario(name='upload_small_files', run=run_upload, setup=setup_small_files, span='item.upload'),
+        Scenario(name='upload_large_files', run=run_upload, setup=setup_large_files, span='item.upload'),
+        Scenario(name='download', run=run_download, items=2000, item_size=64 * 1024, span='item.download'),
+        Scenario(name='download_with_annotations', run=run_download_with_annotations, items=2000,
+                 item_size=64 * 1024, annotated=True, span='item.download'),
+        Scenario(name='pages_iterate', run=run_pages_iterate, items=100000, route='/datasets/{id}/query'),
+        Scenario(name='pages_all', run=run_pages_all, items=100000, route='/datasets/{id}/query'),
+        Scenario(name='download_annotations', run=run_download_annotations, items=10000, annotated=True),
+        Scenario(name='convert_coco', run=run_convert('coco'), items=1000, annotated=True),
+        Scenario(name='convert_yolo', run=run_convert('yolo'), items=1000, annotated=True),
+        Scenario(name='convert_voc', run=run_convert('voc'), items=1000, annotated=True)])
+
+
+###########
+# Gateway #
+###########
+def serve_gateway(scenario_name, scale, network, connection):
+    """
+    Gateway process: build the scenario's dataset and serve it until asked to stop
+    """
+    sys.path.insert(0, PACKAGE_DIR)
+    from dtlpy.utilities.local_gateway import LocalGateway, GatewaySettings, GatewayStore
+    scenario = SCENARIOS[scenario_name]
+    store = GatewayStore()
+    project = store.create_project(name='benchmarks')
+    ontology = store.create_ontology({'roots': [{'value': {'tag': tag, 'color': color}}
+                                                for tag, color in LABELS.items()]})
+    recipe = store.create_recipe({'title': 'benchmarks', 'projectIds': [project['id']],
+                                  'ontologyIds': [ontology['id']]})
+    dataset = store.create_dataset(name=scenario.name,
+                                   projects=[project['id']],
+                                   metadata={'system': {'recipes': [recipe['id']]}})
+    if scenario.items:
+        store.populate(dataset_id=dataset['id'],
+                       num_items=max(1, int(scenario.items * scale)),
+                       data=os.urandom(scenario.item_size),
+                       width=640,
+                       height=480,
+                       annotations=ANNOTATIONS if scenario.annotated else None)
+    gateway = LocalGateway(store=store, settings=GatewaySettings(**network)).start()
+    connection.send({'port': gateway.port, 'dataset_id': dataset['id']})
+    connection.recv()
+    connection.send(dict(gateway.requests))
+    gateway.stop()
+
+
+##########
+# Client #
+##########
+def run_client(scenario_name, scale, port, dataset_id, workdir):
+    """
+    Client process: run one scenario and print its metrics (json, last line)
+    """
+    import dtlpy as dl
+    from dtlpy.services import SpanListener
+    from dtlpy.utilities.local_gateway import LocalGateway
+
+    scenario = SCENARIOS[scenario_name]
+    client_api = LocalGateway(port=port).connect()
+    client_api.verbose.disable_progress_bar = True
+    client_api.verbose.logging_level = 'warning'
+    dataset = dl.datasets.get(dataset_id=dataset_id)
+    context = scenario.setup(workdir, scale) if scenario.setup is not None else None
+
+    latencies = list()
+
+    class LatencyListener(SpanListener):
+        def on_end(self, span):
+            if span.name == scenario.span and (scenario.route is None or
+                                               span.attributes.get('route', None) == scenario.route):
+                latencies.append(span.duration)
+
+    client_api.tracer.add_listener(LatencyListener())
+    cpu_start = time.process_time()
+    with report.PeakMemory() as memory:
+        tic = time.perf_counter()
+        num_items, num_bytes = scenario.run(dataset, workdir, context)
+        seconds = time.perf_counter() - tic
+    cpu_seconds = time.process_time() - cpu_start
+    result = {'items': num_items,
+              'bytes': num_bytes,
+              'seconds': seconds,
+              'cpu_seconds': cpu_seconds,
+              'items_per_second': num_items / seconds if seconds else None,
+              'mb_per_second': num_bytes / MB / seconds if seconds and num_bytes else None,
+              'peak_rss_mb': memory.peak / MB if memory.peak is not None else None,
+              'rss_growth_mb': (memory.peak - memory.start) / MB if memory.peak is not None else None,
+              'latency_samples': len(latencies),
+              'latency_p50': report.percentile(latencies, 0.5),
+              'latency_p99': report.percentile(latencies, 0.99)}
+    print(json.dumps(result))
+
+
+def run_scenario(scenario_name, scale, network):
+    """
+    Start the gateway process and the client process of one scenario
+
+    :return: metrics dictionary
+    """
+    parent, child = multiprocessing.Pipe()
+    gateway = multiprocessing.Process(target=serve_gateway, args=(scenario_name, scale, network, child))
+    gateway.daemon = True
+    gateway.start()
+    workdir = tempfile.mkdtemp()
+    try:
+        served = parent.recv()
+        env = dict(os.environ)
+        # cookie file of the benchmark environment
+        env['HOME'] = workdir
+        env['USERPROFILE'] = workdir
+        env['PYTHONPATH'] = os.pathsep.join([PACKAGE_DIR, env.get('PYTHONPATH', '')])
+        cmds = [sys.executable, os.path.realpath(__file__),
+                '--client', scenario_name,
+                '--scale', str(scale),
+                '--port', str(served['port']),
+                '--dataset-id', served['dataset_id'],
+                '--workdir', workdir]
+        p = subprocess.Popen(cmds, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        if p.returncode != 0:
+            raise RuntimeError('Scenario {} failed:\n{}'.format(scenario_name, err.decode()))
+        result = json.loads(out.decode().strip().splitlines()[-1])
+        parent.send('stop')
+        result['requests'] = sum(parent.recv().values())
+    finally:
+        gateway.join(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dtlpy macro benchmarks (offline, local gateway)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS.keys()),
+                        help='comma separated scenarios. known: {}'.format(', '.join(SCENARIOS.keys())))
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the number of items (e.g. 0.1)')
+    parser.add_argument('--latency', type=float, default=0.0, help='gateway latency per request (seconds)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='gateway bandwidth (bytes per second)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests failed with 503')
+    parser.add_argument('--output', default=None, help='save the results as a json baseline')
+    parser.add_argument('--compare', default=None, help='baseline json to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    # internal - client process of one scenario
+    parser.add_argument('--client', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--dataset-id', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # the scenario processes get it in PYTHONPATH, the report needs it here (run from a checkout)
+    sys.path.insert(0, PACKAGE_DIR)
+
+    if args.client is not None:
+        run_client(scenario_name=args.client, scale=args.scale, port=args.port, dataset_id=args.dataset_id,
+                   workdir=args.workdir)
+        return 0
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error('unknown scenarios: {}'.format(unknown))
+    network = {'latency': args.latency, 'bandwidth': args.bandwidth, 'error_rate': args.error_rate}
+    results = collections.OrderedDict()
+    for name in names:
+        result = run_scenario(scenario_name=name, scale=args.scale, network=network)
+        results[name] = result
+        print('{:<28} {:>8} items {:>9.2f}s {:>10.1f} items/s {:>8} MB/s  peak rss {:>7.1f} MB  '
+              'p50 {} p99 {}'.format(name, result['items'], result['seconds'], result['items_per_second'] or 0,
+                                     '{:.1f}'.format(result['mb_per_second']) if result['mb_per_second'] else '-',
+                                     result['peak_rss_mb'] or 0, _ms(result['latency_p50']),
+                                     _ms(result['latency_p99'])))
+    if args.output is not None:
+        report.save(filepath=args.output, results=results, settings=dict(network, scale=args.scale))
+        print('Saved: {}'.format(args.output))
+    if args.compare is not None:
+        regressions = report.compare(baseline_filepath=args.compare, results=results, metrics=METRICS,
+                                     threshold=args.threshold)
+        if regressions:
+            print('{} regressions over {:.0%}'.format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+def _ms(seconds):
+    return '-' if seconds is None else '{:.1f}ms'.format(seconds * 1000)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
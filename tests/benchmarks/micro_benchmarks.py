@@ -0,0 +1,248 @@
+"""
+Micro benchmarks of the per-object hot paths: entities parsing and serialization, filters and geometry.
+
+Stand-alone (ns/op and memory allocated per op):
+    python tests/benchmarks/micro_benchmarks.py --output micro.json
+    python tests/benchmarks/micro_benchmarks.py --filter annotation --compare micro.json
+With pytest-benchmark:
+    pytest tests/benchmarks/test_micro_benchmarks.py
+"""
+import collections
+import tracemalloc
+import argparse
+import time
+import sys
+import gc
+
+import fixtures
+import report
+
+# metric -> higher is better (regression direction of --compare)
+METRICS = collections.OrderedDict([('ns_per_op', False),
+                                   ('peak_bytes_per_op', False),
+                                   ('retained_blocks_per_op', False)])
+
+
+class Context:
+    """
+    Entities shared by the benchmarks (built once - no client, no requests)
+    """
+
+    def __init__(self):
+        from dtlpy import entities
+        self.entities = entities
+        self.dataset = entities.Dataset.from_json(project=None, _json=fixtures.dataset_json(), client_api=None)
+        self.roots = fixtures.ontology_roots()
+        self.labels = [entities.Label.from_root(root=root) for root in self.roots]
+        # labels are set - no recipes/ontologies requests
+        self.dataset._labels = self.labels
+        self.item_json = fixtures.item_json()
+        self.video_item_json = fixtures.item_json(item_id=fixtures.VIDEO_ITEM_ID, video=True)
+        self.item = entities.Item.from_json(_json=self.item_json, client_api=None, dataset=self.dataset)
+        self.video_item = entities.Item.from_json(_json=self.video_item_json, client_api=None, dataset=self.dataset)
+        self.annotations_json = fixtures.image_annotations()
+        self.video_annotations_json = fixtures.video_annotations()
+
+
+def _benchmarks():
+    """
+    :return: ordered dictionary of benchmark name -> callable(context) returning the function to measure
+    """
+    benchmarks = collections.OrderedDict()
+
+    def benchmark(name):
+        def register(func):
+            benchmarks[name] = func
+            return func
+
+        return register
+
+    @benchmark('item.from_json.image')
+    def item_from_json(context):
+        return lambda: context.entities.Item.from_json(_json=context.item_json, client_api=None,
+                                                       dataset=context.dataset)
+
+    @benchmark('item.from_json.video')
+    def video_item_from_json(context):
+        return lambda: context.entities.Item.from_json(_json=context.video_item_json, client_api=None,
+                                                       dataset=context.dataset)
+
+    def annotation_from_json(annotation_type, video=False):
+        def setup(context):
+            _json = (context.video_annotations_json if video else context.annotations_json)[annotation_type]
+            item = context.video_item if video else context.item
+            return lambda: context.entities.Annotation.from_json(_json=_json, item=item)
+
+        return setup
+
+    def annotation_to_json(annotation_type, video=False):
+        def setup(context):
+            _json = (context.video_annotations_json if video else context.annotations_json)[annotation_type]
+            item = context.video_item if video else context.item
+            annotation = context.entities.Annotation.from_json(_json=_json, item=item)
+            return annotation.to_json
+
+        return setup
+
+    for annotation_type in fixtures.image_annotations():
+        benchmarks['annotation.from_json.{}'.format(annotation_type)] = annotation_from_json(annotation_type)
+    for annotation_type in ['box', 'segment', 'point', 'class']:
+        benchmarks['annotation.to_json.{}'.format(annotation_type)] = annotation_to_json(annotation_type)
+    benchmarks['annotation.from_json.video_box'] = annotation_from_json('box', video=True)
+    benchmarks['annotation.to_json.video_box'] = annotation_to_json('box', video=True)
+
+    @benchmark('filters.prepare')
+    def filters_prepare(context):
+        filters = context.entities.Filters()
+        filters.add(field='dir', values='/images/camera_front')
+        filters.add(field='metadata.system.mimetype', values=['image/jpeg', 'image/png'], operator='in')
+        filters.add(field='metadata.user.weather', values='rain')
+        filters.add(field='annotated', values=True)
+        filters.add_join(field='label', values=['car', 'person'], operator='in')
+        filters.sort_by(field='filename')
+        return filters.prepare
+
+    @benchmark('box.from_json')
+    def box_from_json(context):
+        _json = context.annotations_json['box']
+        return lambda: context.entities.Box.from_json(_json)
+
+    @benchmark('polygon.from_json')
+    def polygon_from_json(context):
+        _json = context.annotations_json['segment']
+        return lambda: context.entities.Polygon.from_json(_json)
+
+    @benchmark('segmentation.from_coordinates')
+    def segmentation_from_coordinates(context):
+        coordinates = context.annotations_json['binary']['coordinates']
+        return lambda: context.entities.Segmentation.from_coordinates(coordinates)
+
+    @benchmark('label.rgb.hex')
+    def label_rgb_hex(context):
+        label = context.labels[0]
+        return lambda: label.rgb
+
+    @benchmark('label.rgb.rgb_string')
+    def label_rgb_string(context):
+        # odd children colors are "rgb(r,g,b)"
+        label = context.labels[0].children[1]
+        return lambda: label.rgb
+
+    @benchmark('label.from_root.1k_labels')
+    def labels_from_root(context):
+        return lambda: [context.entities.Label.from_root(root=root) for root in context.roots]
+
+    @benchmark('dataset.labels_flat_dict.1k_labels')
+    def labels_flat_dict(context):
+        return lambda: context.dataset.labels_flat_dict
+
+    return benchmarks
+
+
+BENCHMARKS = _benchmarks()
+
+
+def measure_time(func, min_time=0.2, repeat=5):
+    """
+    :param func: function to measure
+    :param min_time: seconds of each repetition (loops are calibrated)
+    :param repeat: repetitions - the best is reported
+    :return: (best ns per op, median ns per op, loops per repetition)
+    """
+    loops = 1
+    while True:
+        tic = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - tic
+        if elapsed >= min_time / 10 or loops >= 10 ** 7:
+            break
+        loops *= 10
+    loops = max(1, int(loops * (min_time / 10) / max(elapsed, 1e-9)) * 10)
+    timings = list()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            tic = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - tic) / loops * 1e9)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return min(timings), report.percentile(timings, 0.5), loops
+
+
+def measure_memory(func, num_ops=100):
+    """
+    :param func: function to measure
+    :param num_ops: ops of the retained memory measurement
+    :return: (peak bytes allocated during one op, memory blocks retained by the result of one op)
+    """
+    func()
+    gc.collect()
+    # started per benchmark - resets the peak on every python version
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        # blocks kept alive by the results (objects created per op)
+        before = tracemalloc.take_snapshot()
+        results = [func() for _ in range(num_ops)]
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+        del results
+    finally:
+        tracemalloc.stop()
+    return peak - base, blocks / float(num_ops)
+
+
+def run(names, min_time=0.2, repeat=5):
+    """
+    :param names: benchmark names
+    :return: ordered dictionary of name -> metrics
+    """
+    context = Context()
+    results = collections.OrderedDict()
+    for name in names:
+        func = BENCHMARKS[name](context)
+        best, median, loops = measure_time(func, min_time=min_time, repeat=repeat)
+        peak_bytes, blocks = measure_memory(func, num_ops=min(loops, 100))
+        results[name] = {'ns_per_op': best,
+                         'ns_per_op_median': median,
+                         'loops': loops,
+                         'peak_bytes_per_op': peak_bytes,
+                         'retained_blocks_per_op': blocks}
+        print('{:<40} {:>14,.0f} ns/op {:>12,} B peak/op {:>10.1f} blocks/op'.format(name, best, peak_bytes, blocks))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dtlpy micro benchmarks')
+    parser.add_argument('--filter', default=None, help='only benchmarks containing this text')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per repetition')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions (best is reported)')
+    parser.add_argument('--output', default=None, help='save the results as a json baseline')
+    parser.add_argument('--compare', default=None, help='baseline json to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.filter is None or args.filter in name]
+    results = run(names=names, min_time=args.min_time, repeat=args.repeat)
+    if args.output is not None:
+        report.save(filepath=args.output, results=results, settings={'min_time': args.min_time,
+                                                                     'repeat': args.repeat})
+        print('Saved: {}'.format(args.output))
+    if args.compare is not None:
+        regressions = report.compare(baseline_filepath=args.compare, results=results, metrics=METRICS,
+                                     threshold=args.threshold)
+        if regressions:
+            print('{} regressions over {:.0%}'.format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Shared helpers of the benchmark runners: percentiles, memory sampling and json baselines
+"""
+import threading
+import datetime
+import platform
+import json
+import sys
+import os
+
+
+def percentile(values, q):
+    """
+    :param values: list of numbers
+    :param q: 0-1
+    :return: nearest-rank percentile or None for an empty list
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def rss_bytes():
+    """
+    :return: current resident set size of this process (bytes) or None if unknown
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    """
+    Sample the process' RSS on a background thread while the block runs
+    e.g.
+        with PeakMemory() as memory:
+            run()
+        memory.peak, memory.start
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start = rss_bytes()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self._update()
+
+    def _update(self):
+        current = rss_bytes()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._update()
+
+
+def environment():
+    """
+    :return: dictionary describing the machine and the versions of the measured run
+    """
+    import dtlpy
+    return {'dtlpy_version': dtlpy.__version__,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'created_at': datetime.datetime.utcnow().isoformat() + 'Z'}
+
+
+def save(filepath, results, settings=None):
+    """
+    Save a json baseline
+
+    :param filepath: output file
+    :param results: dictionary of benchmark name -> metrics
+    :param settings: optional - run settings (scale, network conditions)
+    """
+    baseline = {'environment': environment(),
+                'settings': settings if settings is not None else dict(),
+                'results': results}
+    with open(filepath, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(baseline_filepath, results, metrics, threshold=0.1):
+    """
+    Print the changes from a saved baseline
+
+    :param baseline_filepath: json saved by "save"
+    :param results: current results (benchmark name -> metrics)
+    :param metrics: dictionary of metric name -> True if higher is better
+    :param threshold: relative change reported as a regression
+    :return: list of regressions (benchmark, metric, baseline value, current value)
+    """
+    with open(baseline_filepath) as f:
+        baseline = json.load(f)['results']
+    regressions = list()
+    print('{:<40} {:<24} {:>14} {:>14} {:>9}'.format('benchmark', 'metric', 'baseline', 'current', 'change'))
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        for metric, higher_is_better in metrics.items():
+            old, new = baseline[name].get(metric, None), current.get(metric, None)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = (-change if higher_is_better else change) > threshold
+            if regressed:
+                regressions.append((name, metric, old, new))
+            print('{:<40} {:<24} {:>14.6g} {:>14.6g} {:>+8.1%}{}'.format(name, metric, old, new, change,
+                                                                        ' !' if regressed else ''))
+    return regressions
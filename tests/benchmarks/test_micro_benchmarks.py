@@ -0,0 +1,24 @@
+"""
+The micro benchmarks under pytest-benchmark:
+    pytest tests/benchmarks/test_micro_benchmarks.py --benchmark-autosave
+    pytest tests/benchmarks/test_micro_benchmarks.py --benchmark-compare --benchmark-compare-fail=min:10%
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import micro_benchmarks
+
+
+@pytest.fixture(scope='module')
+def context():
+    return micro_benchmarks.Context()
+
+
+@pytest.mark.parametrize('name', list(micro_benchmarks.BENCHMARKS))
+def test_micro_benchmark(benchmark, context, name):
+    func = micro_benchmarks.BENCHMARKS[name](context)
+    peak_bytes, blocks = micro_benchmarks.measure_memory(func)
+    benchmark.extra_info['peak_bytes_per_op'] = peak_bytes
+    benchmark.extra_info['retained_blocks_per_op'] = blocks
+    benchmark(func)
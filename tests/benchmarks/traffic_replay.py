@@ -0,0 +1,130 @@
+"""
+Compare releases on a captured production workload - no platform calls on replay.
+
+A workload is a python file with a "run(dl)" function (e.g. a nightly export).
+Capture it once against the platform (logged in):
+    python tests/benchmarks/traffic_replay.py capture --workload nightly_export.py --trace nightly.dltrace
+Replay it with every release (original latencies) and compare cpu time, request count and wall time:
+    python tests/benchmarks/traffic_replay.py replay --workload nightly_export.py --trace nightly.dltrace \
+        --output baseline.json
+    python tests/benchmarks/traffic_replay.py replay --workload nightly_export.py --trace nightly.dltrace \
+        --compare baseline.json
+"""
+import collections
+import importlib.util
+import argparse
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+import report
+
+REPLAY_ENVIRONMENT = 'https://replay.local/api/v1'
+# metric -> higher is better (regression direction of --compare)
+METRICS = collections.OrderedDict([('wall_time', False),
+                                   ('cpu_time', False),
+                                   ('requests', False),
+                                   ('unmatched', False)])
+
+
+def load_workload(filepath):
+    spec = importlib.util.spec_from_file_location('workload', filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, 'run'):
+        raise ValueError('Workload must define a "run(dl)" function: {}'.format(filepath))
+    return module.run
+
+
+def capture(workload, trace, body_sample_rate, max_body_bytes):
+    import dtlpy as dl
+    if dl.token_expired():
+        raise ValueError('Capture runs against the platform - login first')
+    recorder = dl.client_api.traffic.capture(filepath=trace,
+                                             body_sample_rate=body_sample_rate,
+                                             max_body_bytes=max_body_bytes)
+    tic = time.time()
+    try:
+        workload(dl)
+    finally:
+        dl.client_api.traffic.off()
+    print('Captured {} requests in {:.2f}[s]: {}'.format(recorder.count, time.time() - tic, trace))
+
+
+def replay(workload, trace, timing):
+    """
+    :return: replay stats (requests, unmatched, wall and cpu time)
+    """
+    import jwt
+    import dtlpy as dl
+    dl.client_api.add_environment(environment=REPLAY_ENVIRONMENT,
+                                  audience='replay',
+                                  client_id='replay',
+                                  auth0_url='https://replay.local',
+                                  alias='replay')
+    dl.client_api.setenv(REPLAY_ENVIRONMENT)
+    token = jwt.encode({'email': 'replay@dataloop.ai', 'exp': int(time.time()) + 24 * 60 * 60}, 'replay',
+                       algorithm='HS256')
+    dl.client_api.token = token.decode('utf-8') if isinstance(token, bytes) else token
+    replayer = dl.client_api.traffic.replay(filepath=trace, timing=timing)
+    replayer.restart()
+    try:
+        workload(dl)
+        stats = replayer.stats()
+    finally:
+        dl.client_api.traffic.off()
+    print('{:<16} {:>12}'.format('metric', 'value'))
+    for key, value in sorted(stats.items()):
+        print('{:<16} {:>12.6g}'.format(key, value))
+    if stats['unmatched']:
+        print('{} requests were not in the trace - the workload changed?'.format(stats['unmatched']))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dtlpy traffic capture and replay')
+    parser.add_argument('mode', choices=['capture', 'replay'])
+    parser.add_argument('--workload', required=True, help='python file with a "run(dl)" function')
+    parser.add_argument('--trace', required=True, help='trace file')
+    parser.add_argument('--body-sample-rate', type=float, default=1.0,
+                        help='capture - fraction of the requests to store binary bodies of')
+    parser.add_argument('--max-body-bytes', type=int, default=10 * 1024 * 1024,
+                        help='capture - larger binary bodies are replayed as zeros')
+    parser.add_argument('--timing', type=float, default=1.0, help='replay - factor of the recorded latencies')
+    parser.add_argument('--output', default=None, help='replay - save the results as a json baseline')
+    parser.add_argument('--compare', default=None, help='replay - baseline json to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    workload = load_workload(os.path.realpath(args.workload))
+    if args.mode == 'capture':
+        capture(workload=workload, trace=args.trace, body_sample_rate=args.body_sample_rate,
+                max_body_bytes=args.max_body_bytes)
+        return 0
+
+    home = tempfile.mkdtemp()
+    # the replay environment goes to a temporary cookie file - not the user's
+    os.environ['HOME'] = home
+    os.environ['USERPROFILE'] = home
+    try:
+        stats = replay(workload=workload, trace=args.trace, timing=args.timing)
+    finally:
+        shutil.rmtree(home)
+    results = {'replay': stats}
+    if args.output is not None:
+        report.save(filepath=args.output, results=results, settings={'trace': os.path.basename(args.trace),
+                                                                     'timing': args.timing})
+        print('Saved: {}'.format(args.output))
+    if args.compare is not None:
+        regressions = report.compare(baseline_filepath=args.compare, results=results, metrics=METRICS,
+                                     threshold=args.threshold)
+        if regressions:
+            print('{} regressions over {:.0%}'.format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -48,3 +48,12 @@ Feature: Annotations collection testing
         When I upload annotation collection
         Then Annotations in host equal annotations uploded
 
+
+    Scenario: Show - cpu stages in a process pool
+        Given Classes in file: "assets_split/annotation_collection/classes_new.json" are uploaded to test Dataset
+        And Item in path "assets_split/annotation_collection/0000000162.jpg" is uploaded to "Dataset"
+        And Item is annotated with annotations in file: "assets_split/annotation_collection/annotations_new.json"
+        And I get item annotation collection
+        When I show annotation collection as mask with cpu stages in "thread" mode
+        And I show annotation collection as mask with cpu stages in "process" mode
+        Then Masks of "thread" and "process" modes are equal
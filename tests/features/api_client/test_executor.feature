@@ -0,0 +1,14 @@
+Feature: Api client executor testing
+
+    Background: Initiate Platform Interface and create a project
+        Given Platform Interface is initialized as dlp and Environment is set according to git branch
+        And There is a project by the name of "api_client_executor"
+        And I create a dataset with a random name
+
+    Scenario: Nested pool tasks do not deadlock a single worker
+        Given There is an item
+        And I resize the executor to "1" workers
+        When I list the dataset items in "3" "item.download" pool tasks
+        Then Every pool task listed "1" items
+        And Executor stats show "entity" tasks
+        And I restore the executor size
@@ -0,0 +1,13 @@
+Feature: Api client metrics testing
+
+    Background: Initiate Platform Interface and create a project
+        Given Platform Interface is initialized as dlp and Environment is set according to git branch
+        And There is a project by the name of "api_client_metrics"
+        And I create a dataset with a random name
+
+    Scenario: Requests are counted by route template
+        Given There is an item
+        And I reset the api client metrics
+        When I get the item by id "3" times
+        Then Metrics show "3" "GET" requests to route "/items/{id}" with status "200"
+        And OpenMetrics text has the requests of route "/items/{id}"
@@ -0,0 +1,14 @@
+Feature: Api client tracing testing
+
+    Background: Initiate Platform Interface and create a project
+        Given Platform Interface is initialized as dlp and Environment is set according to git branch
+        And There is a project by the name of "api_client_tracing"
+        And I create a dataset with a random name
+
+    Scenario: Listener receives the spans of requests
+        Given There is an item
+        And I add a tracing listener
+        When I get the item by id
+        Then Tracing listener received a "http.request" span of "Items.get" with status "200"
+        And Last curl is the request of the item
+        And I remove the tracing listener
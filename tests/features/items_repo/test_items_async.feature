@@ -0,0 +1,22 @@
+Feature: Items repository asyncio services testing
+
+    Background: Initiate Platform Interface and create a project
+        Given Platform Interface is initialized as dlp and Environment is set according to git branch
+        And There is a project by the name of "items_async"
+        And I create a dataset with a random name
+
+    Scenario: Get an existing item by id with asyncio
+        Given There is an item
+        When I get the item by id with asyncio
+        Then I receive an Item object
+        And The item I received equals the item I uploaded
+
+    Scenario: List items with asyncio
+        Given There are "5" items
+        When I list items with asyncio with page size "2"
+        Then I receive "5" items from all async pages
+
+    Scenario: Download an item with asyncio
+        Given There is an item
+        When I download the item to buffer with asyncio
+        Then The async buffer equals the local file "0000000162.jpg"
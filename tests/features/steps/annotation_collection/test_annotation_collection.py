@@ -221,3 +221,20 @@ def step_impl(context):
                 )
             ann.add_frame(annotation_definition=annotation_definition, frame_num=i*10)
 
+
+@behave.when(u'I show annotation collection as mask with cpu stages in "{mode}" mode')
+def step_impl(context, mode):
+    cpu_stages = context.dl.client_api.cpu_stages
+    cpu_stages.set_mode(stage='all', mode=mode)
+    try:
+        if not hasattr(context, 'cpu_stages_masks'):
+            context.cpu_stages_masks = dict()
+        context.cpu_stages_masks[mode] = context.annotation_collection.show(annotation_format='mask')
+    finally:
+        cpu_stages.set_mode(stage='all', mode='thread')
+        cpu_stages.close()
+
+
+@behave.then(u'Masks of "{first}" and "{second}" modes are equal')
+def step_impl(context, first, second):
+    assert (context.cpu_stages_masks[first] == context.cpu_stages_masks[second]).all()
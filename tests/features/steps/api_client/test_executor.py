@@ -0,0 +1,30 @@
+import behave
+
+
+@behave.given(u'I resize the executor to "{num_workers}" workers')
+def step_impl(context, num_workers):
+    context.dl.client_api.executor.resize(num_workers=int(num_workers))
+
+
+@behave.when(u'I list the dataset items in "{count}" "{pool_name}" pool tasks')
+def step_impl(context, count, pool_name):
+    pool = context.dl.client_api.thread_pools(pool_name=pool_name)
+    jobs = [pool.apply_async(lambda: context.dataset.items.list().items_count) for _ in range(int(count))]
+    context.pool_results = [job.get(timeout=120) for job in jobs]
+
+
+@behave.then(u'Every pool task listed "{count}" items')
+def step_impl(context, count):
+    assert context.pool_results == [int(count)] * len(context.pool_results)
+
+
+@behave.then(u'Executor stats show "{priority_class}" tasks')
+def step_impl(context, priority_class):
+    stats = context.dl.client_api.executor.stats()
+    assert stats['classes'][priority_class]['completed'] > 0
+    assert 0 <= stats['classes'][priority_class]['utilization'] <= 1
+
+
+@behave.then(u'I restore the executor size')
+def step_impl(context):
+    context.dl.client_api.num_processes = context.dl.client_api.num_processes
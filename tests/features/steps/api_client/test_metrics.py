@@ -0,0 +1,28 @@
+import behave
+
+
+@behave.given(u'I reset the api client metrics')
+def step_impl(context):
+    context.dl.client_api.metrics.reset()
+
+
+@behave.when(u'I get the item by id "{times}" times')
+def step_impl(context, times):
+    for _ in range(int(times)):
+        context.dataset.items.get(item_id=context.item.id)
+
+
+@behave.then(u'Metrics show "{count}" "{method}" requests to route "{route}" with status "{status_code}"')
+def step_impl(context, count, method, route, status_code):
+    snapshot = context.dl.client_api.metrics.snapshot()
+    endpoints = [e for e in snapshot['endpoints'] if e['method'] == method and e['route'] == route]
+    assert len(endpoints) == 1
+    assert endpoints[0]['statuses'][status_code] == int(count)
+    assert endpoints[0]['latency']['count'] == int(count)
+
+
+@behave.then(u'OpenMetrics text has the requests of route "{route}"')
+def step_impl(context, route):
+    text = context.dl.client_api.metrics.to_openmetrics()
+    assert 'dtlpy_requests_total{{method="GET",route="{}",code="200"}}'.format(route) in text
+    assert text.endswith('# EOF\n')
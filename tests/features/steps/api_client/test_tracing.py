@@ -0,0 +1,38 @@
+import behave
+
+
+@behave.given(u'I add a tracing listener')
+def step_impl(context):
+    class Recorder(context.dl.SpanListener):
+        def __init__(self):
+            self.spans = list()
+
+        def on_end(self, span):
+            self.spans.append(span)
+
+    context.span_recorder = context.dl.client_api.tracer.add_listener(Recorder())
+    context.curl_listener = context.dl.client_api.tracer.add_listener(context.dl.CurlListener())
+
+
+@behave.then(u'Tracing listener received a "{name}" span of "{caller}" with status "{status_code}"')
+def step_impl(context, name, caller, status_code):
+    spans = [span for span in context.span_recorder.spans
+             if span.name == name and span.attributes['caller'] == caller]
+    assert len(spans) == 1
+    assert spans[0].attributes['status_code'] == int(status_code)
+    assert spans[0].attributes['route'] == '/items/{id}'
+    assert spans[0].duration is not None
+
+
+@behave.then(u'Last curl is the request of the item')
+def step_impl(context):
+    assert context.dl.client_api.last_curl.startswith('curl -X GET')
+    assert '/items/{}'.format(context.item.id) in context.dl.client_api.last_curl
+    assert 'authorization' not in context.dl.client_api.last_curl.lower()
+
+
+@behave.then(u'I remove the tracing listener')
+def step_impl(context):
+    context.dl.client_api.tracer.remove_listener(context.span_recorder)
+    context.dl.client_api.tracer.remove_listener(context.curl_listener)
+    assert not context.dl.client_api.tracer.active
@@ -48,6 +48,7 @@ from tests.features.steps.items_repo import test_items_download_batch
 from tests.features.steps.items_repo import test_items_upload_batch
 from tests.features.steps.items_repo import test_items_delete
 from tests.features.steps.items_repo import test_items_download
+from tests.features.steps.items_repo import test_items_async
 
 from tests.features.steps.item_entity import test_item_repo_methods
 
@@ -109,3 +110,7 @@ from tests.features.steps.bots_repo import test_bots_create
 from tests.features.steps.bots_repo import test_bots_list
 from tests.features.steps.bots_repo import test_bots_get
 from tests.features.steps.bots_repo import test_bots_delete
+
+from tests.features.steps.api_client import test_metrics
+from tests.features.steps.api_client import test_tracing
+from tests.features.steps.api_client import test_executor
@@ -0,0 +1,51 @@
+import behave
+import asyncio
+import os
+
+
+def run_async(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@behave.when(u'I get the item by id with asyncio')
+def step_impl(context):
+    context.item_get = run_async(context.dataset.items.get_async(item_id=context.item.id))
+
+
+@behave.when(u'I list items with asyncio with page size "{page_size}"')
+def step_impl(context, page_size):
+    async def list_all():
+        items = list()
+        async for page in context.dataset.items.list_async(page_size=int(page_size)):
+            items += page
+        await context.dl.client_api.async_client.close()
+        return items
+
+    context.async_items = run_async(list_all())
+
+
+@behave.then(u'I receive "{item_count}" items from all async pages')
+def step_impl(context, item_count):
+    assert len(context.async_items) == int(item_count)
+
+
+@behave.when(u'I download the item to buffer with asyncio')
+def step_impl(context):
+    async def download():
+        downloader = context.dl.repositories.Downloader(items_repository=context.dataset.items)
+        buffer = await downloader.download_async(item=context.item)
+        await context.dl.client_api.async_client.close()
+        return buffer
+
+    context.async_buffer = run_async(download())
+
+
+@behave.then(u'The async buffer equals the local file "{filename}"')
+def step_impl(context, filename):
+    filepath = os.path.join(os.environ['DATALOOP_TEST_ASSETS'], filename)
+    with open(filepath, 'rb') as f:
+        assert f.read() == context.async_buffer.read()
@@ -0,0 +1,86 @@
+"""
+Offline checks of the prioritized executor: nested fan-outs of the same priority class finish and
+workers waiting on a bounded work queue run its pending jobs
+"""
+import threading
+import time
+import sys
+
+NUM_WORKERS = 6
+RESERVED = 1
+NUM_OUTER = 8
+NUM_NESTED = 3
+TIMEOUT = 30
+
+
+def run_with_timeout(func):
+    """
+    :return: True if func finished in TIMEOUT seconds
+    """
+    thread = threading.Thread(target=func)
+    thread.daemon = True
+    thread.start()
+    thread.join(TIMEOUT)
+    return not thread.is_alive()
+
+
+def run():
+    from dtlpy.services.executor import PriorityExecutor
+    from dtlpy.services.work_queue import BoundedWorkQueue
+
+    failures = list()
+
+    def check(name, value, expected):
+        if value != expected:
+            failures.append('{}: expected {}, got {}'.format(name, expected, value))
+
+    # item uploads (bulk) uploading their annotations (bulk) - more outer tasks than the class limit
+    executor = PriorityExecutor(num_workers=NUM_WORKERS, reserved=RESERVED)
+    nested = list()
+
+    def nested_task():
+        time.sleep(0.01)
+        nested.append(1)
+
+    def outer_task():
+        with BoundedWorkQueue(pool=executor.pool('annotation.upload')) as queue:
+            for _ in range(NUM_NESTED):
+                queue.submit(nested_task)
+
+    def fan_out():
+        with BoundedWorkQueue(pool=executor.pool('item.upload')) as queue:
+            for _ in range(NUM_OUTER):
+                queue.submit(outer_task)
+
+    check('nested same class finished', run_with_timeout(fan_out), True)
+    check('nested tasks', len(nested), NUM_OUTER * NUM_NESTED)
+    stats = executor.stats()['classes']['bulk']
+    check('bulk completed', stats['completed'], NUM_OUTER * (NUM_NESTED + 1))
+    check('bulk queued', stats['queued'], 0)
+
+    # a page task fans out bulk jobs while the only bulk slot is taken - the page worker runs them itself
+    executor = PriorityExecutor(num_workers=3, reserved=RESERVED)
+    release = threading.Event()
+    blocker = executor.pool('item.download').apply_async(release.wait, args=(TIMEOUT,))
+    helped = list()
+
+    def page_task():
+        with BoundedWorkQueue(pool=executor.pool('annotation.download'), window=1) as queue:
+            for _ in range(NUM_NESTED):
+                queue.submit(lambda: helped.append(threading.current_thread()))
+        return threading.current_thread()
+
+    page = executor.pool('item.page').apply_async(page_task)
+    check('fan out with the class full finished', run_with_timeout(lambda: page.wait(TIMEOUT)), True)
+    release.set()
+    blocker.get(TIMEOUT)
+    check('jobs run by the waiting worker', helped, [page.get(TIMEOUT)] * NUM_NESTED)
+    return failures
+
+
+if __name__ == "__main__":
+    errors = run()
+    for error in errors:
+        print(error)
+    print('executor: {}'.format('failed' if errors else 'passed'))
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,81 @@
+import subprocess
+import tempfile
+import shutil
+import json
+import time
+import sys
+import os
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+# seconds. "import dtlpy" took ~1.2s when it loaded all optional packages and created the default client
+IMPORT_TIME_BUDGET = 0.6
+NUM_TRIES = 3
+# must not be loaded by "import dtlpy" - imported on first use
+HEAVY_MODULES = ['pandas', 'numpy', 'aiohttp', 'asyncio', 'PIL.Image', 'tqdm', 'jinja2', 'dictdiffer', 'tabulate',
+                 'validators', 'pathspec']
+
+CHECK_SCRIPT = """
+import json
+import sys
+import dtlpy
+print(json.dumps([name for name in {heavy} if name in sys.modules]))
+"""
+
+
+def import_time(home):
+    """
+    Time a clean "import dtlpy" in a new process
+
+    :param home: HOME of the process (to check no files are created)
+    :return: seconds, loaded heavy modules
+    """
+    env = dict(os.environ)
+    env['HOME'] = home
+    env['USERPROFILE'] = home
+    env['PYTHONPATH'] = os.path.dirname(TEST_DIR)
+    script = CHECK_SCRIPT.format(heavy=HEAVY_MODULES)
+    if sys.version_info >= (3, 7):
+        cmds = [sys.executable, '-X', 'importtime', '-c', script]
+    else:
+        cmds = [sys.executable, '-c', script]
+    tic = time.time()
+    p = subprocess.Popen(cmds, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate()
+    wall_time = time.time() - tic
+    if p.returncode != 0:
+        raise RuntimeError('"import dtlpy" failed:\n{}'.format(err.decode()))
+    loaded = json.loads(out.decode().strip().splitlines()[-1])
+    seconds = wall_time
+    for line in err.decode().splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'dtlpy':
+            seconds = int(fields[1]) / 1e6
+    return seconds, loaded
+
+
+if __name__ == "__main__":
+    home = tempfile.mkdtemp()
+    try:
+        # best of a few runs - first run also warms the bytecode cache
+        times = list()
+        loaded = list()
+        for i_try in range(NUM_TRIES):
+            seconds, loaded = import_time(home=home)
+            times.append(seconds)
+        created = os.listdir(home)
+    finally:
+        shutil.rmtree(home)
+
+    print('import dtlpy: {:.3f}[s] (budget: {}[s])'.format(min(times), IMPORT_TIME_BUDGET))
+    failed = False
+    if min(times) > IMPORT_TIME_BUDGET:
+        print('Import time is over budget')
+        failed = True
+    if loaded:
+        print('Heavy modules loaded on import: {}'.format(loaded))
+        failed = True
+    if created:
+        print('Files created on import: {}'.format(created))
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,227 @@
+"""
+Offline round trip of the SDK against the local gateway: upload, paging, download with annotations,
+annotations export and error injection. No platform login needed.
+Each feature is a test function of its own - a failure is reported with its test and does not hide the others
+"""
+import collections
+import traceback
+import tempfile
+import shutil
+import json
+import sys
+import os
+import io
+
+NUM_ITEMS = 25
+PAGE_SIZE = 10
+
+
+class Context:
+    """
+    State shared by the tests (like behave's context): the gateway, the dataset and the uploaded items
+    """
+
+    def __init__(self, dl, gateway, local_path):
+        self.dl = dl
+        self.gateway = gateway
+        self.local_path = local_path
+        self.dataset = None
+        self.items = list()
+        self.failures = list()
+
+    def check(self, name, value, expected):
+        if value != expected:
+            self.failures.append('{}: expected {}, got {}'.format(name, expected, value))
+
+
+def setup(context):
+    """
+    Background: a project, a dataset with a label and NUM_ITEMS uploaded items
+    """
+    dl = context.dl
+    project = dl.projects.create(project_name='local-project')
+    context.dataset = project.datasets.create(dataset_name='local-dataset', labels={'cat': (255, 0, 0)})
+    buffers = list()
+    for i_item in range(NUM_ITEMS):
+        buffer = io.BytesIO(os.urandom(1024))
+        buffer.name = 'item_{:02d}.bin'.format(i_item)
+        buffers.append(buffer)
+    context.items = list(context.dataset.items.upload(local_path=buffers, remote_path='/folder'))
+
+
+def test_upload(context):
+    context.check('labels', [label.tag for label in context.dataset.labels], ['cat'])
+    context.check('uploaded', len(context.items), NUM_ITEMS)
+    context.check('filenames', sorted(item.filename for item in context.items),
+                  ['/folder/item_{:02d}.bin'.format(i_item) for i_item in range(NUM_ITEMS)])
+
+
+def test_paging(context):
+    dl = context.dl
+    pages = context.dataset.items.list(page_size=PAGE_SIZE)
+    context.check('items count', pages.items_count, NUM_ITEMS)
+    context.check('pages count', pages.total_pages_count, (NUM_ITEMS + PAGE_SIZE - 1) // PAGE_SIZE)
+    context.check('iterated', len([item for page in pages for item in page]), NUM_ITEMS)
+    filters = dl.Filters(field='filename', values='/folder/item_1*')
+    context.check('glob filter', context.dataset.items.list(filters=filters).items_count, 10)
+
+
+def test_read_ahead(context):
+    pages = context.dataset.items.list(page_size=PAGE_SIZE)
+    ids = [item.id for page in pages for item in page]
+    context.check('all', [item.id for item in pages.all(page_size=4, window=2, ordered=True)], ids)
+    context.check('prefetched', [item.id for page in pages.iterate(prefetch=2) for item in page], ids)
+
+
+def test_cursor_paging(context):
+    dl = context.dl
+    # same items as offsets, in id order, counts of the whole query
+    pages = context.dataset.items.list(page_size=PAGE_SIZE, paging='cursor')
+    context.check('cursor items', [item.id for page in pages for item in page],
+                  sorted(item.id for item in context.items))
+    context.check('cursor items count', pages.items_count, NUM_ITEMS)
+    filters = dl.Filters(field='filename', values='/folder/item_1*')
+    filters.paging = 'cursor'
+    context.check('cursor filter', len([item for page in context.dataset.items.list(filters=filters, page_size=3)
+                                        for item in page]), 10)
+    context.check('cursor operation', filters.prepare(operation='delete')['delete'], True)
+    filters = dl.Filters()
+    context.dataset.items.list(filters=filters, page_size=3, paging='cursor')
+    context.check('caller filters', (filters.paging, filters.page_size), ('offset', 1000))
+
+
+def test_scan(context):
+    context.check('scan', [item.id for item in context.dataset.items.scan(shards=3, page_size=4, ordered=True)],
+                  sorted(item.id for item in context.items))
+
+
+def test_projection(context):
+    dl = context.dl
+    # trimmed by the gateway, read only references
+    filters = dl.Filters()
+    filters.select(['filename', 'metadata.system.size'])
+    context.check('projected', sorted(context.dataset.items.get_list(filters=filters)['items'][0]),
+                  ['filename', 'id', 'metadata'])
+    refs = [ref for page in context.dataset.items.list(filters=filters) for ref in page]
+    context.check('selected', sorted(ref.filename for ref in refs), sorted(item.filename for item in context.items))
+    context.check('item ref', refs[0].to_item().name, os.path.basename(refs[0].filename))
+    try:
+        refs[0].metadata['system']['size'] = 0
+        context.failures.append('nested field of an item ref was changed')
+    except TypeError:
+        pass
+    context.check('item ref size', refs[0].size, 1024)
+
+
+def test_annotations(context):
+    dl = context.dl
+    item = context.dataset.items.get(filepath='/folder/item_03.bin')
+    builder = item.annotations.builder()
+    builder.add(annotation_definition=dl.Box(top=1, left=1, bottom=5, right=5, label='cat'))
+    item.annotations.upload(builder)
+    annotation = item.annotations.list()[0]
+    annotation.label = 'dog'
+    annotation.update()
+    context.check('annotation update', item.annotations.get(annotation_id=annotation.id).label, 'dog')
+
+
+def test_download_and_export(context):
+    dl = context.dl
+    item = context.dataset.items.get(filepath='/folder/item_05.bin')
+    builder = item.annotations.builder()
+    builder.add(annotation_definition=dl.Box(top=1, left=1, bottom=5, right=5, label='cat'))
+    item.annotations.upload(builder)
+    # profiled
+    with dl.profiling.session(sample_interval=0.005) as session:
+        context.dataset.items.download(local_path=context.local_path, annotation_options='json')
+    report = session.report()
+    context.check('profiled stages', list(report['stages']), ['download'])
+    context.check('profiled items', report['allocations'].get('Item', 0) >= NUM_ITEMS, True)
+    context.check('profiling off', dl.profiling.active_session(), None)
+    downloaded = os.listdir(os.path.join(context.local_path, 'items', 'folder'))
+    context.check('downloaded', len(downloaded), NUM_ITEMS)
+    with open(os.path.join(context.local_path, 'json', 'folder', 'item_05.json')) as f:
+        context.check('exported annotations', [a['label'] for a in json.load(f)['annotations']], ['cat'])
+
+
+def test_cursor_annotations(context):
+    dl = context.dl
+    item = context.dataset.items.get(filepath='/folder/item_07.bin')
+    builder = item.annotations.builder()
+    for i_box in range(5):
+        builder.add(annotation_definition=dl.Box(top=i_box, left=1, bottom=5, right=5, label='cat'))
+    item.annotations.upload(builder)
+    filters = dl.Filters()
+    filters.resource = 'annotations'
+    filters.add(field='itemId', values=item.id)
+    pages = context.dataset.items.list(filters=filters, page_size=2, paging='cursor')
+    context.check('cursor annotations', [annotation.id for page in pages for annotation in page],
+                  sorted(annotation.id for annotation in item.annotations.list()))
+
+
+def test_error_injection(context):
+    # injected errors are retried (max 3 attempts)
+    context.gateway.settings.set_route('/datasets/{id}/query', error_rate=0.2)
+    try:
+        context.check('listed with errors',
+                      len([item for page in context.dataset.items.list(page_size=5) for item in page]), NUM_ITEMS)
+    finally:
+        context.gateway.settings.set_route('/datasets/{id}/query', error_rate=0)
+    if context.gateway.errors_injected == 0:
+        context.failures.append('no errors were injected')
+
+
+TESTS = [test_upload,
+         test_paging,
+         test_read_ahead,
+         test_cursor_paging,
+         test_scan,
+         test_projection,
+         test_annotations,
+         test_download_and_export,
+         test_cursor_annotations,
+         test_error_injection]
+
+
+def run(local_path):
+    """
+    :return: dictionary of test name -> list of failures
+    """
+    import dtlpy as dl
+    from dtlpy.utilities.local_gateway import LocalGateway, GatewaySettings
+
+    results = collections.OrderedDict()
+    with LocalGateway(settings=GatewaySettings(seed=1)) as gateway:
+        gateway.connect()
+        context = Context(dl=dl, gateway=gateway, local_path=local_path)
+        try:
+            setup(context)
+        except Exception:
+            results['setup'] = [traceback.format_exc()]
+            return results
+        for test in TESTS:
+            context.failures = list()
+            try:
+                test(context)
+            except Exception:
+                context.failures.append(traceback.format_exc())
+            results[test.__name__] = context.failures
+    return results
+
+
+if __name__ == "__main__":
+    home = tempfile.mkdtemp()
+    # the cookie file of the test environment - not the user's
+    os.environ['HOME'] = home
+    os.environ['USERPROFILE'] = home
+    try:
+        results = run(local_path=os.path.join(home, 'download'))
+    finally:
+        shutil.rmtree(home)
+    for name, errors in results.items():
+        print('{}: {}'.format(name, 'failed' if errors else 'passed'))
+        for error in errors:
+            print('    {}'.format(error))
+    failed = any(results.values())
+    print('local gateway round trip: {}'.format('failed' if failed else 'passed'))
+    sys.exit(1 if failed else 0)
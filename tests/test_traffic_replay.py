@@ -0,0 +1,120 @@
+"""
+Capture a workload against the local gateway and replay it with the gateway stopped:
+same requests, same results, no unmatched calls
+"""
+import tempfile
+import shutil
+import sys
+import os
+import io
+
+NUM_ITEMS = 12
+ITEM_SIZE = 4096
+REPLAY_ENVIRONMENT = 'https://replay.local/api/v1'
+
+
+def workload(dl, dataset_id, local_path):
+    dataset = dl.datasets.get(dataset_id=dataset_id)
+    filenames = sorted(item.filename for page in dataset.items.list(page_size=5) for item in page)
+    labels = sorted(annotation.label
+                    for annotation in dataset.items.get(filepath='/folder/item_00.bin').annotations.list())
+    dataset.items.download(local_path=local_path, annotation_options='json')
+
+    # asyncio client calls
+    async def get_and_stream():
+        item = await dataset.items.get_async(item_id=dataset.items.get(filepath='/folder/item_01.bin').id)
+        buffer = await dl.repositories.Downloader(items_repository=dataset.items).download_async(item=item)
+        return item.filename, len(buffer.read())
+
+    async_results = dl.client_api.async_transport.run(get_and_stream())
+    downloaded = dict()
+    for root, _, files in os.walk(local_path):
+        for filename in files:
+            with open(os.path.join(root, filename), 'rb') as f:
+                downloaded[os.path.relpath(os.path.join(root, filename), local_path)] = f.read()
+    return filenames, labels, downloaded, async_results
+
+
+def run(home):
+    import dtlpy as dl
+    from dtlpy.utilities.local_gateway import LocalGateway, GatewaySettings
+
+    failures = list()
+
+    def check(name, value, expected):
+        if value != expected:
+            failures.append('{}: expected {}, got {}'.format(name, expected, value))
+
+    trace_filepath = os.path.join(home, 'workload.dltrace')
+    gateway = LocalGateway(settings=GatewaySettings(latency=0.002, seed=1))
+    gateway.start()
+    try:
+        gateway.connect()
+        project = dl.projects.create(project_name='traffic-project')
+        dataset = project.datasets.create(dataset_name='traffic-dataset', labels={'cat': (255, 0, 0)})
+        buffers = list()
+        for i_item in range(NUM_ITEMS):
+            buffer = io.BytesIO(os.urandom(ITEM_SIZE))
+            buffer.name = 'item_{:02d}.bin'.format(i_item)
+            buffers.append(buffer)
+        list(dataset.items.upload(local_path=buffers, remote_path='/folder'))
+        item = dataset.items.get(filepath='/folder/item_00.bin')
+        builder = item.annotations.builder()
+        builder.add(annotation_definition=dl.Box(top=1, left=1, bottom=5, right=5, label='cat'))
+        item.annotations.upload(builder)
+
+        # capture - item streams are not stored (replayed as zeros), the annotations zip is
+        gateway.reset_stats()
+        capture = dl.client_api.traffic.capture(filepath=trace_filepath, max_body_bytes=ITEM_SIZE - 1)
+        captured = workload(dl=dl, dataset_id=dataset.id, local_path=os.path.join(home, 'captured'))
+        dl.client_api.traffic.off()
+        check('captured requests', capture.count, sum(gateway.requests.values()))
+    finally:
+        gateway.stop()
+
+    with open(trace_filepath, 'rb') as f:
+        if gateway.token().encode('utf-8') in f.read():
+            failures.append('token in trace')
+
+    # replay on another environment - the gateway is down
+    previous = dl.client_api.environment
+    dl.client_api.add_environment(environment=REPLAY_ENVIRONMENT,
+                                  audience='replay',
+                                  client_id='replay',
+                                  auth0_url='https://replay.local',
+                                  alias='replay')
+    dl.client_api.setenv(REPLAY_ENVIRONMENT)
+    dl.client_api.token = gateway.token()
+    replay = dl.client_api.traffic.replay(filepath=trace_filepath, timing=0)
+    try:
+        replayed = workload(dl=dl, dataset_id=dataset.id, local_path=os.path.join(home, 'replayed'))
+        stats = replay.stats()
+    finally:
+        dl.client_api.traffic.off()
+        dl.client_api.setenv(previous)
+    check('listed', replayed[0], captured[0])
+    check('annotations', replayed[1], captured[1])
+    check('downloaded files', sorted(replayed[2]), sorted(captured[2]))
+    check('annotations json', [replayed[2][key] for key in sorted(replayed[2]) if key.startswith('json')],
+          [captured[2][key] for key in sorted(captured[2]) if key.startswith('json')])
+    check('sizes', [len(replayed[2][key]) for key in sorted(replayed[2])],
+          [len(captured[2][key]) for key in sorted(captured[2])])
+    check('asyncio calls', replayed[3], captured[3])
+    check('replayed requests', stats['requests'], capture.count)
+    check('unmatched', stats['unmatched'], 0)
+    return failures
+
+
+if __name__ == "__main__":
+    home = tempfile.mkdtemp()
+    # the cookie file of the test environment - not the user's
+    os.environ['HOME'] = home
+    os.environ['USERPROFILE'] = home
+    try:
+        errors = run(home=home)
+    finally:
+        shutil.rmtree(home)
+    for error in errors:
+        print(error)
+    print('traffic capture and replay: {}'.format('failed' if errors else 'passed'))
+    sys.exit(1 if errors else 0)